@@ -2,7 +2,6 @@
 
 import streamlit as st
 import os
-import tempfile
 import uuid
 from datetime import datetime
 import sys
@@ -10,15 +9,21 @@ import sys
 # Add parent folder to path for imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from utils.image_validator import is_valid_image, get_image_metadata
-from utils.drive_uploader import authenticate_drive, create_drive_folder_if_missing, upload_image_to_drive
-from utils.pose_classifier import classify_pose
-from utils.clip_tagger import suggest_clip_tags
-from assistants.plan_generator import generate_glute_plan, INTELLIGENCE_PROFILES
+from utils import startup_profiler
+startup_profiler.start(__file__)
+
+from utils.image_validator import probe_image
+from utils.drive_uploader import (
+    get_drive, ensure_drive_path, invalidate_drive_path, PyDriveBackend, UploadItem, upload_many
+)
+from utils.image_analysis import analyze_images
+from assistants.plan_generator import stream_glute_plan, INTELLIGENCE_PROFILES, ERROR_PREFIX
+from utils.background_jobs import start_workers, submit_job, get_job, latest_job, DONE, FAILED
 
 POSE_OPTIONS = ["Front", "Side", "Rear"]
 
 st.set_page_config(page_title="Pose Grouper Assistant", layout="wide")
+start_workers()  # resume background jobs orphaned by a previous server process
 st.title("📸 Multi-View Pose Grouper + Glute Plan Preview")
 st.markdown("Group front/side/rear images of the same subject and preview a tailored glute transformation plan.")
 
@@ -34,18 +39,45 @@ st.sidebar.markdown("Choose your guidance source for GPT training philosophy.")
 selected_expert = st.sidebar.selectbox("Select Intelligence Profile", INTELLIGENCE_PROFILES)
 fitness_level = st.sidebar.selectbox("Select Fitness Level", ["Beginner", "Intermediate", "Advanced"])
 goal_text = st.sidebar.text_input("Goal Focus", value="Aesthetic Shape + Strength")
+compare_experts = st.sidebar.multiselect("Compare With Other Profiles", [p for p in INTELLIGENCE_PROFILES if p != selected_expert])
+
+
+@st.fragment(run_every="2s")
+def render_profile_plans(job_id):
+    """Polls the multi-profile plan job; the rest of the page stays interactive meanwhile."""
+    job = get_job(job_id)
+    if job is None:
+        return
+    if job.status == DONE:
+        if any(plan_md.startswith(ERROR_PREFIX) for plan_md in job.result.values()):
+            st.warning(job.message)
+        for tab, (expert, plan_md) in zip(st.tabs(list(job.result)), job.result.items()):
+            with tab:
+                if plan_md.startswith(ERROR_PREFIX):
+                    st.error(plan_md)
+                else:
+                    st.markdown(plan_md, unsafe_allow_html=True)
+    elif job.status == FAILED:
+        st.error(f"Plan comparison failed: {job.error}")
+    else:
+        st.progress(job.progress, text=job.message or "Queued...")
+
 
 # Setup
 if uploaded_files:
     st.subheader("🖼️ Assign Poses + View AI Suggestions")
     pose_assignments = {}
+    analyses = {}
     assigned_poses = set()
     all_tags = set()
 
-    for i, uploaded_file in enumerate(uploaded_files):
+    # One decode + one batched vision forward gives both the pose and the shape tags
+    file_analyses = analyze_images(uploaded_files)
+
+    for i, (uploaded_file, analysis) in enumerate(zip(uploaded_files, file_analyses)):
         st.image(uploaded_file, width=300, caption=uploaded_file.name)
 
-        predicted_pose, confidence = classify_pose(uploaded_file)
+        predicted_pose, confidence = analysis.pose, analysis.pose_confidence
         st.markdown(f"**AI Suggests:** `{predicted_pose}` ({confidence:.1f}% confidence)")
 
         pose = st.selectbox(
@@ -57,36 +89,49 @@ if uploaded_files:
         else:
             assigned_poses.add(pose)
             pose_assignments[pose] = uploaded_file
+            analyses[pose] = analysis
 
     if len(pose_assignments) >= 1:
         if st.button("Group, Tag & Save to Drive"):
             with st.spinner("🔐 Connecting to Google Drive..."):
-                drive = authenticate_drive()
-                base_folder_id = create_drive_folder_if_missing(drive, "AI_Glute_Assistant")
-                session_folder_id = create_drive_folder_if_missing(drive, session_id, parent_id=base_folder_id)
-                subject_folder_id = create_drive_folder_if_missing(drive, subject_id, parent_id=session_folder_id)
+                drive = get_drive()  # authenticated once per process, not per rerun
+                subject_folder_path = f"AI_Glute_Assistant/{session_id}/{subject_id}"
+                subject_folder_id = ensure_drive_path(drive, subject_folder_path)
 
+            valid_poses, probes, upload_items = [], {}, []
             for pose, file in pose_assignments.items():
-                is_valid, msg = is_valid_image(file)
-                if not is_valid:
-                    st.error(f"❌ {file.name}: {msg}")
+                probe = probe_image(file)
+                if not probe.is_valid:
+                    st.error(f"❌ {file.name}: {probe.message}")
                     continue
+                valid_poses.append(pose)
+                probes[pose] = probe
+                upload_items.append(
+                    UploadItem(file, f"{pose.lower()}.jpg", subject_folder_id, f"image/{probe.format}")
+                )
 
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp:
-                    tmp.write(file.read())
-                    tmp_path = tmp.name
+            # Upload all views in parallel, streaming from the in-memory uploads
+            progress_bar = st.progress(0.0, text="Uploading to Drive...")
 
-                filename = f"{pose.lower()}.jpg"
-                file_url = upload_image_to_drive(drive, open(tmp_path, "rb"), filename, subject_folder_id)
-                meta = get_image_metadata(file)
+            def show_progress(completed, total, bytes_sent, bytes_total):
+                progress_bar.progress(completed / total, text=f"Uploaded {completed}/{total} views")
+
+            results = upload_many(PyDriveBackend(drive), upload_items, on_progress=show_progress)
+            if any(result.folder_missing for result in results):
+                invalidate_drive_path(subject_folder_path)  # folder gone: re-resolve its id next time
+
+            for pose, result in zip(valid_poses, results):
+                if not result.ok:
+                    st.error(f"❌ {pose} view: upload failed after {result.attempts} attempts ({result.error})")
+                    continue
+                meta = probes[pose].as_metadata()
 
-                clip_tags = suggest_clip_tags(tmp_path)
+                clip_tags = analyses[pose].top_tags(5)
                 all_tags.update(clip_tags)
 
-                st.success(f"✅ Uploaded {pose} view: [View in Drive]({file_url})")
+                st.success(f"✅ Uploaded {pose} view: [View in Drive]({result.link})")
                 st.write(f"📏 Resolution: {meta['width']}x{meta['height']}, 💾 Size: {meta['size_MB']}MB")
                 st.markdown(f"🧠 Suggested Tags: `{', '.join(clip_tags[:3])}`")
-                os.remove(tmp_path)
 
             # Save log CSV locally
             log_lines = ["subject_id,pose,filename,timestamp\n"]
@@ -103,16 +148,33 @@ if uploaded_files:
                 st.markdown("---")
                 st.subheader("🧠 AI-Generated Glute Plan Preview")
                 st.markdown(f"**Tags used:** `{', '.join(all_tags)}`")
-                with st.spinner("Generating plan based on expert philosophy and tags..."):
-                    plan_md = generate_glute_plan(
-                        glute_tags=list(all_tags),
+                # Streamed so the first lines show up as soon as the model produces them
+                st.write_stream(stream_glute_plan(
+                    glute_tags=list(all_tags),
+                    user_fitness_level=fitness_level,
+                    goals=goal_text,
+                    expert_source=selected_expert
+                ))
+
+                if compare_experts:
+                    st.markdown("---")
+                    st.subheader("🧪 Plans From Other Profiles")
+                    job_params = dict(
+                        glute_tags=sorted(all_tags),
+                        profiles=compare_experts,
                         user_fitness_level=fitness_level,
-                        goals=goal_text,
-                        expert_source=selected_expert
+                        goals=goal_text
                     )
-                st.markdown(plan_md, unsafe_allow_html=True)
+                    # Reruns reuse the finished (or in-flight) job for the same inputs instead of resubmitting
+                    job = latest_job("profile_plans", **job_params)
+                    if job is None or job.status == FAILED:
+                        job_id = submit_job("profile_plans", **job_params)
+                    else:
+                        job_id = job.id
+                    render_profile_plans(job_id)
     else:
         st.info("Please assign at least one unique pose.")
 else:
     st.info("Upload up to 3 images to begin pose grouping.")
 
+startup_profiler.finish()
@@ -1,10 +1,16 @@
 import sys
 import os
+import uuid
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+from utils import startup_profiler
+startup_profiler.start(__file__)
+
 import streamlit as st
-from utils.image_validator import is_valid_image, get_image_metadata
-from utils.drive_uploader import authenticate_drive, create_drive_folder_if_missing, upload_image_to_drive
+from utils.image_validator import probe_image
+from utils.drive_uploader import (
+    get_drive, ensure_drive_path, invalidate_drive_path, PyDriveBackend, UploadItem, upload_many
+)
 
 
 # ───────────────────────────────────────────────
@@ -29,34 +35,49 @@ if not uploaded_files:
 # ───────────────────────────────────────────────
 # Google Drive Connection
 with st.spinner("🔐 Connecting to Google Drive..."):
-    drive = authenticate_drive()
-    base_folder_id = create_drive_folder_if_missing(drive, "AI_Glute_Assistant")
-    session_folder_id = create_drive_folder_if_missing(drive, session_id, parent_id=base_folder_id)
+    drive = get_drive()  # authenticated once per process, not per rerun
+    # Cached path -> folder id: repeat uploads to a known session need no folder lookups
+    session_folder_path = f"AI_Glute_Assistant/{session_id}"
+    session_folder_id = ensure_drive_path(drive, session_folder_path)
 
 # ───────────────────────────────────────────────
 # Image Processing & Display
 st.subheader("📸 Uploaded Image Previews")
+upload_items = []
 for uploaded_file in uploaded_files:
-    # Validate
-    is_valid, message = is_valid_image(uploaded_file)
-    if not is_valid:
-        st.warning(f"⚠️ {uploaded_file.name}: {message}")
+    # Validate (one header-only pass gives validity, metadata and content hash)
+    probe = probe_image(uploaded_file)
+    if not probe.is_valid:
+        st.warning(f"⚠️ {uploaded_file.name}: {probe.message}")
         continue
 
     # Display image + metadata
     st.image(uploaded_file, width=300, caption=uploaded_file.name)
-    meta = get_image_metadata(uploaded_file)
+    meta = probe.as_metadata()
     st.write(f"🧬 Resolution: {meta['width']}x{meta['height']}, Size: {meta['size_MB']}MB")
 
-    # Save to temp location
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp:
-        tmp.write(uploaded_file.read())
-        tmp_path = tmp.name
+    # Queue for upload straight from the in-memory buffer (renamed for uniqueness)
+    extension = "jpg" if probe.format == "jpeg" else probe.format
+    upload_items.append(
+        UploadItem(uploaded_file, f"{uuid.uuid4()}.{extension}", session_folder_id, f"image/{probe.format}")
+    )
+
+# ───────────────────────────────────────────────
+# Parallel Upload to Google Drive
+if upload_items:
+    progress_bar = st.progress(0.0, text="Uploading to Drive...")
+
+    def show_progress(completed, total, bytes_sent, bytes_total):
+        sent_mb = bytes_sent / (1024 * 1024)
+        progress_bar.progress(completed / total, text=f"Uploaded {completed}/{total} files ({sent_mb:.1f}MB)")
 
-    # Upload to Google Drive
-    uploaded_file.name = f"{uuid.uuid4()}.jpg"  # rename for uniqueness
-    drive_link = upload_image_to_drive(drive, open(tmp_path, "rb"), uploaded_file.name, session_folder_id)
-    st.success(f"✅ Uploaded to Drive: [View File]({drive_link})")
+    results = upload_many(PyDriveBackend(drive), upload_items, on_progress=show_progress)
+    if any(result.folder_missing for result in results):
+        invalidate_drive_path(session_folder_path)  # folder gone: re-resolve its id on the next run
+    for result in results:
+        if result.ok:
+            st.success(f"✅ Uploaded to Drive: [View File]({result.link})")
+        else:
+            st.error(f"❌ {result.filename}: upload failed after {result.attempts} attempts ({result.error})")
 
-    # Clean up temp
-    os.remove(tmp_path)
+startup_profiler.finish()
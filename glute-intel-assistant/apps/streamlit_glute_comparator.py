@@ -1,33 +1,36 @@
 # apps/streamlit_glute_comparator.py (PRL+ final expansion)
 
 import streamlit as st
+
+from utils import startup_profiler
+startup_profiler.start(__file__)
+
 from PIL import Image, ImageDraw
-import os
-import io
 import datetime
-import torch
-from utils.clip_tagger import suggest_clip_tags
-from assistants.plan_generator import generate_glute_plan
+import pandas as pd
+from utils.comparison_engine import capture_date, chronological_order, compare_timepoints, timepoint_labels
+from utils.image_validator import probe_image
+from assistants.plan_generator import stream_glute_plan
 
 st.set_page_config(page_title="Before/After Glute Comparison", layout="wide")
 st.title("📊 Before/After Glute Visual Tracker + AI Transformation Feedback")
-st.markdown("Upload and compare two glute images to visually and semantically track transformation.")
+st.markdown("Upload two or more glute images of the same client and date each one to visually and semantically track transformation.")
 
 # Sidebar metadata entry
 st.sidebar.header("🗂️ Comparison Metadata")
 comparison_id = st.sidebar.text_input("Session or Client ID", value=f"glute_progress_{datetime.date.today()}")
 description = st.sidebar.text_area("Notes (e.g., Program used, key dates)", placeholder="e.g., Week 1 vs Week 8 after Glute Power Plan")
 
-col1, col2 = st.columns(2)
-with col1:
-    before_file = st.file_uploader("⬅️ Upload BEFORE Image", type=["jpg", "jpeg", "png"], key="before")
-with col2:
-    after_file = st.file_uploader("➡️ Upload AFTER Image", type=["jpg", "jpeg", "png"], key="after")
+uploaded_files = st.file_uploader(
+    "📅 Upload progress images (any order; each one is dated below)",
+    type=["jpg", "jpeg", "png"], accept_multiple_files=True, key="timepoints"
+)
 
 @st.cache_data
 def load_image(file):
-    img = Image.open(file).convert("RGB")
-    return img.resize((500, 700))
+    img = Image.open(file)
+    img.draft("RGB", (500, 700))  # reduced-scale JPEG decode; this is display only
+    return img.convert("RGB").resize((500, 700))
 
 def add_guidelines(image: Image.Image) -> Image.Image:
     draw = ImageDraw.Draw(image)
@@ -36,16 +39,34 @@ def add_guidelines(image: Image.Image) -> Image.Image:
     draw.line([(center_x, 0), (center_x, height)], fill="red", width=3)
     return image
 
-if before_file and after_file:
-    before_img = load_image(before_file)
-    after_img = load_image(after_file)
+if uploaded_files and len(uploaded_files) >= 2:
+    for file in uploaded_files:
+        probe = probe_image(file)
+        if not probe.is_valid:
+            st.error(f"❌ Image {file.name}: {probe.message}")
+            st.stop()
+
+    # Chronology comes from an explicit date per image (EXIF capture date by default), not upload order
+    st.markdown("### 🗓️ Timepoint Dates")
+    date_cols = st.columns(min(len(uploaded_files), 4))
+    dates = []
+    for i, file in enumerate(uploaded_files):
+        with date_cols[i % len(date_cols)]:
+            dates.append(st.date_input(f"Date of {file.name}", value=capture_date(file), key=f"date_{file.file_id}"))
+    if any(date is None for date in dates):
+        st.info("Set the date of every image to begin comparison.")
+        st.stop()
+
+    order = chronological_order(dates)
+    uploaded_files = [uploaded_files[i] for i in order]
+    labels = timepoint_labels([f.name for f in uploaded_files], [dates[i] for i in order])
+    images = [load_image(f) for f in uploaded_files]
 
     st.markdown("### 🔍 Visual Alignment Preview")
-    col1, col2 = st.columns(2)
-    with col1:
-        st.image(add_guidelines(before_img.copy()), caption="Before (w/ alignment)", use_column_width=True)
-    with col2:
-        st.image(add_guidelines(after_img.copy()), caption="After (w/ alignment)", use_column_width=True)
+    cols = st.columns(min(len(images), 4))
+    for i, (label, img) in enumerate(zip(labels, images)):
+        with cols[i % len(cols)]:
+            st.image(add_guidelines(img.copy()), caption=f"{label} (w/ alignment)", use_column_width=True)
 
     st.markdown("---")
     st.subheader("📌 Comparison Summary")
@@ -54,36 +75,60 @@ if before_file and after_file:
 
     layout = st.radio("View mode", ["Side-by-Side", "Stacked"])
     if layout == "Stacked":
-        st.image([before_img, after_img], caption=["Before", "After"], width=500)
+        st.image(images, caption=labels, width=500)
 
     timestamp = datetime.datetime.now().isoformat()
-    log_data = f"ID: {comparison_id}\nTimestamp: {timestamp}\nNotes: {description}"
+    log_data = f"ID: {comparison_id}\nTimestamp: {timestamp}\nNotes: {description}\nTimepoints: {', '.join(labels)}"
     st.download_button("📥 Download Log", log_data, file_name=f"{comparison_id}_log.txt")
 
     st.markdown("---")
     st.subheader("🧠 AI Tag Delta & Transformation Feedback")
 
-    before_tags = suggest_clip_tags(before_file, top_k=5)
-    after_tags = suggest_clip_tags(after_file, top_k=5)
-
-    st.markdown(f"**Before Tags:** `{', '.join(before_tags)}`")
-    st.markdown(f"**After Tags:** `{', '.join(after_tags)}`")
-
-    delta_tags = list(set(after_tags) - set(before_tags))
-    lost_tags = list(set(before_tags) - set(after_tags))
+    # One batched embedding pass for every timepoint; cached across reruns
+    comparison = compare_timepoints(uploaded_files, labels)
+    if not comparison.valid.all():
+        failed = [label for label, ok in zip(labels, comparison.valid) if not ok]
+        st.warning(f"Could not analyze: `{', '.join(failed)}`")
+
+    if comparison.anchors is None:
+        st.warning("At least two images must be analyzable to compare them.")
+        st.stop()
+    # Summaries run from the first to the last image that could actually be scored
+    first, last = comparison.anchors
+    before_tags = comparison.top_tags(first, 5)
+    after_tags = comparison.top_tags(last, 5)
+    st.markdown(f"**Before Tags ({labels[first]}):** `{', '.join(before_tags)}`")
+    st.markdown(f"**After Tags ({labels[last]}):** `{', '.join(after_tags)}`")
 
     st.markdown("#### 🧪 Tag Delta Analysis")
-    if delta_tags:
-        st.success(f"Gains/Improvements: `{', '.join(delta_tags)}`")
+    gains, losses = comparison.gains(), comparison.losses()
+    if gains:
+        st.success("Gains/Improvements: " + ", ".join(f"`{tag}` +{d * 100:.1f}pp" for tag, d in gains))
     else:
         st.info("No new dominant shape changes detected.")
-    if lost_tags:
-        st.warning(f"Reduced Traits: `{', '.join(lost_tags)}`")
+    if losses:
+        st.warning("Reduced Traits: " + ", ".join(f"`{tag}` {d * 100:.1f}pp" for tag, d in losses))
+    st.metric("Overall shape change (embedding cosine distance)", f"{comparison.drift[last]:.3f}")
+
+    st.markdown("#### 📈 Trend Across Timepoints")
+    trend_tags = [tag for tag, _ in comparison.top_changes(6)]
+    tag_index = [comparison.tags.index(tag) for tag in trend_tags]
+    st.line_chart(pd.DataFrame(comparison.probs[:, tag_index], index=labels, columns=trend_tags))
+    if len(labels) > 2:
+        st.line_chart(pd.DataFrame({"distance from first": comparison.drift}, index=labels))
+        with st.expander("Step-by-step probability deltas"):
+            st.dataframe(pd.DataFrame(
+                comparison.step_deltas,
+                index=[f"{a} → {b}" for a, b in zip(labels, labels[1:])],
+                columns=comparison.tags,
+            ).style.format("{:+.3f}"))
 
     st.markdown("#### 🧠 GPT Summary Plan Suggestion (Optional)")
     with st.expander("Generate Updated Plan Based on Change"):
         expert = st.selectbox("Expert Filter", ["Bret Contreras", "Jeff Nippard", "NASM"])
-        updated_plan = generate_glute_plan(glute_tags=after_tags, expert_source=expert)
-        st.markdown(updated_plan, unsafe_allow_html=True)
+        if st.button("Generate plan from the latest tags"):
+            st.write_stream(stream_glute_plan(glute_tags=after_tags, expert_source=expert))
 else:
-    st.info("Upload both a BEFORE and AFTER image to begin comparison.")
+    st.info("Upload at least a BEFORE and an AFTER image to begin comparison.")
+
+startup_profiler.finish()
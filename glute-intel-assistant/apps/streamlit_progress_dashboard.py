@@ -2,16 +2,26 @@
 
 import streamlit as st
 import os
-import pandas as pd
-import datetime
-from PIL import Image
-import matplotlib.pyplot as plt
 
-from assistants.assistant_chain_engine import auto_chain_for_session
+from utils import startup_profiler
+startup_profiler.start(__file__)
+
+from utils.background_jobs import start_workers, submit_job, get_job, latest_job, DONE, FAILED
+from utils.session_index import (
+    refresh_session_index, search_sessions, get_session_image_page, get_session_image_count
+)
+from utils.embedding_index import EmbeddingIndex, update_index_from_uploads
+from assistants.plan_generator import stream_glute_plan, INTELLIGENCE_PROFILES, ERROR_PREFIX
+from utils.session_store import (
+    get_session_plans, append_plan, get_session_top_tags, get_tag_totals, get_tag_timeline,
+    get_cohort_timeline, get_cohort_totals
+)
+from utils.thumbnails import get_thumbnail_path
 
 # ───────────────────────────────────────────────
 # CONFIGURATION
 st.set_page_config(page_title="📈 Glute Progress Tracker", layout="wide")
+start_workers()  # resume background jobs orphaned by a previous server process
 st.title("📈 Client Progress Tracker Dashboard")
 st.markdown("Track all sessions, tag evolution, and assistant-generated plans.")
 
@@ -19,35 +29,75 @@ st.markdown("Track all sessions, tag evolution, and assistant-generated plans.")
 # PATHS
 LOGS_DIR = "data/logs"
 UPLOADS_DIR = "uploads"
-TAG_LOG_PATH = "data/tag_logs.csv"
-PLAN_LOG_PATH = "data/plan_logs.csv"
+SESSIONS_PER_PAGE = 50
+IMAGES_PER_PAGE = 12
 
 # ───────────────────────────────────────────────
 # HELPERS
 
-def list_logs():
-    if not os.path.exists(LOGS_DIR):
-        os.makedirs(LOGS_DIR)
-    return sorted([f for f in os.listdir(LOGS_DIR) if f.endswith("_log.txt")], reverse=True)
+@st.cache_data(ttl=30, show_spinner=False)
+def sync_session_index():
+    # Incremental: only folders/logs whose mtime changed are re-read; at most every 30s per server
+    os.makedirs(LOGS_DIR, exist_ok=True)
+    return refresh_session_index(LOGS_DIR, UPLOADS_DIR)
 
 def load_image_thumbnail(path, size=(200, 280)):
-    return Image.open(path).resize(size)
-
-def load_tag_data():
-    if os.path.exists(TAG_LOG_PATH):
-        return pd.read_csv(TAG_LOG_PATH)
-    return pd.DataFrame(columns=["session_id", "tag", "timestamp"])
-
-def load_plan_archive():
-    if os.path.exists(PLAN_LOG_PATH):
-        return pd.read_csv(PLAN_LOG_PATH)
-    return pd.DataFrame(columns=["session_id", "plan_text", "timestamp"])
+    # Cached, reduced-scale thumbnail file; st.image serves it without a full-size decode
+    return get_thumbnail_path(path, size)
+
+def load_tag_totals(session_id):
+    return get_tag_totals(session_id)
+
+def load_tag_timeline(session_id, period):
+    # Rollup rows (bucket x tag) pivoted into one column per tag for st.line_chart
+    timeline = get_tag_timeline(session_id, period)
+    return timeline.pivot(index="bucket", columns="tag", values="count").fillna(0)
+
+def load_plan_archive(session_id):
+    return get_session_plans(session_id)
+
+@st.cache_resource
+def load_embedding_index():
+    return EmbeddingIndex.load()
+
+@st.fragment(run_every="2s")
+def render_chain_job(session_id):
+    """Polls the session's chain job without blocking the page (only this fragment reruns)."""
+    job_id = st.session_state.get(f"chain_job_{session_id}")
+    job = get_job(job_id) if job_id else latest_job("auto_chain", session_id=session_id)
+    if job is None:
+        return
+    if job.status == DONE:
+        result = job.result
+        st.success(f"✅ Tags: {', '.join(result['tags'])}")
+        st.caption(" · ".join(
+            f"{stage} {seconds * 1000:.0f}ms{' (cached)' if result['cached'][stage] else ''}"
+            for stage, seconds in result["timings"].items()
+        ))
+        st.markdown("**Generated Plan:**")
+        st.markdown(result["plan"], unsafe_allow_html=True)
+    elif job.status == FAILED:
+        st.error(f"Assistant chain failed: {job.error}")
+    else:
+        st.progress(job.progress, text=job.message or "Queued...")
 
 # ───────────────────────────────────────────────
 # UI: Sidebar Session Selector
-log_files = list_logs()
+sync_session_index()
 st.sidebar.title("📂 Session Logs")
-selected_log = st.sidebar.selectbox("Select Session", log_files)
+search_text = st.sidebar.text_input("Search Sessions", placeholder="Session ID contains...")
+with st.sidebar.expander("Filters"):
+    min_images = st.number_input("Min. images", min_value=0, value=0, step=1)
+    active_days = st.number_input("Active within (days, 0 = any)", min_value=0, value=0, step=7)
+session_filters = dict(min_images=min_images, active_within_days=active_days or None, has_log=True)
+_, session_total = search_sessions(search_text, limit=0, **session_filters)
+session_pages = max(1, -(-session_total // SESSIONS_PER_PAGE))
+session_page = st.sidebar.number_input(f"Page (of {session_pages})", min_value=1, max_value=session_pages, value=1) if session_pages > 1 else 1
+sessions_df, _ = search_sessions(
+    search_text, limit=SESSIONS_PER_PAGE, offset=(session_page - 1) * SESSIONS_PER_PAGE, **session_filters
+)
+st.sidebar.caption(f"{session_total} matching sessions")
+selected_log = st.sidebar.selectbox("Select Session", [f"{sid}_log.txt" for sid in sessions_df["session_id"]])
 
 if selected_log:
     session_id = selected_log.replace("_log.txt", "")
@@ -62,9 +112,13 @@ if selected_log:
     # ───────────────────────────────────────────────
     # IMAGE HISTORY DISPLAY
     subject_dir = os.path.join(UPLOADS_DIR, session_id)
-    if os.path.exists(subject_dir):
-        imgs = sorted([f for f in os.listdir(subject_dir) if f.endswith(('.jpg', '.jpeg', '.png'))])
-        st.markdown("### 📸 Uploaded Images")
+    image_count = get_session_image_count(session_id)
+    if image_count:
+        st.markdown(f"### 📸 Uploaded Images ({image_count})")
+        image_pages = max(1, -(-image_count // IMAGES_PER_PAGE))
+        image_page = st.number_input(f"Gallery page (of {image_pages})", min_value=1, max_value=image_pages, value=1) if image_pages > 1 else 1
+        # Only the visible page is fetched from the index and thumbnailed
+        imgs = get_session_image_page(session_id, limit=IMAGES_PER_PAGE, offset=(image_page - 1) * IMAGES_PER_PAGE)
         cols = st.columns(min(len(imgs), 3))
         for i, img in enumerate(imgs):
             with cols[i % len(cols)]:
@@ -73,22 +127,49 @@ if selected_log:
     else:
         st.warning("No image folder found. Check uploads directory.")
 
+    # ───────────────────────────────────────────────
+    # SIMILAR SESSIONS
+    with st.expander("🔎 Find Similar Sessions"):
+        if st.button("Find sessions with similar glute shape"):
+            index = load_embedding_index()
+            with st.spinner("Indexing new uploads..."):
+                update_index_from_uploads(index)
+            matches = index.similar_sessions(session_id, k=5)
+            if matches:
+                for other_id, score in matches:
+                    st.markdown(f"- `{other_id}` (similarity {score:.3f})")
+            else:
+                st.info("No indexed images for this session yet.")
+
     # ───────────────────────────────────────────────
     # TAG EVOLUTION TIMELINE
     with st.expander("📊 Tag Evolution Timeline"):
-        tag_df = load_tag_data()
-        tag_df = tag_df[tag_df.session_id == session_id]
-        if not tag_df.empty:
-            tag_chart = tag_df.groupby("tag").size().sort_values(ascending=False)
-            st.bar_chart(tag_chart)
+        totals = load_tag_totals(session_id)
+        if not totals.empty:
+            st.bar_chart(totals.set_index("tag")["count"])
+            period = st.radio("Timeline granularity", ["week", "day"], horizontal=True, key="timeline_period")
+            st.line_chart(load_tag_timeline(session_id, period))
         else:
             st.info("No tags logged yet.")
 
+    # ───────────────────────────────────────────────
+    # COHORT TRENDS (all clients)
+    with st.expander("👥 Cohort Tag Trends"):
+        cohort_totals = get_cohort_totals()
+        if not cohort_totals.empty:
+            st.dataframe(cohort_totals.rename(columns={"count": "tag rows", "sessions": "clients"}), hide_index=True)
+            top_cohort_tags = cohort_totals["tag"].head(8).tolist()
+            cohort_timeline = get_cohort_timeline("week")
+            cohort_timeline = cohort_timeline[cohort_timeline["tag"].isin(top_cohort_tags)]
+            st.markdown("**Clients carrying each top tag, per week**")
+            st.line_chart(cohort_timeline.pivot(index="bucket", columns="tag", values="sessions").fillna(0))
+        else:
+            st.info("No tags logged across clients yet.")
+
     # ───────────────────────────────────────────────
     # PLAN HISTORY VIEWER
     with st.expander("🧠 GPT Plan Archive"):
-        plan_df = load_plan_archive()
-        plan_df = plan_df[plan_df.session_id == session_id]
+        plan_df = load_plan_archive(session_id)
         if not plan_df.empty:
             for _, row in plan_df.iterrows():
                 st.markdown(f"**🗓️ {row['timestamp']}**")
@@ -97,12 +178,23 @@ if selected_log:
         else:
             st.info("No plans archived for this session.")
 
+        st.markdown("### ✍️ New Plan From Logged Tags")
+        archive_expert = st.selectbox("Intelligence Profile", INTELLIGENCE_PROFILES, key="archive_expert")
+        if st.button("Generate plan from this session's tags"):
+            top_tags = get_session_top_tags(session_id, 5)
+            if top_tags:
+                st.markdown(f"**Tags used:** `{', '.join(top_tags)}`")
+                plan_md = st.write_stream(stream_glute_plan(glute_tags=top_tags, expert_source=archive_expert))
+                if ERROR_PREFIX not in plan_md:
+                    append_plan(session_id, plan_md)
+            else:
+                st.info("No tags logged yet.")
+
         st.markdown("### 🔁 Run Assistant Chain for This Session")
         if st.button("⚡ Auto-generate tags and plan"):
-            tags, plan = auto_chain_for_session(session_id)
-            st.success(f"✅ Tags: {', '.join(tags)}")
-            st.markdown("**Generated Plan:**")
-            st.markdown(plan, unsafe_allow_html=True)
+            # Runs on the background worker pool; this rerun returns immediately
+            st.session_state[f"chain_job_{session_id}"] = submit_job("auto_chain", session_id=session_id)
+        render_chain_job(session_id)
 
     # ───────────────────────────────────────────────
     # LOG EXPORT
@@ -112,3 +204,4 @@ if selected_log:
 else:
     st.info("Please select a session log from the sidebar to begin.")
 
+startup_profiler.finish()
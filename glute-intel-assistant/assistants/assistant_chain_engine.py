@@ -1,103 +1,273 @@
-# apps/streamlit_progress_dashboard.py (PRL+ Step 4: Integrated Assistant Chaining Engine)
+# assistants/assistant_chain_engine.py
+#
+# Incremental assistant chain: session images → embeddings → tags → plan → logs.
+# Every stage output is cached under a key derived from its inputs' content, so re-chaining
+# an unchanged session is a folder listing plus a few lookups, and a session that gained a
+# photo only embeds that photo before re-tagging (and re-planning only if the tags moved).
 
-import streamlit as st
+import hashlib
+import json
 import os
-import pandas as pd
-import datetime
-from PIL import Image
-import matplotlib.pyplot as plt
-from collections import defaultdict
-from assistants.assistant_chain_engine import auto_chain_for_session
-
-st.set_page_config(page_title="📈 Glute Progress Tracker", layout="wide")
-st.title("📈 Client Progress Tracker Dashboard")
-st.markdown("Browse, review, and track all before/after sessions, shape tag deltas, and plan summaries.")
-
-LOGS_DIR = "data/logs"
-UPLOADS_DIR = "uploads"
-TAG_LOG_PATH = "data/tag_logs.csv"
-PLAN_LOG_PATH = "data/plan_logs.csv"
-
-@st.cache_data
-def list_logs():
-    if not os.path.exists(LOGS_DIR):
-        os.makedirs(LOGS_DIR)
-    files = [f for f in os.listdir(LOGS_DIR) if f.endswith("_log.txt")]
-    return sorted(files, reverse=True)
-
-@st.cache_data
-def load_image_thumbnail(path, size=(200, 280)):
-    return Image.open(path).resize(size)
-
-@st.cache_data
-def load_tag_data():
-    if os.path.exists(TAG_LOG_PATH):
-        return pd.read_csv(TAG_LOG_PATH)
-    return pd.DataFrame(columns=["session_id", "tag", "timestamp"])
-
-@st.cache_data
-def load_plan_archive():
-    if os.path.exists(PLAN_LOG_PATH):
-        return pd.read_csv(PLAN_LOG_PATH)
-    return pd.DataFrame(columns=["session_id", "plan_text", "timestamp"])
-
-log_files = list_logs()
-st.sidebar.title("📂 Session Log Viewer")
-selected_log = st.sidebar.selectbox("Choose a Session Log", log_files)
-
-if selected_log:
-    log_path = os.path.join(LOGS_DIR, selected_log)
-    with open(log_path, "r") as f:
-        lines = f.readlines()
-    meta_lines = [line.strip() for line in lines if line.strip()]
-    st.subheader(f"📝 Summary: {selected_log}")
-    for line in meta_lines:
-        st.markdown(f"- {line}")
-
-    session_id = selected_log.replace("_log.txt", "")
-    subject_dir = os.path.join(UPLOADS_DIR, session_id)
-    if os.path.exists(subject_dir):
-        st.markdown("### 📸 Image History")
-        imgs = sorted([f for f in os.listdir(subject_dir) if f.endswith(('.jpg', '.jpeg', '.png'))])
-        cols = st.columns(min(len(imgs), 3))
-        for i, img_name in enumerate(imgs):
-            with cols[i % len(cols)]:
-                img_path = os.path.join(subject_dir, img_name)
-                st.image(load_image_thumbnail(img_path), caption=img_name)
-    else:
-        st.warning("No matching image folder found. Please ensure 'uploads/session_id/' is synced.")
-
-    with st.expander("📊 Tag Change History (Evolution Timeline)"):
-        tag_df = load_tag_data()
-        tag_df = tag_df[tag_df["session_id"] == session_id]
-        if not tag_df.empty:
-            grouped = tag_df.groupby("tag").size().sort_values(ascending=False)
-            st.bar_chart(grouped)
-            st.markdown("This graph shows the distribution of dominant glute shape tags over time.")
-        else:
-            st.info("No tag history found for this session.")
-
-    with st.expander("🧠 GPT Plan Archive"):
-        plan_df = load_plan_archive()
-        plan_df = plan_df[plan_df["session_id"] == session_id]
-        if not plan_df.empty:
-            for idx, row in plan_df.iterrows():
-                st.markdown(f"**🗓️ {row['timestamp']}**")
-                st.markdown(row['plan_text'], unsafe_allow_html=True)
-                st.markdown("---")
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+
+from assistants.plan_generator import ERROR_PREFIX, generate_glute_plan, plan_cache_key
+from utils.clip_tagger import GLUTE_TAGS, rank_tags
+from utils.embedding_cache import content_key, get_embedding_cache
+from utils.embedding_index import IMAGE_EXTENSIONS, UPLOADS_DIR
+from utils.inference_backends import embedding_model_id
+from utils.model_registry import CLIP_MODEL_NAME
+from utils.session_store import append_plan, append_tags
+
+LOGS_DIR = os.path.join("data", "logs")
+STAGE_CACHE_PATH = os.path.join("data", "cache", "chain_stages.sqlite")
+CHAIN_WORKERS = 4
+CHAIN_TOP_K = 5
+
+_local = threading.local()
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+# ───────────────────────────────────────────────
+# STAGE CACHE
+
+def _stage_db(path: str = STAGE_CACHE_PATH) -> sqlite3.Connection:
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS stages "
+            "(stage TEXT, key TEXT, value TEXT, created_at TEXT, PRIMARY KEY (stage, key))"
+        )
+        connections[path] = conn
+    return conn
+
+
+def stage_cache_get(stage: str, key: str) -> tuple:
+    """Returns (hit, value); a cached None (e.g. a logs stage with nothing to write) is still a hit."""
+    row = _stage_db().execute("SELECT value FROM stages WHERE stage = ? AND key = ?", (stage, key)).fetchone()
+    return (True, json.loads(row[0])) if row else (False, None)
+
+
+def stage_cache_put(stage: str, key: str, value):
+    _stage_db().execute(
+        "INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?)",
+        (stage, key, json.dumps(value), datetime.utcnow().isoformat(timespec="seconds")),
+    )
+
+
+# ───────────────────────────────────────────────
+# STAGES
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One node of the chain. key_inputs decide the cache key (key_fn); run_inputs are only
+    resolved on a cache miss, so an unchanged key never pulls its expensive upstream stages.
+    A key_fn of None means the stage always runs (it is the source of truth, e.g. a folder listing).
+    """
+    name: str
+    run_fn: callable
+    run_inputs: tuple = ()
+    key_inputs: tuple = ()
+    key_fn: callable = None
+    cacheable: callable = lambda value: True
+
+
+def _list_images(ctx):
+    """Session images as [name, path, content_key]; unchanged files are never re-hashed."""
+    folder = os.path.join(ctx.uploads_dir, ctx.session_id)
+    if not os.path.isdir(folder):
+        return []
+    images = []
+    with os.scandir(folder) as entries:
+        for entry in sorted(entries, key=lambda e: e.name):
+            if not (entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS)):
+                continue
+            st = entry.stat()
+            fingerprint = _digest(os.path.abspath(entry.path), st.st_size, st.st_mtime_ns, ctx.cache_id)
+            hit, key = stage_cache_get("fingerprint", fingerprint)
+            if not hit:
+                key = content_key(entry.path, ctx.cache_id)
+                stage_cache_put("fingerprint", fingerprint, key)
+            images.append([entry.name, entry.path, key])
+    return images
+
+
+def _embed_images(ctx, images):
+    """
+    Embeddings per image (None if unreadable); only images missing from the embedding cache hit the model.
+    Content keys are already known, so each image is looked up in the cache exactly once.
+    """
+    from utils.inference_client import embed_images_shared
+
+    cache = get_embedding_cache(ctx.cache_id)
+    embeds = [cache.get(key) if cache is not None else None for _, _, key in images]
+    missing = [i for i, e in enumerate(embeds) if e is None]
+    if missing:
+        computed = embed_images_shared([images[i][1] for i in missing], model_name=ctx.model_name, use_cache=False)
+        for i, e in zip(missing, computed):
+            embeds[i] = e
+            if e is not None and cache is not None:
+                cache.put(images[i][2], e)
+    return embeds
+
+
+def _tag_session(ctx, embeds):
+    from utils.label_embeddings import score_labels
+
+    valid = [e for e in embeds if e is not None]
+    if not valid:
+        return []
+    probs = score_labels(np.stack(valid), GLUTE_TAGS, ctx.model_name).mean(axis=0)
+    return [tag for tag, _ in rank_tags(probs)[:ctx.top_k]]
+
+
+def _generate_plan(ctx, tags):
+    if not tags:
+        return ""
+    return generate_glute_plan(tags, ctx.fitness_level, ctx.goals, ctx.expert_source)
+
+
+def _write_logs(ctx, tags, plan):
+    """Logs the chain output once per distinct (tags, plan); returns the timestamp written."""
+    if not tags:
+        return None
+    timestamp = datetime.utcnow().isoformat(timespec="seconds")
+    append_tags([(ctx.session_id, tag, timestamp) for tag in tags])
+    if plan and not plan.startswith(ERROR_PREFIX):
+        append_plan(ctx.session_id, plan, timestamp)
+    os.makedirs(LOGS_DIR, exist_ok=True)
+    with open(os.path.join(LOGS_DIR, f"{ctx.session_id}_log.txt"), "a") as f:
+        f.write(f"{timestamp} assistant chain: {', '.join(tags)}\n")
+    return timestamp
+
+
+STAGES = {
+    stage.name: stage for stage in (
+        Stage("images", _list_images),
+        Stage("embeddings", _embed_images, run_inputs=("images",)),
+        Stage(
+            "tags", _tag_session, run_inputs=("embeddings",), key_inputs=("images",),
+            key_fn=lambda ctx, images: _digest(ctx.cache_id, ctx.top_k, [key for _, _, key in images]),
+        ),
+        Stage(
+            "plan", _generate_plan, run_inputs=("tags",), key_inputs=("tags",),
+            key_fn=lambda ctx, tags: plan_cache_key(tags, ctx.fitness_level, ctx.goals, ctx.expert_source),
+            cacheable=lambda plan: not plan.startswith(ERROR_PREFIX),
+        ),
+        Stage(
+            "logs", _write_logs, run_inputs=("tags", "plan"), key_inputs=("tags", "plan"),
+            key_fn=lambda ctx, tags, plan: _digest(ctx.session_id, tags, plan),
+        ),
+    )
+}
+
+
+# ───────────────────────────────────────────────
+# RUNNER
+
+@dataclass
+class ChainResult:
+    session_id: str
+    tags: list
+    plan: str
+    timings: dict = field(default_factory=dict)   # stage -> seconds (own work, excluding upstream stages)
+    cached: dict = field(default_factory=dict)    # stage -> True if served from the stage cache
+
+
+class _ChainRun:
+    def __init__(self, session_id, uploads_dir, model_name, top_k, fitness_level, goals, expert_source, on_stage=None):
+        self.session_id = session_id
+        self.uploads_dir = uploads_dir
+        self.model_name = model_name
+        self.cache_id = embedding_model_id(model_name)
+        self.top_k = top_k
+        self.fitness_level = fitness_level
+        self.goals = goals
+        self.expert_source = expert_source
+        self.on_stage = on_stage
+        self.values, self.timings, self.cached = {}, {}, {}
+
+    def resolve(self, name):
+        if name in self.values:
+            return self.values[name]
+        stage = STAGES[name]
+        key = None
+        if stage.key_fn is not None:
+            key_args = [self.resolve(dep) for dep in stage.key_inputs]
+            start = time.perf_counter()
+            key = stage.key_fn(self, *key_args)
+            hit, value = stage_cache_get(name, key)
+            if hit:
+                self.timings[name] = time.perf_counter() - start
+                self.cached[name] = True
+                self.values[name] = value
+                self._stage_done(name)
+                return value
+            lookup = time.perf_counter() - start
         else:
-            st.info("No archived plans found for this session.")
+            lookup = 0.0
+        run_args = [self.resolve(dep) for dep in stage.run_inputs]
+        start = time.perf_counter()
+        value = stage.run_fn(self, *run_args)
+        if key is not None and stage.cacheable(value):
+            stage_cache_put(name, key, value)
+        self.timings[name] = lookup + time.perf_counter() - start
+        self.cached[name] = False
+        self.values[name] = value
+        self._stage_done(name)
+        return value
+
+    def _stage_done(self, name):
+        if self.on_stage is not None:
+            self.on_stage(name, len(self.values))
+
+
+def chain_session(session_id: str, fitness_level="Intermediate", goals="Aesthetic Shape + Strength",
+                  expert_source="Bret Contreras", top_k: int = CHAIN_TOP_K, uploads_dir: str = UPLOADS_DIR,
+                  model_name: str = CLIP_MODEL_NAME, on_stage=None) -> ChainResult:
+    """
+    Runs the chain for one session, re-running only the stages whose inputs changed.
+    on_stage(stage_name, stages_resolved) is called as each stage finishes.
+    """
+    run = _ChainRun(session_id, uploads_dir, model_name, top_k, fitness_level, goals, expert_source, on_stage)
+    run.resolve("logs")
+    return ChainResult(session_id, run.values["tags"], run.values["plan"], run.timings, run.cached)
+
+
+def chain_sessions(session_ids, workers: int = CHAIN_WORKERS, **kwargs) -> dict:
+    """Chains independent sessions in parallel. Returns {session_id: ChainResult}."""
+    session_ids = list(session_ids)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda sid: chain_session(sid, **kwargs), session_ids)
+        return dict(zip(session_ids, results))
+
+
+def auto_chain_for_session(session_id: str, **kwargs) -> tuple:
+    """Tags and a plan for a session's uploaded images: (tags, plan_markdown)."""
+    result = chain_session(session_id, **kwargs)
+    return result.tags, result.plan
 
-        st.markdown("---")
-        st.markdown("### 🔁 Run Assistant Chaining for This Session")
-        if st.button("⚡ Auto-Generate Tags + Plan for this Session"):
-            tags, plan = auto_chain_for_session(session_id)
-            st.success(f"✅ Assistant chaining complete! Tags: {', '.join(tags)}")
-            st.markdown("**New Plan Preview:**")
-            st.markdown(plan, unsafe_allow_html=True)
 
-    with st.expander("📤 Export Options"):
-        st.download_button("📥 Download Session Log", "".join(meta_lines), file_name=selected_log)
-else:
-    st.info("Select a session log from the sidebar to view full tracking history.")
+def auto_chain_job(report_progress, session_id: str, **kwargs) -> dict:
+    """Background job: chain_session with per-stage progress."""
+    def on_stage(name, resolved):
+        report_progress(resolved / len(STAGES), f"{name} done")
 
+    result = chain_session(session_id, on_stage=on_stage, **kwargs)
+    return {"tags": result.tags, "plan": result.plan, "timings": result.timings, "cached": result.cached}
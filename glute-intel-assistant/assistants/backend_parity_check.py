@@ -0,0 +1,58 @@
+# assistants/backend_parity_check.py
+#
+# Compares int8 / ONNX CLIP backends against fp32 on local images:
+#   python assistants/backend_parity_check.py --images uploads --limit 64
+#   python assistants/backend_parity_check.py --random-model   (offline, tiny random CLIP + synthetic images)
+
+import argparse
+import json
+import os
+import sys
+
+# Add parent folder to path for imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from PIL import Image
+
+from utils.embedding_index import IMAGE_EXTENSIONS
+from utils.inference_backends import BACKENDS, parity_check, register_random_clip
+from utils.model_registry import CLIP_MODEL_NAME
+
+
+def _local_images(root, limit):
+    paths = []
+    for dirpath, _, filenames in os.walk(root):
+        paths.extend(os.path.join(dirpath, f) for f in sorted(filenames) if f.lower().endswith(IMAGE_EXTENSIONS))
+        if len(paths) >= limit:
+            break
+    return paths[:limit]
+
+
+def _synthetic_images(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [Image.fromarray(rng.integers(0, 256, (64, 48, 3), dtype=np.uint8)) for _ in range(count)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report top-k agreement and latency of CLIP backends vs fp32.")
+    parser.add_argument("--images", default="uploads", help="Folder searched recursively for images")
+    parser.add_argument("--limit", type=int, default=64, help="Max images to compare")
+    parser.add_argument("--backends", nargs="+", default=[b for b in BACKENDS if b != "torch"], choices=BACKENDS)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--random-model", action="store_true", help="Use a tiny random CLIP and synthetic images (offline)")
+    args = parser.parse_args(argv)
+
+    if args.random_model:
+        model_name, images = register_random_clip(), _synthetic_images(args.limit)
+    else:
+        model_name, images = CLIP_MODEL_NAME, _local_images(args.images, args.limit)
+        if not images:
+            parser.error(f"no images found under {args.images}")
+
+    report = parity_check(images, backends=args.backends, top_k=args.top_k, model_name=model_name)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
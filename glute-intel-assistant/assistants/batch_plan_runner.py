@@ -0,0 +1,247 @@
+# assistants/batch_plan_runner.py
+#
+# Rate-limited batch plan generation for many sessions:
+#   python assistants/batch_plan_runner.py --all-tagged --concurrency 8 --rpm 500 --tpm 40000
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import deque
+
+# Add parent folder to path for imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from assistants.plan_generator import (
+    PLAN_MODEL, PLAN_MAX_TOKENS, _openai, acomplete_plan, plan_cache, plan_cache_key, plan_request
+)
+from utils.session_store import (
+    DB_PATH, completed_plan_jobs, get_session_top_tags, record_plan, tagged_session_ids
+)
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RPM = 500
+DEFAULT_TPM = 40000
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+WINDOW_SECONDS = 60.0
+CHARS_PER_TOKEN = 4  # rough prompt-size estimate used to reserve TPM budget before a request
+
+# USD per 1K tokens (prompt, completion) for the cost report
+MODEL_PRICING = {"gpt-4": (0.03, 0.06)}
+
+TRANSIENT_ERROR_NAMES = ("RateLimitError", "APIError", "Timeout", "TryAgain", "ServiceUnavailableError",
+                         "APIConnectionError")
+
+
+def transient_errors() -> tuple:
+    """openai exception classes worth retrying (resolved lazily, like plan_generator's openai import)."""
+    errors = getattr(_openai(), "error", None)
+    return tuple(getattr(errors, name) for name in TRANSIENT_ERROR_NAMES if hasattr(errors, name))
+
+
+class MinuteWindow:
+    """
+    Sliding-window budget: at most `limit` units are spent in any WINDOW_SECONDS span, via acquire().
+    (A refilling token bucket would let a full minute's burst plus the refill through in one minute.)
+    """
+
+    def __init__(self, per_minute: float):
+        self.limit = float(per_minute)
+        self.total = 0.0
+        self._spent = deque()  # (time, amount), oldest first
+        self._lock = asyncio.Lock()
+
+    def _expire(self, now: float):
+        while self._spent and self._spent[0][0] <= now - WINDOW_SECONDS:
+            self.total -= self._spent.popleft()[1]
+
+    def _wait_seconds(self, amount: float, now: float) -> float:
+        """Time until enough of the window's spending ages out for `amount` to fit."""
+        needed, freed = self.total + amount - self.limit, 0.0
+        for spent_at, spent in self._spent:
+            freed += spent
+            if freed >= needed:
+                return spent_at + WINDOW_SECONDS - now
+        return WINDOW_SECONDS
+
+    async def acquire(self, amount: float = 1.0):
+        amount = min(amount, self.limit)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._expire(now)
+                if self.total + amount <= self.limit:
+                    break
+                await asyncio.sleep(max(self._wait_seconds(amount, now), 0.001))
+            self._spent.append((now, amount))
+            self.total += amount
+
+    def adjust(self, delta: float):
+        """Corrects a reservation once the real usage is known (may push the window over budget)."""
+        self._spent.append((time.monotonic(), delta))
+        self.total += delta
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits applied together."""
+
+    def __init__(self, rpm: float = DEFAULT_RPM, tpm: float = DEFAULT_TPM):
+        self.requests = MinuteWindow(rpm)
+        self.tokens = MinuteWindow(tpm)
+
+    async def acquire(self, estimated_tokens: int):
+        await self.requests.acquire(1)
+        await self.tokens.acquire(estimated_tokens)
+
+
+class RunStats:
+    def __init__(self):
+        self.completed = 0
+        self.cached = 0
+        self.failed = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.started = time.perf_counter()
+
+    def cost(self, model: str = PLAN_MODEL) -> float:
+        prompt_price, completion_price = MODEL_PRICING.get(model, (0.0, 0.0))
+        return (self.prompt_tokens * prompt_price + self.completion_tokens * completion_price) / 1000
+
+    def report(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        minutes = elapsed / 60 if elapsed > 0 else 1e-9
+        return {
+            "completed": self.completed,
+            "from_cache": self.cached,
+            "failed": self.failed,
+            "retries": self.retries,
+            "elapsed_s": round(elapsed, 1),
+            "plans_per_min": round(self.completed / minutes, 1),
+            "tokens_per_min": round((self.prompt_tokens + self.completion_tokens) / minutes),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost(), 4),
+        }
+
+
+def _estimate_tokens(messages) -> int:
+    return sum(len(m["content"]) for m in messages) // CHARS_PER_TOKEN + PLAN_MAX_TOKENS
+
+
+def _backoff(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+async def _complete(plan_inputs: tuple, limiter: RateLimiter, stats: RunStats, retries: int = MAX_RETRIES):
+    """
+    One plan completion (plan_generator's request for (tags, level, goals, expert)) under the
+    rate limiter, retrying transient failures.
+    """
+    estimate = _estimate_tokens(plan_request(*plan_inputs)["messages"])
+    transient = transient_errors()
+    for attempt in range(retries + 1):
+        await limiter.acquire(estimate)
+        try:
+            response = await acomplete_plan(*plan_inputs)
+        except transient:
+            if attempt == retries:
+                raise
+            stats.retries += 1
+            await asyncio.sleep(_backoff(attempt))
+            continue
+        usage = response.get("usage") or {}
+        if usage:
+            stats.prompt_tokens += usage.get("prompt_tokens", 0)
+            stats.completion_tokens += usage.get("completion_tokens", 0)
+            limiter.tokens.adjust(usage.get("total_tokens", estimate) - estimate)
+        return response['choices'][0]['message']['content']
+
+
+def plan_jobs_for_sessions(session_ids, top_k=5, fitness_level="Intermediate", goals="Aesthetic Shape + Strength",
+                           expert_source="Bret Contreras", db_path=DB_PATH) -> list:
+    """[(session_id, tags, job_key)] for every session that has tags; the key changes when the inputs do."""
+    jobs = []
+    for sid in session_ids:
+        tags = get_session_top_tags(sid, top_k, db_path)
+        if tags:
+            jobs.append((sid, tags, plan_cache_key(tags, fitness_level, goals, expert_source)))
+    return jobs
+
+
+async def run_batch(session_ids, fitness_level="Intermediate", goals="Aesthetic Shape + Strength",
+                    expert_source="Bret Contreras", top_k=5, concurrency=DEFAULT_CONCURRENCY,
+                    rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, use_cache=True, db_path=DB_PATH) -> dict:
+    """
+    Generates and archives a plan for each session from its most frequent logged tags.
+    Each plan is archived together with its checkpoint row as soon as it completes, so a rerun
+    only does sessions whose inputs changed or that didn't finish. Returns the run report.
+    """
+    done = completed_plan_jobs(db_path)
+    jobs = [job for job in plan_jobs_for_sessions(session_ids, top_k, fitness_level, goals, expert_source, db_path)
+            if (job[0], job[2]) not in done]
+    total = len(jobs)
+    print(f"{len(session_ids) - total} sessions up to date or untagged, {total} to go")
+
+    limiter = RateLimiter(rpm, tpm)
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = RunStats()
+
+    async def _run(session_id, tags, job_key):
+        async with semaphore:
+            plan_text = plan_cache.get(job_key) if use_cache else None
+            if plan_text is not None:
+                stats.cached += 1
+            else:
+                try:
+                    plan_text = await _complete((tags, fitness_level, goals, expert_source), limiter, stats)
+                except Exception as e:
+                    stats.failed += 1
+                    print(f"❌ {session_id}: {e}")
+                    return
+                plan_cache.put(job_key, plan_text)
+            record_plan(session_id, plan_text, job_key, db_path=db_path)
+            stats.completed += 1
+            if stats.completed % 10 == 0 or stats.completed == total:
+                report = stats.report()
+                print(f"{stats.completed}/{total} plans, {report['plans_per_min']} plans/min, ${report['cost_usd']:.2f}")
+
+    await asyncio.gather(*(_run(*job) for job in jobs))
+    return stats.report()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Regenerate archived glute plans for many sessions under rate limits.")
+    parser.add_argument("sessions", nargs="*", help="Session IDs to plan (default: see --all-tagged)")
+    parser.add_argument("--all-tagged", action="store_true", help="Plan every session with logged tags")
+    parser.add_argument("--db", default=DB_PATH, help="Session store to read tags from and archive plans into")
+    parser.add_argument("--expert", default="Bret Contreras", help="Intelligence profile")
+    parser.add_argument("--fitness-level", default="Intermediate")
+    parser.add_argument("--goals", default="Aesthetic Shape + Strength")
+    parser.add_argument("--top-k", type=int, default=5, help="Most frequent tags used per session")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Requests in flight")
+    parser.add_argument("--rpm", type=float, default=DEFAULT_RPM, help="Requests per minute limit")
+    parser.add_argument("--tpm", type=float, default=DEFAULT_TPM, help="Tokens per minute limit")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the API, even for cached plans")
+    args = parser.parse_args(argv)
+
+    session_ids = sorted(tagged_session_ids(args.db)) if args.all_tagged else args.sessions
+    if not session_ids:
+        parser.error("pass session IDs or --all-tagged")
+
+    report = asyncio.run(run_batch(
+        session_ids, args.fitness_level, args.goals, args.expert, top_k=args.top_k,
+        concurrency=args.concurrency, rpm=args.rpm, tpm=args.tpm, use_cache=not args.no_cache, db_path=args.db,
+    ))
+    print(f"✅ {report['completed']} plans ({report['from_cache']} from cache, {report['failed']} failed, "
+          f"{report['retries']} retries) in {report['elapsed_s']}s — {report['plans_per_min']} plans/min, "
+          f"{report['tokens_per_min']} tokens/min, ${report['cost_usd']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
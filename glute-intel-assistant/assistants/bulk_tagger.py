@@ -0,0 +1,144 @@
+# assistants/bulk_tagger.py
+#
+# Offline bulk tagger for the uploads/ tree:
+#   python assistants/bulk_tagger.py --workers 4 --batch-size 32
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# Add parent folder to path for imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+
+from utils.clip_features import load_rgb, preprocess_images, embed_pixel_values, auto_batch_size
+from utils.clip_tagger import GLUTE_TAGS, rank_tags
+from utils.embedding_cache import content_key, get_embedding_cache
+from utils.embedding_index import UPLOADS_DIR, list_session_images
+from utils.inference_backends import BACKENDS, embedding_model_id, set_backend
+from utils.label_embeddings import score_labels
+from utils.model_registry import CLIP_MODEL_NAME
+from utils.session_store import DB_PATH, record_image_tags, tagged_images
+from utils.thumbnails import get_thumbnail_path
+
+
+def _image_ref(session_id, filename):
+    return f"{session_id}/{filename}"
+
+
+def _preprocess(path):
+    """Worker: decode + CLIP preprocessing. Returns pixel values, or None if unreadable."""
+    try:
+        return preprocess_images([load_rgb(path)])[0]
+    except Exception:
+        return None
+
+
+def _ensure_thumbnail(path):
+    """Worker: generate the dashboard thumbnail at ingest time."""
+    try:
+        get_thumbnail_path(path)
+    except Exception:
+        pass
+
+
+def _embed_chunk(chunk, executor, batch_size):
+    """Embeds a chunk of (session_id, filename, path), using the embedding cache where possible."""
+    cache_id = embedding_model_id(CLIP_MODEL_NAME)
+    cache = get_embedding_cache(cache_id)
+    embeds = [None] * len(chunk)
+    keys = [None] * len(chunk)
+    misses = []
+    for i, (_, _, path) in enumerate(chunk):
+        if cache is not None:
+            try:
+                keys[i] = content_key(path, cache_id)
+            except OSError:
+                continue  # deleted or unreadable since it was listed: checkpointed with no tags
+            embeds[i] = cache.get(keys[i])
+        if embeds[i] is None:
+            misses.append(i)
+
+    thumbnails = executor.map(_ensure_thumbnail, [path for _, _, path in chunk])
+    pixels = list(executor.map(_preprocess, [chunk[i][2] for i in misses]))
+    list(thumbnails)
+    decoded = [(i, p) for i, p in zip(misses, pixels) if p is not None]
+    for start in range(0, len(decoded), batch_size):
+        batch = decoded[start:start + batch_size]
+        vectors = embed_pixel_values(np.stack([p for _, p in batch]))
+        for (i, _), vector in zip(batch, vectors):
+            embeds[i] = vector
+            if cache is not None:
+                cache.put(keys[i], vector)
+    return embeds
+
+
+def bulk_tag(uploads_dir=UPLOADS_DIR, db_path=DB_PATH, top_k=3, batch_size=None, workers=None, chunk_size=256):
+    """
+    Tags every image under uploads/ that the session store hasn't seen yet, logging one
+    tag row per top-k tag as each chunk completes. Tag rows and the "image tagged" checkpoint
+    are written in one transaction, so an interrupted run resumes without duplicates.
+    Returns the number of images tagged.
+    """
+    batch_size = batch_size or auto_batch_size()
+    done = tagged_images(db_path)
+    todo = [img for img in list_session_images(uploads_dir) if _image_ref(img[0], img[1]) not in done]
+    total = len(todo)
+    print(f"{len(done)} images already tagged, {total} to go")
+    if not todo:
+        return 0
+
+    tagged = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_start in range(0, total, chunk_size):
+            chunk = todo[chunk_start:chunk_start + chunk_size]
+            embeds = _embed_chunk(chunk, executor, batch_size)
+            valid = [i for i, e in enumerate(embeds) if e is not None]
+            timestamp = datetime.utcnow().isoformat(timespec="seconds")
+
+            # Unreadable images are checkpointed too (with no tags) so they aren't retried forever
+            chunk_tags = [[] for _ in chunk]
+            if valid:
+                probs = score_labels(np.stack([embeds[i] for i in valid]), GLUTE_TAGS)
+                for i, row in zip(valid, probs):
+                    chunk_tags[i] = [tag for tag, _ in rank_tags(row)[:top_k]]
+            record_image_tags(
+                [(sid, _image_ref(sid, name), tags, timestamp) for (sid, name, _), tags in zip(chunk, chunk_tags)],
+                db_path,
+            )
+
+            tagged += len(valid)
+            elapsed = time.perf_counter() - start
+            processed = chunk_start + len(chunk)
+            print(f"{processed}/{total} images, {processed / elapsed:.1f} img/s")
+
+    return tagged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-tag every image under uploads/ with CLIP shape tags.")
+    parser.add_argument("--uploads-dir", default=UPLOADS_DIR)
+    parser.add_argument("--db", default=DB_PATH, help="Session store to log tags into")
+    parser.add_argument("--top-k", type=int, default=3, help="Tags logged per image")
+    parser.add_argument("--batch-size", type=int, default=None, help="CLIP batch size (default: fit to memory)")
+    parser.add_argument("--workers", type=int, default=None, help="Decode worker processes (default: CPU count)")
+    parser.add_argument("--backend", choices=BACKENDS, default=None, help="CLIP inference backend (default: $CLIP_BACKEND or torch)")
+    args = parser.parse_args(argv)
+    if args.backend:
+        set_backend(args.backend)
+
+    start = time.perf_counter()
+    tagged = bulk_tag(args.uploads_dir, args.db, top_k=args.top_k, batch_size=args.batch_size, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    rate = tagged / elapsed if elapsed > 0 else 0.0
+    print(f"✅ Tagged {tagged} images in {elapsed:.1f}s ({rate:.1f} img/s)")
+
+
+if __name__ == "__main__":
+    main()
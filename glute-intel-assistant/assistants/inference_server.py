@@ -0,0 +1,241 @@
+# assistants/inference_server.py
+#
+# Shared CLIP inference server for all Streamlit apps on a node:
+#   python assistants/inference_server.py                      # unix:data/inference.sock
+#   python assistants/inference_server.py --address tcp:127.0.0.1:8777 --max-wait-ms 10
+# Concurrent embed requests are coalesced into micro-batches; a bounded queue applies backpressure.
+# Clients send embedding-cache keys and paths: hits are served from the shared on-disk cache, files
+# are read here, and only uploads that are neither are reported missing for the client to send.
+
+import argparse
+import base64
+import io
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+# Add parent folder to path for imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils import inference_client
+from utils.embedding_cache import get_embedding_cache
+from utils.inference_backends import BACKENDS, active_backend, embedding_model_id
+from utils.inference_client import INFERENCE_SERVER, parse_address
+from utils.model_registry import CLIP_MODEL_NAME
+
+MAX_BATCH_SIZE = 32
+MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", 10))
+MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", 256))   # images waiting; beyond this requests get "busy"
+
+
+class MicroBatcher:
+    """
+    Collects images from concurrent requests and embeds them together: a batch is flushed
+    when it reaches max_batch_size or when its oldest image has waited max_wait_ms.
+    """
+
+    def __init__(self, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, max_queue=MAX_QUEUE):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self._queue = queue.Queue()
+        self._depth = 0
+        self._depth_lock = threading.Lock()
+        self.batches = 0
+        self.images = 0
+        self.rejected = 0
+        threading.Thread(target=self._loop, name="micro-batcher", daemon=True).start()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._depth
+
+    def submit(self, sources: list, model_name: str = CLIP_MODEL_NAME, backend: str = None) -> list:
+        """
+        Queues a request's images (paths or raw bytes); returns their futures, or None if the queue
+        is full (backpressure).
+        """
+        backend = backend or active_backend()
+        with self._depth_lock:
+            if self._depth + len(sources) > self.max_queue and self._depth > 0:
+                self.rejected += 1
+                return None
+            self._depth += len(sources)
+        futures = []
+        for source in sources:
+            future = Future()
+            self._queue.put(((model_name, backend), source, future))
+            futures.append(future)
+        return futures
+
+    def _loop(self):
+        from utils.clip_features import embed_files
+
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            with self._depth_lock:
+                self._depth -= len(batch)
+            by_model = {}
+            for model, source, future in batch:
+                by_model.setdefault(model, []).append((source, future))
+            for (model_name, backend), group in by_model.items():
+                try:
+                    sources = [io.BytesIO(s) if isinstance(s, bytes) else s for s, _ in group]
+                    embeds = embed_files(sources, batch_size=len(group), model_name=model_name, backend=backend)
+                    for (_, future), embed in zip(group, embeds):
+                        future.set_result(embed)
+                except Exception as e:
+                    for _, future in group:
+                        future.set_exception(e)
+            self.batches += 1
+            self.images += len(batch)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "images": self.images,
+            "mean_batch_size": round(self.images / self.batches, 2) if self.batches else 0.0,
+            "rejected_requests": self.rejected,
+        }
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """One connection = a stream of JSON-line requests, answered in order."""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                reply = self.server.dispatch(json.loads(line))
+            except Exception as e:
+                reply = {"error": str(e)}
+            self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class _ServerMixin:
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128  # listen backlog: every app thread keeps its own connection
+
+    def _embed(self, payload: dict) -> dict:
+        model_name = payload.get("model") or CLIP_MODEL_NAME
+        backend = payload.get("backend") or active_backend()
+        if backend not in BACKENDS:
+            return {"error": f"unknown backend: {backend}"}
+        cache = get_embedding_cache(embedding_model_id(model_name, backend))
+
+        refs = payload["items"]
+        embeds, missing, work = [None] * len(refs), [], []
+        for i, ref in enumerate(refs):
+            if ref is None:
+                continue
+            embed = cache.get(ref["key"]) if cache is not None else None
+            if embed is not None:
+                embeds[i] = embed
+            elif "data" in ref:
+                work.append((i, base64.b64decode(ref["data"])))
+            elif ref.get("path") and os.path.isfile(ref["path"]):
+                work.append((i, ref["path"]))
+            else:
+                missing.append(i)  # an upload, or a path on another host: the client sends its bytes
+
+        if work:
+            futures = self.batcher.submit([source for _, source in work], model_name, backend)
+            if futures is None:
+                return {"error": "busy", "queue_depth": self.batcher.queue_depth}
+            for (i, _), future in zip(work, futures):
+                embeds[i] = future.result()
+        reply = {"embeddings": [e.tolist() if e is not None else None for e in embeds]}
+        if missing:
+            reply["missing"] = missing
+        return reply
+
+    def dispatch(self, payload: dict) -> dict:
+        op = payload.get("op")
+        if op == "embed":
+            return self._embed(payload)
+        if op == "label_features":
+            from utils.label_embeddings import get_label_features
+
+            features, logit_scale = get_label_features(payload["labels"], payload["model"])
+            return {"features": features.tolist(), "logit_scale": logit_scale}
+        if op == "stats":
+            from utils.model_registry import registry_stats
+
+            return dict(self.batcher.stats(), **registry_stats())
+        return {"error": f"unknown op: {op}"}
+
+
+class UnixInferenceServer(_ServerMixin, socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    pass
+
+
+class TCPInferenceServer(_ServerMixin, socketserver.ThreadingMixIn, socketserver.TCPServer):
+    pass
+
+
+def serve(address: str = INFERENCE_SERVER, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS,
+          max_queue=MAX_QUEUE, warm_up: bool = True):
+    """Runs the server until interrupted."""
+    inference_client.disable()  # this process is the server: never call out to itself
+    parsed = parse_address(address)
+    if parsed is None:
+        raise ValueError("INFERENCE_SERVER is off; pass --address unix:<path> or tcp:<host>:<port>")
+    family, bind_address = parsed
+    if family == getattr(socket, "AF_UNIX", None):
+        os.makedirs(os.path.dirname(bind_address) or ".", exist_ok=True)
+        if os.path.exists(bind_address):
+            os.unlink(bind_address)  # stale socket from a previous run
+        server = UnixInferenceServer(bind_address, _Handler)
+    else:
+        server = TCPInferenceServer(bind_address, _Handler)
+    server.batcher = MicroBatcher(max_batch_size, max_wait_ms, max_queue)
+
+    if warm_up:
+        from utils.model_registry import get_clip
+
+        get_clip()
+    print(f"🧠 Inference server listening on {address} (batch ≤ {max_batch_size}, wait ≤ {max_wait_ms}ms)")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if family == getattr(socket, "AF_UNIX", None) and os.path.exists(bind_address):
+            os.unlink(bind_address)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared CLIP inference server with micro-batching.")
+    parser.add_argument("--address", default=INFERENCE_SERVER, help="unix:<path> or tcp:<host>:<port>")
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS, help="Max time an image waits for batch-mates")
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE, help="Queued images before requests are rejected as busy")
+    parser.add_argument("--no-warm-up", action="store_true", help="Load the model on first request instead of at startup")
+    args = parser.parse_args(argv)
+    try:
+        serve(args.address, args.max_batch_size, args.max_wait_ms, args.max_queue, warm_up=not args.no_warm_up)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
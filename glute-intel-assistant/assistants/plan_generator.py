@@ -1,10 +1,27 @@
 # assistants/plan_generator.py (PRL+ upgraded with intelligence selector)
 
-import openai
+import asyncio
+import hashlib
+import json
 import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
 
-# OpenAI API key should be stored in environment variables
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# Completion settings
+PLAN_MODEL = "gpt-4"
+PLAN_TEMPERATURE = 0.7
+PLAN_MAX_TOKENS = 900
+SYSTEM_PROMPT = "You are a top-tier personal trainer and program designer."
+ERROR_PREFIX = "Error generating plan:"
+PLAN_CONCURRENCY = int(os.getenv("PLAN_CONCURRENCY", 4))  # parallel completions for multi-profile runs
+
+# Plan cache (in-memory LRU in front of a persistent SQLite tier)
+PLAN_CACHE_PATH = os.path.join("data", "cache", "plan_cache.sqlite")
+PLAN_CACHE_TTL_SECONDS = int(os.getenv("PLAN_CACHE_TTL_SECONDS", 7 * 24 * 60 * 60))
+PLAN_CACHE_MEMORY_ENTRIES = int(os.getenv("PLAN_CACHE_MEMORY_ENTRIES", 256))
+PLAN_CACHE_DISK_ENTRIES = int(os.getenv("PLAN_CACHE_DISK_ENTRIES", 10000))
 
 # Top 20 trusted sources for glute transformation (used in GPT conditioning)
 INTELLIGENCE_PROFILES = [
@@ -30,11 +47,117 @@ INTELLIGENCE_PROFILES = [
     "Body by Bret Academy"
 ]
 
-def generate_glute_plan(glute_tags: list, user_fitness_level="Intermediate", goals="Aesthetic Shape + Strength", expert_source="Bret Contreras") -> str:
+def plan_cache_key(glute_tags: list, user_fitness_level="Intermediate", goals="Aesthetic Shape + Strength",
+                   expert_source="Bret Contreras") -> str:
+    """Cache key over normalized inputs: tag order, duplicates, case and whitespace don't matter."""
+    normalized = {
+        "tags": sorted({" ".join(str(t).split()).lower() for t in glute_tags if str(t).strip()}),
+        "level": " ".join(str(user_fitness_level).split()).lower(),
+        "goals": " ".join(str(goals).split()).lower(),
+        "expert": " ".join(str(expert_source).split()).lower(),
+        "model": [PLAN_MODEL, PLAN_TEMPERATURE, PLAN_MAX_TOKENS],
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class PlanCache:
     """
-    Generates a glute plan conditioned on the expert source selected.
+    Two-tier plan cache: a bounded in-memory LRU in front of a size-bounded SQLite table
+    shared by every app process. Entries expire after ttl_seconds.
     """
-    prompt = f"""
+
+    def __init__(self, path=PLAN_CACHE_PATH, ttl_seconds=PLAN_CACHE_TTL_SECONDS,
+                 max_memory_entries=PLAN_CACHE_MEMORY_ENTRIES, max_disk_entries=PLAN_CACHE_DISK_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _conn(self):
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS plans (key TEXT PRIMARY KEY, plan_text TEXT, created_at REAL, last_used REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_plans_last_used ON plans (last_used)")
+        return self._db
+
+    def _remember(self, key, created_at, plan_text):
+        self._memory[key] = (created_at, plan_text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        """Returns the cached plan text, or None on a miss / expired entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[0] < self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[1]
+            self._memory.pop(key, None)
+
+            try:
+                db = self._conn()
+                row = db.execute("SELECT plan_text, created_at FROM plans WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[1] < self.ttl_seconds:
+                    db.execute("UPDATE plans SET last_used = ? WHERE key = ?", (now, key))
+                    self._remember(key, row[1], row[0])
+                    self.disk_hits += 1
+                    return row[0]
+                if row is not None:
+                    db.execute("DELETE FROM plans WHERE key = ?", (key,))
+            except sqlite3.Error:
+                pass
+            self.misses += 1
+            return None
+
+    def put(self, key: str, plan_text: str):
+        """Caches a successfully generated plan. Error strings are never stored."""
+        if not plan_text or plan_text.startswith(ERROR_PREFIX):
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, plan_text)
+            try:
+                db = self._conn()
+                db.execute("INSERT OR REPLACE INTO plans VALUES (?, ?, ?, ?)", (key, plan_text, now, now))
+                db.execute(
+                    "DELETE FROM plans WHERE key IN "
+                    "(SELECT key FROM plans ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,),
+                )
+            except sqlite3.Error:
+                pass
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+
+plan_cache = PlanCache()
+
+
+def build_plan_prompt(glute_tags: list, user_fitness_level="Intermediate", goals="Aesthetic Shape + Strength",
+                      expert_source="Bret Contreras") -> str:
+    return f"""
 You are acting as a personal coach trained under the glute transformation philosophy of: {expert_source}.
 Create a weekly glute-building workout plan tailored to someone with the following traits:
 - Glute Tags: {', '.join(glute_tags)}
@@ -50,17 +173,187 @@ Include:
 Respond in clear markdown format as if you were delivering this to a client.
     """
 
+
+def plan_messages(prompt: str) -> list:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _openai():
+    """The openai module, imported on first use (it adds ~0.5s to every app's startup)."""
+    import openai
+
+    # OpenAI API key should be stored in environment variables
+    openai.api_key = openai.api_key or os.getenv("OPENAI_API_KEY")
+    return openai
+
+
+def plan_request(glute_tags: list, user_fitness_level="Intermediate", goals="Aesthetic Shape + Strength",
+                 expert_source="Bret Contreras", **options) -> dict:
+    """ChatCompletion arguments for one plan; every caller (sync, streaming, async, batch) builds its request here."""
+    return dict(
+        model=PLAN_MODEL,
+        messages=plan_messages(build_plan_prompt(glute_tags, user_fitness_level, goals, expert_source)),
+        temperature=PLAN_TEMPERATURE,
+        max_tokens=PLAN_MAX_TOKENS,
+        **options
+    )
+
+
+async def acomplete_plan(glute_tags: list, user_fitness_level="Intermediate", goals="Aesthetic Shape + Strength",
+                         expert_source="Bret Contreras") -> dict:
+    """Raw async completion for one plan (including token usage); API errors propagate to the caller."""
+    return await _openai().ChatCompletion.acreate(**plan_request(glute_tags, user_fitness_level, goals, expert_source))
+
+
+def generate_glute_plan(glute_tags: list, user_fitness_level="Intermediate", goals="Aesthetic Shape + Strength", expert_source="Bret Contreras", use_cache=True) -> str:
+    """
+    Generates a glute plan conditioned on the expert source selected.
+    Identical (normalized) inputs are served from the plan cache instead of a new GPT call.
+    """
+    key = plan_cache_key(glute_tags, user_fitness_level, goals, expert_source)
+    if use_cache:
+        cached = plan_cache.get(key)
+        if cached is not None:
+            return cached
+
+    try:
+        response = _openai().ChatCompletion.create(**plan_request(glute_tags, user_fitness_level, goals, expert_source))
+        plan_text = response['choices'][0]['message']['content']
+    except Exception as e:
+        return f"{ERROR_PREFIX} {str(e)}"
+
+    if use_cache:
+        plan_cache.put(key, plan_text)
+    return plan_text
+
+
+def _delta_text(chunk) -> str:
+    return chunk['choices'][0].get('delta', {}).get('content') or ""
+
+
+def _stream_error(e, parts) -> str:
+    # Mid-stream failures are appended below the partial plan rather than replacing it
+    separator = "\n\n" if parts else ""
+    return f"{separator}{ERROR_PREFIX} {str(e)}"
+
+
+def stream_glute_plan(glute_tags: list, user_fitness_level="Intermediate", goals="Aesthetic Shape + Strength", expert_source="Bret Contreras", use_cache=True):
+    """
+    Same plan as generate_glute_plan, yielded as markdown chunks as the completion streams in
+    (e.g. for st.write_stream). Cache hits are yielded in one piece; only complete plans are cached.
+    """
+    key = plan_cache_key(glute_tags, user_fitness_level, goals, expert_source)
+    if use_cache:
+        cached = plan_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    parts = []
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a top-tier personal trainer and program designer."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=900
+        for chunk in _openai().ChatCompletion.create(
+            **plan_request(glute_tags, user_fitness_level, goals, expert_source, stream=True)
+        ):
+            text = _delta_text(chunk)
+            if text:
+                parts.append(text)
+                yield text
+    except Exception as e:
+        yield _stream_error(e, parts)
+        return
+
+    if use_cache:
+        plan_cache.put(key, "".join(parts))
+
+
+async def astream_glute_plan(glute_tags: list, user_fitness_level="Intermediate", goals="Aesthetic Shape + Strength", expert_source="Bret Contreras", use_cache=True):
+    """Async counterpart of stream_glute_plan."""
+    key = plan_cache_key(glute_tags, user_fitness_level, goals, expert_source)
+    if use_cache:
+        cached = plan_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    parts = []
+    try:
+        response = await _openai().ChatCompletion.acreate(
+            **plan_request(glute_tags, user_fitness_level, goals, expert_source, stream=True)
         )
-        return response['choices'][0]['message']['content']
+        async for chunk in response:
+            text = _delta_text(chunk)
+            if text:
+                parts.append(text)
+                yield text
     except Exception as e:
-        return f"Error generating plan: {str(e)}"
+        yield _stream_error(e, parts)
+        return
+
+    if use_cache:
+        plan_cache.put(key, "".join(parts))
+
+
+async def agenerate_glute_plan(glute_tags: list, user_fitness_level="Intermediate", goals="Aesthetic Shape + Strength", expert_source="Bret Contreras", use_cache=True) -> str:
+    """Async counterpart of generate_glute_plan (non-blocking, so many plans can be in flight at once)."""
+    key = plan_cache_key(glute_tags, user_fitness_level, goals, expert_source)
+    if use_cache:
+        cached = plan_cache.get(key)
+        if cached is not None:
+            return cached
+
+    try:
+        response = await acomplete_plan(glute_tags, user_fitness_level, goals, expert_source)
+        plan_text = response['choices'][0]['message']['content']
+    except Exception as e:
+        return f"{ERROR_PREFIX} {str(e)}"
+
+    if use_cache:
+        plan_cache.put(key, plan_text)
+    return plan_text
+
+
+async def agenerate_profile_plans(glute_tags: list, profiles=None, user_fitness_level="Intermediate", goals="Aesthetic Shape + Strength", max_concurrency=PLAN_CONCURRENCY, use_cache=True, on_plan=None) -> dict:
+    """
+    Generates one plan per intelligence profile concurrently. Returns {profile: plan_text} in profile order.
+    on_plan(profile, completed, total) is called as each plan finishes.
+    """
+    profiles = list(profiles or INTELLIGENCE_PROFILES)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    completed = 0
+
+    async def _one(profile):
+        nonlocal completed
+        async with semaphore:
+            plan_text = await agenerate_glute_plan(glute_tags, user_fitness_level, goals, profile, use_cache=use_cache)
+        completed += 1
+        if on_plan is not None:
+            on_plan(profile, completed, len(profiles))
+        return plan_text
+
+    plans = await asyncio.gather(*(_one(p) for p in profiles))
+    return dict(zip(profiles, plans))
+
+
+def generate_profile_plans(glute_tags: list, profiles=None, user_fitness_level="Intermediate", goals="Aesthetic Shape + Strength", max_concurrency=PLAN_CONCURRENCY, use_cache=True, on_plan=None) -> dict:
+    """Blocking wrapper around agenerate_profile_plans for synchronous callers (e.g. Streamlit scripts)."""
+    return asyncio.run(agenerate_profile_plans(glute_tags, profiles, user_fitness_level, goals, max_concurrency, use_cache, on_plan))
+
+
+def profile_plans_job(report_progress, glute_tags: list, profiles: list, user_fitness_level="Intermediate", goals="Aesthetic Shape + Strength") -> dict:
+    """
+    Background job: generate_profile_plans with per-plan progress. Fails when no plan could be
+    generated; when only some failed, the job finishes with a "k of n plans failed" message.
+    """
+    def on_plan(profile, completed, total):
+        report_progress(completed / total, f"{profile} ready")
 
+    plans = generate_profile_plans(glute_tags, profiles, user_fitness_level, goals, on_plan=on_plan)
+    failed = [profile for profile, plan_text in plans.items() if plan_text.startswith(ERROR_PREFIX)]
+    if failed and len(failed) == len(plans):
+        raise RuntimeError(plans[failed[0]])
+    if failed:
+        report_progress(1.0, f"{len(failed)} of {len(plans)} plans failed: {', '.join(failed)}")
+    return plans
@@ -1,62 +1,152 @@
 # assistants/validator_bot.py
 
+import json
 import os
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from utils.session_store import (
+    DB_PATH, session_has_tags, session_has_plans, tagged_session_ids, planned_session_ids
+)
+
 DATA_DIR = "data"
 UPLOADS_DIR = "uploads"
 LOGS_DIR = os.path.join(DATA_DIR, "logs")
-TAG_LOG = os.path.join(DATA_DIR, "tag_logs.csv")
-PLAN_LOG = os.path.join(DATA_DIR, "plan_logs.csv")
+MANIFEST_PATH = os.path.join(DATA_DIR, "validator_manifest.json")
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+SCAN_WORKERS = 16
 
 
 def get_sessions():
     """Return all session folders and log file basenames"""
-    session_ids = []
-    if os.path.exists(UPLOADS_DIR):
-        session_ids = [d for d in os.listdir(UPLOADS_DIR) if os.path.isdir(os.path.join(UPLOADS_DIR, d))]
-    return sorted(session_ids)
+    if not os.path.exists(UPLOADS_DIR):
+        return []
+    with os.scandir(UPLOADS_DIR) as entries:
+        return sorted(e.name for e in entries if e.is_dir())
+
+
+def _session_issues(has_images, has_tags, has_plans, has_log):
+    issues = []
+    if not has_images:
+        issues.append("❌ Missing or invalid image folder")
+    if not has_tags:
+        issues.append("⚠️ No tags found in tag log")
+    if not has_plans:
+        issues.append("⚠️ No plan generated or archived")
+    if not has_log:
+        issues.append("⚠️ No session log file found")
+    return issues if issues else ["✅ Session is complete"]
+
+
+def _has_images(session_path):
+    try:
+        with os.scandir(session_path) as entries:
+            return any(e.name.endswith(IMAGE_EXTENSIONS) for e in entries)
+    except OSError:
+        return False
 
 
 def validate_session(session_id):
     """Check if a session has images, tag history, and plan history"""
-    issues = []
     session_path = os.path.join(UPLOADS_DIR, session_id)
     log_path = os.path.join(LOGS_DIR, f"{session_id}_log.txt")
+    return _session_issues(
+        has_images=_has_images(session_path),
+        has_tags=session_has_tags(session_id),
+        has_plans=session_has_plans(session_id),
+        has_log=os.path.exists(log_path),
+    )
 
-    # Check image uploads
-    if not os.path.exists(session_path) or not any(f.endswith(('.jpg', '.jpeg', '.png')) for f in os.listdir(session_path)):
-        issues.append("❌ Missing or invalid image folder")
 
-    # Check tag logs
-    if os.path.exists(TAG_LOG):
-        tag_df = pd.read_csv(TAG_LOG)
-        if session_id not in tag_df.session_id.values:
-            issues.append("⚠️ No tags found in tag_logs.csv")
-    else:
-        issues.append("⚠️ tag_logs.csv not found")
-
-    # Check plan logs
-    if os.path.exists(PLAN_LOG):
-        plan_df = pd.read_csv(PLAN_LOG)
-        if session_id not in plan_df.session_id.values:
-            issues.append("⚠️ No plan generated or archived")
-    else:
-        issues.append("⚠️ plan_logs.csv not found")
-
-    # Check session log
-    if not os.path.exists(log_path):
-        issues.append("⚠️ No session log file found")
+def _load_manifest(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
-    return issues if issues else ["✅ Session is complete"]
 
+def _save_manifest(manifest, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def _log_mtimes():
+    """mtime of every session log, from a single directory listing."""
+    if not os.path.exists(LOGS_DIR):
+        return {}
+    with os.scandir(LOGS_DIR) as entries:
+        return {
+            e.name[:-len("_log.txt")]: e.stat().st_mtime
+            for e in entries if e.name.endswith("_log.txt")
+        }
+
+
+def _store_signature(db_path=DB_PATH):
+    """Changes whenever the session store (or its WAL) is written."""
+    return [os.path.getmtime(p) if os.path.exists(p) else None for p in (db_path, f"{db_path}-wal")]
+
+
+def _scan_session(session_id, previous):
+    """Re-lists the session folder only if its mtime changed since the last run."""
+    session_path = os.path.join(UPLOADS_DIR, session_id)
+    try:
+        dir_mtime = os.stat(session_path).st_mtime
+    except OSError:
+        return {"dir_mtime": None, "has_images": False}
+    if previous and previous.get("dir_mtime") == dir_mtime:
+        return {"dir_mtime": dir_mtime, "has_images": previous["has_images"]}
+    return {"dir_mtime": dir_mtime, "has_images": _has_images(session_path)}
+
+
+def validate_all_sessions(incremental=True, manifest_path=MANIFEST_PATH):
+    """
+    Validate every session currently stored.
+    Tag/plan membership is loaded once into sets, session folders are scanned in parallel,
+    and (when incremental) sessions whose folder, session log and the tag/plan store are all
+    unchanged since the last run reuse their previous result from the manifest.
+    """
+    manifest = _load_manifest(manifest_path) if incremental else {}
+    previous_sessions = manifest.get("sessions", {})
+    store_signature = _store_signature()
+    store_unchanged = manifest.get("store_signature") == store_signature
 
-def validate_all_sessions():
-    """Validate every session currently stored"""
     session_ids = get_sessions()
-    report = {}
+    log_mtimes = _log_mtimes()
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+        scans = dict(zip(session_ids, pool.map(
+            lambda sid: _scan_session(sid, previous_sessions.get(sid)), session_ids
+        )))
+
+    tagged = planned = None
+    report, sessions = {}, {}
     for sid in session_ids:
-        report[sid] = validate_session(sid)
-    return report
+        entry = dict(scans[sid], log_mtime=log_mtimes.get(sid))
+        prev = previous_sessions.get(sid)
+        unchanged = (
+            store_unchanged and prev is not None
+            and prev.get("dir_mtime") == entry["dir_mtime"] and prev.get("log_mtime") == entry["log_mtime"]
+        )
+        if unchanged:
+            entry["issues"] = prev["issues"]
+        else:
+            if tagged is None:
+                tagged, planned = tagged_session_ids(), planned_session_ids()
+            entry["issues"] = _session_issues(
+                has_images=entry["has_images"],
+                has_tags=sid in tagged,
+                has_plans=sid in planned,
+                has_log=entry["log_mtime"] is not None,
+            )
+        sessions[sid] = entry
+        report[sid] = entry["issues"]
 
+    _save_manifest({
+        "validated_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "store_signature": store_signature,
+        "sessions": sessions,
+    }, manifest_path)
+    return report
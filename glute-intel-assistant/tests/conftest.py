@@ -0,0 +1,64 @@
+# tests/conftest.py
+
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+# Add parent folder to path for imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+@pytest.fixture(autouse=True)
+def isolated_data_dir(tmp_path, monkeypatch):
+    """Every test runs in its own working directory, so data/ caches and databases start empty."""
+    from utils import session_store
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(session_store, "_local", threading.local())  # connections are cached per relative path
+    return tmp_path
+
+
+@pytest.fixture(scope="session")
+def random_clip():
+    """Name of a tiny randomly initialized CLIP registered in the model registry (no download)."""
+    pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    from utils.inference_backends import register_random_clip
+
+    return register_random_clip()
+
+
+@pytest.fixture
+def random_images():
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    return [Image.fromarray(rng.integers(0, 256, (40, 48, 3), dtype=np.uint8)) for _ in range(6)]
+
+
+@pytest.fixture
+def stub_openai(monkeypatch, tmp_path):
+    """
+    Points the openai module at a local stub server and gives plan_generator an empty plan cache.
+    Set server.fail (every request), server.fail_profiles (requests mentioning one of these
+    strings) or server.fail_next (the next n requests) to get 500 errors.
+    """
+    import openai
+
+    from assistants import plan_generator
+    from assistants.plan_generator import PlanCache
+    from openai_stub import StubOpenAI
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenAI)
+    server.requests, server.fail, server.fail_profiles, server.fail_next = [], False, (), 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(openai, "api_base", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setattr(openai, "api_key", "sk-test")
+    monkeypatch.setattr(plan_generator, "plan_cache", PlanCache(str(tmp_path / "plan_cache.sqlite")))
+    yield server
+    server.shutdown()
+    server.server_close()
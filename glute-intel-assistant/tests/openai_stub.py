@@ -0,0 +1,52 @@
+# tests/openai_stub.py
+#
+# Local stub of the (legacy) OpenAI chat completions endpoint, shared by the plan tests.
+
+import json
+from http.server import BaseHTTPRequestHandler
+
+CHUNKS = ["## Week 1\n", "Hip thrusts ", "4x8"]
+PLAN_TEXT = "".join(CHUNKS)
+
+
+class StubOpenAI(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(body)
+        failing = self.server.fail or any(name in json.dumps(body) for name in self.server.fail_profiles)
+        if self.server.fail_next:
+            self.server.fail_next -= 1
+            failing = True
+        if failing:
+            payload = json.dumps({"error": {"message": "stub overloaded", "type": "server_error"}}).encode()
+            self.send_response(500)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for text in CHUNKS:
+                event = {"object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": text}}]}
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+
+        payload = json.dumps({
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": PLAN_TEXT}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
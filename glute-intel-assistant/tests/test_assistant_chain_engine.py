@@ -0,0 +1,67 @@
+# tests/test_assistant_chain_engine.py
+
+import threading
+
+import numpy as np
+import pytest
+
+from assistants import assistant_chain_engine as chain
+from assistants.assistant_chain_engine import chain_session, stage_cache_get, stage_cache_put
+
+
+@pytest.fixture(autouse=True)
+def fresh_stage_db(monkeypatch):
+    monkeypatch.setattr(chain, "_local", threading.local())
+
+
+def test_cached_none_is_a_hit():
+    assert stage_cache_get("logs", "k") == (False, None)
+    stage_cache_put("logs", "k", None)
+    assert stage_cache_get("logs", "k") == (True, None)
+
+
+def test_unchanged_session_serves_every_keyed_stage_from_cache(tmp_path):
+    (tmp_path / "uploads" / "empty_session").mkdir(parents=True)
+    first = chain_session("empty_session", uploads_dir=str(tmp_path / "uploads"))
+    assert first.tags == [] and first.plan == ""
+    assert not any(first.cached.values())
+
+    second = chain_session("empty_session", uploads_dir=str(tmp_path / "uploads"))
+    # The logs stage returned None (no tags to log) and must still be a cache hit
+    assert second.cached == {"images": False, "tags": True, "plan": True, "logs": True}
+
+
+class _CountingCache:
+    def __init__(self, stored):
+        self.stored = dict(stored)
+        self.gets = []
+
+    def get(self, key):
+        self.gets.append(key)
+        return self.stored.get(key)
+
+    def put(self, key, embedding):
+        self.stored[key] = embedding
+
+
+def test_embeddings_look_up_each_image_once(monkeypatch):
+    from utils import inference_client
+
+    cache = _CountingCache({"k1": np.ones(4, dtype=np.float32)})
+    embedded = []
+
+    def fake_embed(items, batch_size=None, model_name=None, use_cache=True):
+        assert use_cache is False  # the chain already looked these up
+        embedded.extend(items)
+        return [np.full(4, 2, dtype=np.float32) for _ in items]
+
+    monkeypatch.setattr(chain, "get_embedding_cache", lambda cache_id: cache)
+    monkeypatch.setattr(inference_client, "embed_images_shared", fake_embed)
+
+    ctx = chain._ChainRun("s", "uploads", "model", 5, "Intermediate", "goals", "expert")
+    images = [["a.jpg", "path/a.jpg", "k1"], ["b.jpg", "path/b.jpg", "k2"]]
+    embeds = chain._embed_images(ctx, images)
+
+    assert cache.gets == ["k1", "k2"]
+    assert embedded == ["path/b.jpg"]
+    assert embeds[1][0] == 2 and "k2" in cache.stored
@@ -0,0 +1,99 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from utils import background_jobs as jobs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def fresh_jobs_state(monkeypatch):
+    monkeypatch.setattr(jobs, "_local", threading.local())
+    monkeypatch.setattr(jobs, "_recovered", False)
+    monkeypatch.setattr(jobs, "_handlers", {"echo": lambda report, value: {"value": value}})
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def _insert_orphan(owner_pid: int, status=jobs.RUNNING, kind="echo", params=None) -> str:
+    params = params or {"value": 1}
+    job_id = f"orphan-{owner_pid}-{status}"
+    now = jobs._now()
+    jobs._conn().execute(
+        "INSERT INTO jobs (id, kind, dedup_key, params, status, owner_pid, created_at, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (job_id, kind, jobs.dedup_key(kind, params), json.dumps(params), status, owner_pid, now, now),
+    )
+    return job_id
+
+
+def _wait_finished(job_id: str, timeout: float = 10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = jobs.get_job(job_id)
+        if job.finished:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+@pytest.mark.parametrize("module", ["assistants.plan_generator", "assistants.assistant_chain_engine"])
+def test_importing_job_modules_has_no_side_effects(module, tmp_path):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=tmp_path, env=env, check=True)
+    assert not (tmp_path / "data" / "jobs.sqlite").exists()
+
+
+def test_submit_runs_on_daemon_workers():
+    job = _wait_finished(jobs.submit_job("echo", value=3))
+    assert job.status == jobs.DONE and job.result == {"value": 3}
+    assert jobs._workers and all(worker.daemon for worker in jobs._workers)
+
+
+def test_submit_rejects_unknown_kind():
+    with pytest.raises(KeyError):
+        jobs.submit_job("nope")
+
+
+def test_start_workers_resumes_orphans_once():
+    job_id = _insert_orphan(_dead_pid())
+    assert jobs.start_workers() == 1
+    job = _wait_finished(job_id)
+    assert job.status == jobs.DONE and job.result == {"value": 1}
+    assert jobs.start_workers() == 0
+
+
+def test_start_workers_skips_jobs_of_live_processes():
+    _insert_orphan(os.getpid())
+    assert jobs.start_workers() == 0
+
+
+def test_submit_reclaims_an_orphan_with_the_same_params():
+    job_id = _insert_orphan(_dead_pid(), params={"value": 7})
+    assert jobs.submit_job("echo", value=7) == job_id
+    job = _wait_finished(job_id)
+    assert job.status == jobs.DONE and job.result == {"value": 7}
+
+
+def test_orphan_claimed_elsewhere_is_not_run_twice(monkeypatch):
+    dead = _dead_pid()
+    job_id = _insert_orphan(dead)
+
+    def claimed_by_other_process(pid):
+        # Another app process claims the job between our SELECT and UPDATE
+        jobs._conn().execute("UPDATE jobs SET owner_pid = ? WHERE id = ?", (dead + 1, job_id))
+        return False
+
+    monkeypatch.setattr(jobs, "_pid_alive", claimed_by_other_process)
+    assert jobs.start_workers() == 0
+    assert jobs.get_job(job_id).status == jobs.RUNNING
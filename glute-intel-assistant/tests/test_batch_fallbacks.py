@@ -0,0 +1,42 @@
+# tests/test_batch_fallbacks.py
+
+import numpy as np
+
+from utils import clip_tagger, image_analysis, pose_classifier
+
+
+def _broken_scoring(*args, **kwargs):
+    raise AttributeError("'BaseModelOutputWithPooling' object has no attribute 'norm'")
+
+
+def _fake_embeds(items, batch_size=None):
+    return [np.ones(16, dtype=np.float32) if item != "unreadable" else None for item in items]
+
+
+def test_tagger_falls_back_when_scoring_fails(monkeypatch):
+    monkeypatch.setattr(clip_tagger, "embed_images_shared", _fake_embeds)
+    monkeypatch.setattr(clip_tagger, "score_labels", _broken_scoring)
+    assert clip_tagger.suggest_clip_tags_batch(["a.jpg", "unreadable"]) == [["Unknown"], ["Unknown"]]
+
+
+def test_pose_classifier_falls_back_when_scoring_fails(monkeypatch):
+    monkeypatch.setattr(pose_classifier, "embed_images_shared", _fake_embeds)
+    monkeypatch.setattr(pose_classifier, "score_labels", _broken_scoring)
+    assert pose_classifier.classify_pose_batch(["a.jpg"]) == [("Front", 33.3)]
+
+
+def test_analysis_falls_back_per_image(monkeypatch):
+    monkeypatch.setattr(image_analysis, "embed_images_shared", _fake_embeds)
+    monkeypatch.setattr(image_analysis, "score_labels", _broken_scoring)
+    results = image_analysis.analyze_images(["a.jpg", "unreadable"])
+    assert [r.pose for r in results] == ["Front", "Front"]
+    assert "Could not score image" in results[0].error
+    assert results[1].error == "Could not decode or embed image"
+
+
+def test_tagger_falls_back_when_embedding_fails(monkeypatch):
+    def broken_embeds(items, batch_size=None):
+        raise RuntimeError("model failed to load")
+
+    monkeypatch.setattr(clip_tagger, "embed_images_shared", broken_embeds)
+    assert clip_tagger.suggest_clip_tags_batch(["a.jpg"]) == [["Unknown"]]
@@ -0,0 +1,96 @@
+# tests/test_batch_plan_runner.py
+#
+# Batch plan regeneration against the OpenAI stub (stub_openai, conftest.py).
+
+import asyncio
+import time
+
+import pytest
+
+from assistants import batch_plan_runner as runner
+from openai_stub import PLAN_TEXT
+from utils.session_store import append_tags, completed_plan_jobs, get_session_plans
+
+DB = "data/store.sqlite"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(runner, "BACKOFF_BASE_SECONDS", 0.0)
+
+
+def _tag_sessions(*sessions):
+    append_tags([(sid, tag, "2026-03-02T10:00:00") for sid, tags in sessions for tag in tags], db_path=DB)
+
+
+def _run(session_ids, **kwargs):
+    return asyncio.run(runner.run_batch(session_ids, db_path=DB, use_cache=False, **kwargs))
+
+
+def test_transient_failure_is_retried_then_archived_once(stub_openai):
+    _tag_sessions(("alice", ["Shelf Glutes", "Deep Hip Dips"]))
+    stub_openai.fail_next = 2
+
+    report = _run(["alice"])
+    assert (report["completed"], report["retries"], report["failed"]) == (1, 2, 0)
+    assert len(stub_openai.requests) == 3
+    assert get_session_plans("alice", DB)["plan_text"].tolist() == [PLAN_TEXT]
+    assert report["prompt_tokens"] == 10 and report["completion_tokens"] == 5
+    assert report["cost_usd"] == pytest.approx((10 * 0.03 + 5 * 0.06) / 1000, abs=1e-4)
+
+
+def test_request_goes_through_plan_generator(stub_openai, monkeypatch):
+    from assistants import plan_generator
+
+    monkeypatch.setattr(plan_generator, "SYSTEM_PROMPT", "You are a stub coach.")
+    _tag_sessions(("alice", ["Shelf Glutes"]))
+    _run(["alice"])
+    messages = stub_openai.requests[0]["messages"]
+    assert messages[0]["content"] == "You are a stub coach." and "Shelf Glutes" in messages[1]["content"]
+
+
+def test_rerun_after_partial_completion_skips_finished_sessions(stub_openai, monkeypatch):
+    monkeypatch.setattr(runner, "MAX_RETRIES", 0)
+    _tag_sessions(("alice", ["Shelf Glutes"]), ("bob", ["Flat Glutes"]), ("carol", ["Hip Dips"]))
+    stub_openai.fail_profiles = ("Flat Glutes",)
+
+    first = _run(["alice", "bob", "carol", "untagged"])
+    assert (first["completed"], first["failed"]) == (2, 1)
+    assert {sid for sid, _ in completed_plan_jobs(DB)} == {"alice", "carol"}
+
+    stub_openai.fail_profiles, stub_openai.requests[:] = (), []
+    second = _run(["alice", "bob", "carol", "untagged"])
+    assert (second["completed"], second["failed"]) == (1, 0)
+    assert len(stub_openai.requests) == 1 and "Flat Glutes" in stub_openai.requests[0]["messages"][1]["content"]
+    assert [len(get_session_plans(sid, DB)) for sid in ("alice", "bob", "carol")] == [1, 1, 1]
+
+
+def test_limiter_never_exceeds_the_rpm_limit_in_any_window(monkeypatch):
+    monkeypatch.setattr(runner, "WINDOW_SECONDS", 0.25)
+    rpm, granted = 5, []
+
+    async def main():
+        limiter = runner.RateLimiter(rpm=rpm, tpm=10 ** 9)
+
+        async def request():
+            await limiter.acquire(1)
+            granted.append(time.monotonic())
+
+        await asyncio.gather(*(request() for _ in range(3 * rpm)))
+
+    asyncio.run(main())
+    assert len(granted) == 3 * rpm
+    for start in granted:
+        assert sum(start <= t < start + runner.WINDOW_SECONDS for t in granted) <= rpm
+    assert granted[-1] - granted[0] >= 2 * runner.WINDOW_SECONDS * 0.9
+
+
+def test_token_reservations_are_corrected_by_real_usage():
+    async def main():
+        window = runner.MinuteWindow(100)
+        await window.acquire(80)
+        window.adjust(-60)  # the request used 20 tokens, not the 80 reserved
+        await asyncio.wait_for(window.acquire(70), timeout=1)
+        return window.total
+
+    assert asyncio.run(main()) == 90
@@ -0,0 +1,27 @@
+# tests/test_bulk_tagger.py
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from assistants import bulk_tagger
+from utils import embedding_cache
+
+
+def test_file_deleted_after_listing_is_left_unembedded(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "_caches", {})
+    monkeypatch.setattr(bulk_tagger, "_ensure_thumbnail", lambda path: None)
+    monkeypatch.setattr(bulk_tagger, "_preprocess", lambda path: np.zeros((3, 4, 4), dtype=np.float32))
+    monkeypatch.setattr(bulk_tagger, "embed_pixel_values",
+                        lambda pixels: np.ones((len(pixels), 8), dtype=np.float32))
+    chunk = []
+    for name in ("a.jpg", "gone.jpg", "c.jpg"):
+        path = tmp_path / name
+        path.write_bytes(name.encode())
+        chunk.append(("s1", name, str(path)))
+    (tmp_path / "gone.jpg").unlink()
+
+    with ThreadPoolExecutor(2) as executor:
+        embeds = bulk_tagger._embed_chunk(chunk, executor, batch_size=8)
+    assert embeds[1] is None
+    assert embeds[0] is not None and embeds[2] is not None
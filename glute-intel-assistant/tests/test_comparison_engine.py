@@ -0,0 +1,114 @@
+import datetime
+import io
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils.clip_tagger import GLUTE_TAGS
+from utils.comparison_engine import (
+    EXIF_DATETIME_ORIGINAL, EXIF_IFD, capture_date, chronological_order, compare_timepoints, timepoint_labels,
+)
+
+JAN, FEB, MAR = (datetime.date(2026, month, 1) for month in (1, 2, 3))
+
+
+def test_chronological_order_uses_dates_not_upload_order():
+    assert chronological_order([MAR, JAN, FEB]) == [1, 2, 0]
+    assert chronological_order([FEB, JAN, FEB]) == [1, 0, 2]
+
+
+def test_labels_never_collide():
+    labels = timepoint_labels(["front.jpg", "front.jpg", "a/front.jpg", "rear.png"], [JAN, FEB, FEB, FEB])
+    assert labels == ["2026-01-01 · front", "2026-02-01 · front #1", "2026-02-01 · front #2", "2026-02-01 · rear"]
+    assert len(set(labels)) == len(labels)
+
+
+def test_capture_date_reads_exif_and_rewinds():
+    exif = Image.Exif()
+    exif.get_ifd(EXIF_IFD)[EXIF_DATETIME_ORIGINAL] = "2026:02:01 09:30:00"
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(buffer, format="JPEG", exif=exif)
+    buffer.seek(0)
+    assert capture_date(buffer) == FEB
+    assert buffer.tell() == 0
+
+    plain = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(plain, format="PNG")
+    plain.seek(0)
+    assert capture_date(plain) is None
+
+
+@pytest.fixture
+def timepoint_files(random_images, tmp_path, monkeypatch):
+    from utils import comparison_engine
+
+    monkeypatch.setattr(comparison_engine, "_comparisons", OrderedDict())
+    paths = []
+    for i, image in enumerate(random_images[:4]):
+        paths.append(str(tmp_path / f"t{i}.png"))
+        image.save(paths[-1])
+    return paths
+
+
+@pytest.fixture
+def counted_embeds(monkeypatch):
+    from utils import comparison_engine
+
+    calls = []
+    real = comparison_engine.embed_images_shared
+
+    def counting(items, *args, **kwargs):
+        calls.append(len(items))
+        return real(items, *args, **kwargs)
+
+    monkeypatch.setattr(comparison_engine, "embed_images_shared", counting)
+    return calls
+
+
+def test_compare_timepoints_matrix_deltas_and_drift(random_clip, timepoint_files):
+    comparison = compare_timepoints(timepoint_files, model_name=random_clip)
+
+    assert comparison.probs.shape == (4, len(GLUTE_TAGS)) and comparison.valid.all()
+    np.testing.assert_allclose(comparison.probs.sum(axis=1), 1.0, rtol=1e-5)
+    np.testing.assert_allclose(comparison.step_deltas, comparison.probs[1:] - comparison.probs[:-1])
+    np.testing.assert_allclose(comparison.total_delta, comparison.step_deltas.sum(axis=0), atol=1e-6)
+    assert comparison.anchors == (0, 3)
+    np.testing.assert_allclose(comparison.cosine_distance, comparison.cosine_distance.T, atol=1e-6)
+    assert abs(comparison.drift[0]) < 1e-6 and (comparison.drift[1:] > 0).all()
+    assert all(d > 0 for _, d in comparison.gains()) and all(d < 0 for _, d in comparison.losses())
+
+
+def test_unreadable_timepoint_is_a_nan_row_and_summaries_skip_it(random_clip, timepoint_files, tmp_path):
+    broken = tmp_path / "broken.jpg"
+    broken.write_bytes(b"not an image")
+    files = [str(broken)] + timepoint_files[:2] + [str(broken)]
+
+    comparison = compare_timepoints(files, model_name=random_clip)
+    reference = compare_timepoints(timepoint_files[:2], model_name=random_clip)
+    assert comparison.valid.tolist() == [False, True, True, False]
+    assert np.isnan(comparison.probs[[0, 3]]).all()
+    np.testing.assert_allclose(comparison.probs[1:3], reference.probs, rtol=1e-5)
+    assert comparison.anchors == (1, 2)
+    np.testing.assert_allclose(comparison.total_delta, reference.total_delta, atol=1e-6)
+    assert not np.isnan(comparison.drift[1:3]).any()
+
+
+def test_fewer_than_two_valid_timepoints_have_no_anchors(random_clip, timepoint_files, tmp_path):
+    broken = tmp_path / "broken.jpg"
+    broken.write_bytes(b"not an image")
+    comparison = compare_timepoints([str(broken), timepoint_files[0]], model_name=random_clip)
+    assert comparison.anchors is None and np.isnan(comparison.total_delta).all()
+    assert comparison.gains() == [] and comparison.losses() == []
+
+
+def test_repeat_comparison_is_served_from_the_memo(random_clip, timepoint_files, counted_embeds):
+    first = compare_timepoints(timepoint_files, labels=list("abcd"), model_name=random_clip)
+    second = compare_timepoints(timepoint_files, labels=list("wxyz"), model_name=random_clip)
+    assert counted_embeds == [4]
+    assert second.labels == list("wxyz")
+    np.testing.assert_array_equal(first.probs, second.probs)
+
+    compare_timepoints(timepoint_files[::-1], model_name=random_clip)
+    assert counted_embeds == [4, 4]
@@ -0,0 +1,166 @@
+# tests/test_drive_uploader.py
+
+import io
+import os
+
+import pytest
+
+from utils import drive_uploader
+from utils.drive_uploader import (
+    FolderCache, LocalDriveBackend, UploadItem, ensure_drive_path, upload_many
+)
+
+CHUNK = 1024
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(drive_uploader, "RESUMABLE_THRESHOLD_BYTES", 4 * CHUNK)
+    monkeypatch.setattr(drive_uploader, "RESUMABLE_CHUNK_BYTES", CHUNK)
+    monkeypatch.setattr(drive_uploader, "BACKOFF_BASE_SECONDS", 0)
+
+
+def _read(link):
+    with open(link[len("file://"):], "rb") as f:
+        return f.read()
+
+
+def test_small_files_upload_in_one_request(tmp_path, small_chunks):
+    backend = LocalDriveBackend(str(tmp_path / "drive"))
+    [result] = upload_many(backend, [UploadItem(b"tiny", "a.jpg", "folder")])
+    assert result.ok and _read(result.link) == b"tiny"
+    assert backend.chunks_sent == 0
+
+
+def test_large_files_upload_in_chunks_with_progress(tmp_path, small_chunks):
+    backend = LocalDriveBackend(str(tmp_path / "drive"))
+    data = os.urandom(10 * CHUNK + 17)
+    calls = []
+    [result] = upload_many(backend, [UploadItem(io.BytesIO(data), "big.jpg", "folder")],
+                           on_progress=lambda *args: calls.append(args))
+    assert result.ok and _read(result.link) == data
+    assert backend.chunks_sent == 11
+    assert calls == [(1, 1, len(data), len(data))]
+
+
+def test_dropped_chunk_resumes_instead_of_restarting(tmp_path, small_chunks):
+    backend = LocalDriveBackend(str(tmp_path / "drive"), fail_chunks={4})
+    data = os.urandom(8 * CHUNK)
+    [result] = upload_many(backend, [UploadItem(io.BytesIO(data), "big.jpg", "folder")])
+    assert result.ok and result.attempts == 2
+    assert _read(result.link) == data
+    assert backend.chunks_sent == 9  # 3 stored + 1 dropped + 5 remaining; nothing re-sent
+
+
+def test_ensure_drive_path_creates_nested_folders_once(tmp_path):
+    backend = LocalDriveBackend(str(tmp_path / "drive"))
+    cache = FolderCache(str(tmp_path / "folders.sqlite"))
+    folder_id = ensure_drive_path(backend, "AI_Glute_Assistant/session_1/front", cache=cache)
+    assert len(backend.folders) == 3
+    assert backend.folders[folder_id]["title"] == "front"
+
+    # A second session under the same root reuses the cached root folder
+    ensure_drive_path(backend, "AI_Glute_Assistant/session_2", cache=cache)
+    titles = sorted(meta["title"] for meta in backend.folders.values())
+    assert titles == ["AI_Glute_Assistant", "front", "session_1", "session_2"]
+    assert ensure_drive_path(backend, "AI_Glute_Assistant/session_1/front", cache=cache) == folder_id
+
+
+def test_ensure_drive_path_finds_existing_folders_without_cache(tmp_path):
+    backend = LocalDriveBackend(str(tmp_path / "drive"))
+    first = ensure_drive_path(backend, "root/it's here", cache=FolderCache(str(tmp_path / "a.sqlite")))
+    second = ensure_drive_path(backend, "root/it's here", cache=FolderCache(str(tmp_path / "b.sqlite")))
+    assert first == second and len(backend.folders) == 2
+
+
+def test_stale_cached_folder_is_recreated(tmp_path):
+    backend = LocalDriveBackend(str(tmp_path / "drive"))
+    cache = FolderCache(str(tmp_path / "folders.sqlite"), ttl_seconds=0)
+    old_id = ensure_drive_path(backend, "root/session", cache=cache)
+    backend.trash(old_id)
+    new_id = ensure_drive_path(backend, "root/session", cache=cache)
+    assert new_id != old_id and not backend.folders[new_id]["trashed"]
+
+
+class _HttpError(Exception):
+    """Shape of googleapiclient.errors.HttpError as far as the uploader looks at it."""
+
+    def __init__(self, status, reason=None):
+        super().__init__(f"HTTP {status} {reason or ''}")
+        self.resp = type("Response", (), {"status": status})()
+        self.error_details = [{"reason": reason}] if reason else []
+
+
+@pytest.mark.parametrize("error", [_HttpError(503), _HttpError(429, "rateLimitExceeded"), TimeoutError("read")])
+def test_revalidation_errors_keep_the_cached_folder(tmp_path, monkeypatch, error):
+    backend = LocalDriveBackend(str(tmp_path / "drive"))
+    cache = FolderCache(str(tmp_path / "folders.sqlite"), ttl_seconds=0)
+    folder_id = ensure_drive_path(backend, "root/session", cache=cache)
+
+    def flaky_fetch(self, fields=None):
+        raise error
+
+    monkeypatch.setattr(drive_uploader._LocalDriveFile, "FetchMetadata", flaky_fetch)
+    assert ensure_drive_path(backend, "root/session", cache=cache) == folder_id
+    assert len(backend.folders) == 2 and cache.get("root/session")[0] == folder_id
+
+
+def test_deleted_cached_folder_is_recreated(tmp_path):
+    backend = LocalDriveBackend(str(tmp_path / "drive"))
+    cache = FolderCache(str(tmp_path / "folders.sqlite"), ttl_seconds=0)
+    old_id = ensure_drive_path(backend, "root/session", cache=cache)
+    del backend.folders[old_id]  # FetchMetadata now fails like a Drive 404
+    new_id = ensure_drive_path(backend, "root/session", cache=cache)
+    assert new_id != old_id and new_id in backend.folders
+
+
+class _FailingBackend:
+    def __init__(self, error):
+        self.error = error
+
+    def upload(self, item, progress=None):
+        raise self.error
+
+
+@pytest.mark.parametrize("error, missing", [
+    (_HttpError(404, "notFound"), True),
+    (_HttpError(400, "invalidParent"), True),
+    (_HttpError(403, "userRateLimitExceeded"), False),
+    (_HttpError(503), False),
+    (ConnectionError("reset by peer"), False),
+])
+def test_only_missing_folders_are_flagged(error, missing, small_chunks):
+    [result] = upload_many(_FailingBackend(error), [UploadItem(b"x", "a.jpg", "folder")], retries=1)
+    assert not result.ok
+    assert result.folder_missing is missing
+
+
+def test_token_refresh_does_not_hold_the_client_lock(monkeypatch):
+    import datetime
+    import threading
+
+    expiring = type("Credentials", (), {
+        "access_token": "old", "token_expiry": datetime.datetime.utcnow() + datetime.timedelta(seconds=30),
+    })()
+    gauth = type("Auth", (), {"credentials": expiring, "access_token_expired": False})()
+    drive = type("Drive", (), {"auth": gauth})()
+    lock_free_during_refresh = []
+
+    def fake_fresh_auth(auth, token_path):
+        # Stands in for the network refresh: the shared client lock must be available meanwhile
+        acquired = drive_uploader._drive_lock.acquire(blocking=False)
+        lock_free_during_refresh.append(acquired)
+        if acquired:
+            drive_uploader._drive_lock.release()
+        credentials = type("Credentials", (), {
+            "access_token": "new", "token_expiry": datetime.datetime.utcnow() + datetime.timedelta(hours=1),
+        })()
+        return type("Auth", (), {"credentials": credentials})()
+
+    monkeypatch.setattr(drive_uploader, "_fresh_auth", fake_fresh_auth)
+    monkeypatch.setattr(drive_uploader, "_drive", drive)
+    monkeypatch.setattr(drive_uploader, "_refresher", threading.current_thread())
+
+    assert drive_uploader.get_drive() is drive
+    assert lock_free_during_refresh == [True]
+    assert expiring.access_token == "new"
@@ -0,0 +1,64 @@
+# tests/test_embedding_cache.py
+
+import numpy as np
+
+from utils.embedding_cache import EmbeddingCache, content_key
+
+
+def _vector(seed, dim=8):
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+def _last_used(cache, key):
+    return cache._db.execute("SELECT last_used FROM entries WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_hit_returns_exactly_what_was_stored():
+    cache = EmbeddingCache("test-model")
+    vector = _vector(0) * 1.2345
+    cache.put("a", vector)
+    hit = cache.get("a")
+    assert hit.dtype == np.float32
+    np.testing.assert_array_equal(hit, vector)
+
+
+def test_hit_touches_are_batched(monkeypatch):
+    from utils import embedding_cache
+
+    monkeypatch.setattr(embedding_cache, "TOUCH_FLUSH_SECONDS", 3600)
+    cache = EmbeddingCache("test-model")
+    cache.put("a", _vector(0))
+    before = _last_used(cache, "a")
+    cache.get("a")
+    assert _last_used(cache, "a") == before
+    cache.flush()
+    assert _last_used(cache, "a") > before
+
+
+def test_eviction_sees_buffered_touches(monkeypatch):
+    from utils import embedding_cache
+
+    monkeypatch.setattr(embedding_cache, "TOUCH_FLUSH_SECONDS", 3600)
+    cache = EmbeddingCache("test-model", max_mb=2 * 8 * 4 / (1024 * 1024))  # room for two vectors
+    cache.put("old", _vector(0))
+    cache.put("newer", _vector(1))
+    cache.get("old")  # "old" is now the most recently used
+    cache.put("third", _vector(2))
+    assert cache.get("old") is not None
+    assert cache.get("newer") is None
+
+
+def test_float16_store_is_reset(tmp_path):
+    cache = EmbeddingCache("test-model")
+    cache.put("a", _vector(0))
+    cache._db.execute("DELETE FROM meta WHERE name = 'format'")
+    reopened = EmbeddingCache("test-model")
+    assert reopened.get("a") is None
+    reopened.put("a", _vector(0))
+    np.testing.assert_array_equal(reopened.get("a"), _vector(0))
+
+
+def test_content_key_depends_on_model_and_bytes():
+    assert content_key(b"abc", "m1") == content_key(b"abc", "m1")
+    assert content_key(b"abc", "m1") != content_key(b"abc", "m2")
+    assert content_key(b"abc", "m1") != content_key(b"abd", "m1")
@@ -0,0 +1,73 @@
+# tests/test_embedding_index.py
+
+import os
+
+import numpy as np
+import pytest
+
+from utils.embedding_index import EmbeddingIndex, update_index_from_uploads
+
+
+def _index(n=500, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    index = EmbeddingIndex()
+    index.add([(f"s{i % 50}", f"{i}.jpg") for i in range(n)], rng.standard_normal((n, dim)))
+    return index
+
+
+def test_exact_search_finds_the_query_image():
+    index = _index()
+    assert index.search(index.vectors[7], k=1, mode="exact")[0][:2] == ("s7", "7.jpg")
+
+
+def test_ivf_quantizer_is_saved_and_reused(monkeypatch):
+    index = _index()
+    index.train()
+    index.save()
+    expected = index.search(index.vectors[3], k=5, mode="approx")
+
+    loaded = EmbeddingIndex.load()
+    monkeypatch.setattr(EmbeddingIndex, "train", lambda *a, **k: (_ for _ in ()).throw(AssertionError("retrained")))
+    np.testing.assert_array_equal(loaded._centroids, index._centroids)
+    results = loaded.search(index.vectors[3], k=5, mode="approx")
+    assert [r[:2] for r in results] == [r[:2] for r in expected]
+    np.testing.assert_allclose([r[2] for r in results], [r[2] for r in expected], rtol=1e-5)
+
+
+def test_large_index_is_trained_on_save(monkeypatch):
+    from utils import embedding_index
+
+    monkeypatch.setattr(embedding_index, "APPROX_MIN_SIZE", 100)
+    index = _index()
+    index.save()
+    assert EmbeddingIndex.load()._centroids is not None
+
+
+def test_stale_quantizer_is_ignored():
+    index = _index()
+    index.train()
+    index.save()
+    smaller = _index(n=100)
+    smaller.save()
+    assert EmbeddingIndex.load()._centroids is None
+
+
+def test_uploads_are_embedded_through_the_shared_client(tmp_path, monkeypatch):
+    from utils import clip_features, inference_client
+
+    for session, name in [("s1", "a.jpg"), ("s1", "b.png"), ("s2", "c.jpg"), ("s2", "notes.txt")]:
+        (tmp_path / "uploads" / session).mkdir(parents=True, exist_ok=True)
+        (tmp_path / "uploads" / session / name).write_bytes(b"x")
+    calls = []
+
+    def fake_shared(paths, batch_size=None):
+        calls.append(sorted(os.path.basename(p) for p in paths))
+        return [None if p.endswith("b.png") else np.ones(4, dtype=np.float32) for p in paths]
+
+    monkeypatch.setattr(inference_client, "embed_images_shared", fake_shared)
+    monkeypatch.setattr(clip_features, "embed_files", lambda *a, **k: pytest.fail("loaded a local model"))
+    index = EmbeddingIndex()
+    assert update_index_from_uploads(index, str(tmp_path / "uploads")) == 2
+    assert ("s1", "a.jpg") in index and ("s1", "b.png") not in index
+    assert update_index_from_uploads(index, str(tmp_path / "uploads")) == 0
+    assert calls == [["a.jpg", "b.png", "c.jpg"], ["b.png"]]
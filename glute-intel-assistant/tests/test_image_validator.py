@@ -0,0 +1,81 @@
+# tests/test_image_validator.py
+
+import hashlib
+import io
+import struct
+
+import numpy as np
+import pytest
+from PIL import Image, features
+
+from utils import image_validator
+from utils.image_validator import PROBE_CHUNK_SIZE, probe_image
+
+WIDTH, HEIGHT = 300, 260
+
+
+def _encode(fmt, mode="RGB", **options) -> bytes:
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, (HEIGHT, WIDTH, len(mode)), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, mode).save(buffer, format=fmt, **options)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def header_only(monkeypatch):
+    """Fails the test if probing falls back to PIL instead of the header parsers."""
+    monkeypatch.setattr(image_validator.Image, "open", lambda *a, **k: pytest.fail("fell back to PIL"))
+
+
+def _check(data, fmt):
+    upload = io.BytesIO(data)
+    probe = probe_image(upload)
+    assert (probe.format, probe.dimensions) == (fmt, (WIDTH, HEIGHT))
+    assert probe.size_bytes == len(data) and probe.sha256 == hashlib.sha256(data).hexdigest()
+    assert probe.is_valid, probe.message
+    assert upload.tell() == 0
+    return probe
+
+
+def test_png_header(header_only):
+    _check(_encode("PNG"), "png")
+
+
+def test_jpeg_with_large_app_segments_before_the_frame_header(header_only):
+    data = _encode("JPEG")
+    app2 = b"\xff\xe2" + struct.pack(">H", 65000) + bytes(64998)
+    padded = data[:2] + app2 * 3 + data[2:]  # SOF now starts ~195KB in, across several read chunks
+    assert padded.index(b"\xff\xc0") > 2 * PROBE_CHUNK_SIZE
+    _check(padded, "jpeg")
+
+
+@pytest.mark.skipif(not features.check("webp"), reason="Pillow built without WebP")
+@pytest.mark.parametrize("chunk, mode, options", [
+    (b"VP8 ", "RGB", {"quality": 80}),
+    (b"VP8L", "RGB", {"lossless": True}),
+    (b"VP8X", "RGBA", {"quality": 80}),
+])
+def test_webp_chunk_types(header_only, chunk, mode, options):
+    data = _encode("WEBP", mode, **options)
+    assert data[12:16] == chunk
+    _check(data, "webp")
+
+
+def test_unparsed_header_falls_back_to_pil(monkeypatch):
+    monkeypatch.setattr(image_validator, "_parse_png", lambda head: None)
+    _check(_encode("PNG"), "png")
+
+
+def test_invalid_uploads_are_reported():
+    assert probe_image(io.BytesIO(b"\x89PNG\r\n\x1a\n garbage")).message.startswith("Corrupted image")
+    assert probe_image(io.BytesIO(_encode("BMP"))).message == "Unsupported format: bmp"
+    small = io.BytesIO()
+    Image.new("RGB", (100, 80)).save(small, format="PNG")
+    assert probe_image(small).message == "Image resolution too low: 100x80"
+
+
+def test_paths_are_probed_too(tmp_path):
+    path = tmp_path / "front.png"
+    path.write_bytes(_encode("PNG"))
+    assert probe_image(str(path)).dimensions == (WIDTH, HEIGHT)
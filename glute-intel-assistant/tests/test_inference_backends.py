@@ -0,0 +1,19 @@
+import pytest
+
+from utils.inference_backends import parity_check
+
+
+@pytest.mark.parametrize("backend", ["int8", "onnx"])
+def test_backend_parity_on_random_clip(random_clip, random_images, backend):
+    if backend == "onnx":
+        pytest.importorskip("onnx")
+        pytest.importorskip("onnxruntime")
+    report = parity_check(random_images, backends=(backend,), model_name=random_clip, batch_size=4)
+
+    assert report["images"] == len(random_images)
+    assert report["torch"]["ms_per_image"] > 0
+    result = report[backend]
+    assert "error" not in result, result.get("error")
+    assert result["max_cosine_error"] < (1e-4 if backend == "onnx" else 0.05)
+    assert result["pose_agreement"] >= 0.5
+    assert result["topk_overlap"] >= 0.6
@@ -0,0 +1,110 @@
+import io
+import threading
+
+import numpy as np
+import pytest
+
+from utils import clip_features, embedding_cache, inference_client
+
+
+@pytest.fixture
+def server(random_clip, monkeypatch):
+    """Inference server on a free localhost port, recording every payload it receives."""
+    from assistants.inference_server import MicroBatcher, TCPInferenceServer, _Handler
+
+    monkeypatch.setattr(embedding_cache, "_caches", {})
+    monkeypatch.setattr(inference_client, "_local", threading.local())
+    monkeypatch.setattr(inference_client, "_state", {"enabled": True, "down_until": 0.0})
+
+    server = TCPInferenceServer(("127.0.0.1", 0), _Handler)
+    server.batcher = MicroBatcher(max_wait_ms=1)
+    server.payloads = []
+    dispatch = server.dispatch
+
+    def recording_dispatch(payload):
+        server.payloads.append(payload)
+        return dispatch(payload)
+
+    server.dispatch = recording_dispatch
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(inference_client, "INFERENCE_SERVER", f"tcp:127.0.0.1:{server.server_address[1]}")
+
+    # Only the server's batcher thread may run the model; a client-side fallback would fail the test
+    real_embed_files = clip_features.embed_files
+
+    def server_only_embed_files(*args, **kwargs):
+        assert threading.current_thread().name == "micro-batcher", "client fell back to in-process inference"
+        return real_embed_files(*args, **kwargs)
+
+    monkeypatch.setattr(clip_features, "embed_files", server_only_embed_files)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def image_files(random_images, tmp_path):
+    paths = []
+    for i, image in enumerate(random_images[:3]):
+        paths.append(str(tmp_path / f"img_{i}.png"))
+        image.save(paths[-1])
+    return paths
+
+
+def _expected(paths, model_name, backend="torch"):
+    return clip_features.embed_images([clip_features.load_rgb(p) for p in paths], model_name, backend)
+
+
+def _sent_bytes(payload) -> list:
+    return [ref for ref in payload["items"] if ref and "data" in ref]
+
+
+def test_paths_are_read_by_the_server_not_sent(server, image_files, random_clip):
+    embeds = inference_client.embed_images_shared(image_files + ["does/not/exist.png"], model_name=random_clip)
+
+    np.testing.assert_allclose(np.stack(embeds[:3]), _expected(image_files, random_clip), rtol=1e-4, atol=1e-5)
+    assert embeds[3] is None
+    assert len(server.payloads) == 1 and not _sent_bytes(server.payloads[0])
+    assert server.payloads[0]["backend"] == "torch"
+
+
+def test_uploads_are_sent_once_then_served_from_the_shared_cache(server, image_files, random_clip):
+    uploads = [io.BytesIO(open(path, "rb").read()) for path in image_files]
+
+    first = inference_client.embed_images_shared(uploads, model_name=random_clip)
+    assert len(server.payloads) == 2
+    assert not _sent_bytes(server.payloads[0]) and len(_sent_bytes(server.payloads[1])) == len(uploads)
+
+    server.payloads.clear()
+    second = inference_client.embed_images_shared(uploads, model_name=random_clip)
+    assert len(server.payloads) == 1 and not _sent_bytes(server.payloads[0])
+    for a, b in zip(first, second):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_client_backend_is_forwarded(server, image_files, random_clip):
+    embeds = inference_client.remote_embed(image_files, random_clip, backend="int8")
+
+    assert server.payloads[0]["backend"] == "int8"
+    np.testing.assert_allclose(np.stack(embeds), _expected(image_files, random_clip, "int8"), rtol=1e-4, atol=1e-5)
+
+
+def test_busy_server_is_waited_for_not_replaced_by_a_local_model(server, image_files, random_images, random_clip,
+                                                                 monkeypatch):
+    submit, busy_replies = server.batcher.submit, [3]
+
+    def saturated_then_free(*args):
+        if busy_replies[0]:
+            busy_replies[0] -= 1
+            return None
+        return submit(*args)
+
+    monkeypatch.setattr(server.batcher, "submit", saturated_then_free)
+    embeds = inference_client.embed_images_shared(image_files, model_name=random_clip)
+    assert all(e is not None for e in embeds) and len(server.payloads) == 4
+
+    busy_replies[0] = 10 ** 6
+    monkeypatch.setattr(inference_client, "BUSY_TIMEOUT_SECONDS", 0.2)
+    with pytest.raises(inference_client.InferenceServerBusy):
+        inference_client.embed_images_shared([io.BytesIO(image.tobytes()) for image in random_images[3:]],
+                                             model_name=random_clip)
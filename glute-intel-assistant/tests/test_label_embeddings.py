@@ -0,0 +1,39 @@
+# tests/test_label_embeddings.py
+
+import numpy as np
+
+from utils.label_embeddings import get_label_features, score_labels
+
+LABELS = ["round glutes", "flat glutes", "upper shelf"]
+
+
+def test_label_features_are_normalized(random_clip):
+    features, logit_scale = get_label_features(LABELS, random_clip, persist=False)
+    assert features.shape == (len(LABELS), 16)
+    assert features.dtype == np.float32
+    np.testing.assert_allclose(np.linalg.norm(features, axis=1), 1.0, rtol=1e-5)
+    assert logit_scale > 0
+
+
+def test_score_labels_matches_clip_logits(random_clip, random_images):
+    import torch
+
+    from utils.clip_features import embed_images
+    from utils.model_registry import get_clip
+
+    model, processor = get_clip(random_clip)
+    inputs = processor(text=LABELS, images=random_images, return_tensors="pt", padding=True)
+    with torch.no_grad():
+        expected = model(**inputs).logits_per_image.softmax(dim=1).numpy()
+
+    probs = score_labels(embed_images(random_images, random_clip), LABELS, random_clip)
+    np.testing.assert_allclose(probs, expected, atol=1e-4)
+
+
+def test_label_features_persist_to_disk(random_clip):
+    from utils import label_embeddings
+
+    features, _ = get_label_features(LABELS[:2], random_clip)
+    label_embeddings._features.clear()
+    reloaded, _ = get_label_features(LABELS[:2], random_clip)
+    np.testing.assert_array_equal(features, reloaded)
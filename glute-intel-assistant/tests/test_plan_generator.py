@@ -0,0 +1,80 @@
+# tests/test_plan_generator.py
+#
+# Plan generation against a local stub of the OpenAI chat completions endpoint (stub_openai, conftest.py).
+
+import asyncio
+
+import pytest
+
+from assistants import plan_generator
+from assistants.plan_generator import ERROR_PREFIX, plan_cache_key
+from openai_stub import CHUNKS, PLAN_TEXT
+
+TAGS = ["Shelf Glutes", "Deep Hip Dips"]
+
+
+def test_stream_yields_chunks_and_caches_the_plan(stub_openai):
+    assert list(plan_generator.stream_glute_plan(TAGS)) == CHUNKS
+    assert stub_openai.requests[0]["stream"] is True
+
+    # Same normalized inputs: one cached piece, no new request
+    assert list(plan_generator.stream_glute_plan(list(reversed(TAGS)))) == [PLAN_TEXT]
+    assert len(stub_openai.requests) == 1
+
+
+def test_async_stream_and_acreate(stub_openai):
+    async def collect():
+        return [chunk async for chunk in plan_generator.astream_glute_plan(TAGS, expert_source="NASM")]
+
+    assert asyncio.run(collect()) == CHUNKS
+    assert asyncio.run(plan_generator.agenerate_glute_plan(TAGS, expert_source="Jeff Nippard")) == PLAN_TEXT
+    assert [r.get("stream", False) for r in stub_openai.requests] == [True, False]
+
+
+def test_profile_plans_run_concurrently_through_acreate(stub_openai):
+    progress = []
+    plans = plan_generator.generate_profile_plans(
+        TAGS, profiles=["NASM", "Jeff Nippard", "Stronger by Science"],
+        on_plan=lambda profile, done, total: progress.append((done, total)),
+    )
+    assert plans == {"NASM": PLAN_TEXT, "Jeff Nippard": PLAN_TEXT, "Stronger by Science": PLAN_TEXT}
+    assert sorted(progress) == [(1, 3), (2, 3), (3, 3)]
+    assert len(stub_openai.requests) == 3
+
+
+@pytest.mark.parametrize("call", ["generate", "stream", "astream", "agenerate"])
+def test_errors_are_returned_but_never_cached(stub_openai, call):
+    stub_openai.fail = True
+
+    def run():
+        if call == "generate":
+            return plan_generator.generate_glute_plan(TAGS)
+        if call == "stream":
+            return "".join(plan_generator.stream_glute_plan(TAGS))
+        if call == "agenerate":
+            return asyncio.run(plan_generator.agenerate_glute_plan(TAGS))
+
+        async def collect():
+            return "".join([chunk async for chunk in plan_generator.astream_glute_plan(TAGS)])
+        return asyncio.run(collect())
+
+    assert run().startswith(ERROR_PREFIX)
+    assert plan_generator.plan_cache.get(plan_cache_key(TAGS)) is None
+
+    stub_openai.fail = False
+    assert run() == PLAN_TEXT
+    assert len(stub_openai.requests) == 2
+
+
+def test_profile_plans_job_fails_when_every_plan_failed(stub_openai):
+    stub_openai.fail = True
+    with pytest.raises(RuntimeError, match=ERROR_PREFIX):
+        plan_generator.profile_plans_job(lambda *args: None, TAGS, ["NASM", "Jeff Nippard"])
+
+
+def test_profile_plans_job_reports_partial_failure(stub_openai):
+    stub_openai.fail_profiles = ("Jeff Nippard",)
+    progress = []
+    plans = plan_generator.profile_plans_job(lambda *args: progress.append(args), TAGS, ["NASM", "Jeff Nippard"])
+    assert plans["NASM"] == PLAN_TEXT and plans["Jeff Nippard"].startswith(ERROR_PREFIX)
+    assert progress[-1] == (1.0, "1 of 2 plans failed: Jeff Nippard")
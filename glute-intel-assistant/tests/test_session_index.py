@@ -0,0 +1,85 @@
+import os
+import shutil
+
+import pytest
+
+from utils import session_index
+from utils.session_index import get_session_image_count, get_session_image_page, refresh_session_index, search_sessions
+
+
+@pytest.fixture(autouse=True)
+def fresh_schema(monkeypatch):
+    monkeypatch.setattr(session_index, "_initialized", set())
+
+
+def _touch(path, mtime):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if not os.path.exists(path):
+        open(path, "wb").close()
+    os.utime(path, (mtime, mtime))
+
+
+def _photo(sid, name, mtime):
+    _touch(os.path.join("uploads", sid, name), mtime)
+    os.utime(os.path.join("uploads", sid), (mtime, mtime))
+
+
+def _log(sid, mtime):
+    _touch(os.path.join("data", "logs", f"{sid}_log.txt"), mtime)
+
+
+def _sessions():
+    page, total = search_sessions(limit=100)
+    assert total == len(page)
+    return {row.session_id: (row.image_count, row.has_log, row.last_activity) for row in page.itertuples()}
+
+
+@pytest.fixture
+def tree():
+    _photo("alice", "front.jpg", 1000)
+    _photo("alice", "rear.PNG", 1100)
+    _touch(os.path.join("uploads", "alice", "notes.txt"), 1100)
+    os.utime(os.path.join("uploads", "alice"), (1100, 1100))
+    _log("alice", 1200)
+    _photo("bob", "side.jpeg", 900)
+    _log("carol", 800)
+
+
+def test_first_refresh_indexes_logs_and_upload_folders(tree):
+    assert refresh_session_index() == 3
+    assert _sessions() == {"alice": (2, 1, 1200), "bob": (1, 0, 900), "carol": (0, 1, 800)}
+    assert get_session_image_page("alice") == ["front.jpg", "rear.PNG"]
+    assert refresh_session_index() == 0
+
+
+def test_only_changed_sessions_are_updated(tree):
+    refresh_session_index()
+    _photo("bob", "front.jpg", 2000)
+    _log("carol", 2100)
+
+    assert refresh_session_index() == 2
+    sessions = _sessions()
+    assert sessions["bob"] == (2, 0, 2000) and sessions["carol"] == (0, 1, 2100)
+    assert sessions["alice"] == (2, 1, 1200)
+    assert list(search_sessions(limit=2)[0]["session_id"]) == ["carol", "bob"]
+
+
+def test_deleted_photos_and_sessions_leave_the_index(tree):
+    refresh_session_index()
+    os.remove(os.path.join("uploads", "alice", "front.jpg"))
+    os.utime(os.path.join("uploads", "alice"), (1300, 1300))
+    shutil.rmtree(os.path.join("uploads", "bob"))
+    os.remove(os.path.join("data", "logs", "carol_log.txt"))
+
+    assert refresh_session_index() == 3
+    assert set(_sessions()) == {"alice"}
+    assert get_session_image_page("alice") == ["rear.PNG"] and get_session_image_count("alice") == 1
+    assert get_session_image_page("bob") == [] and get_session_image_count("bob") == 0
+
+
+def test_log_removal_keeps_a_session_with_photos(tree):
+    refresh_session_index()
+    os.remove(os.path.join("data", "logs", "alice_log.txt"))
+
+    assert refresh_session_index() == 1
+    assert _sessions()["alice"] == (2, 0, 1100)
@@ -0,0 +1,101 @@
+# tests/test_session_store.py
+
+import csv
+import os
+import threading
+
+from utils import session_store
+from utils.session_store import (
+    append_tags, get_cohort_timeline, get_connection, get_session_plans, get_session_tags, get_session_top_tags,
+    get_tag_timeline, get_tag_totals, migrate_from_csv, rebuild_tag_rollups, record_image_tags,
+)
+
+
+def _write_csv(path, fieldnames, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _legacy_logs():
+    _write_csv(session_store.TAG_LOG_CSV, ["session_id", "tag", "timestamp"], [
+        {"session_id": "s1", "tag": "Shelf Glutes", "timestamp": "2026-03-02T10:00:00"},
+        {"session_id": "s1", "tag": "Shelf Glutes", "timestamp": "2026-03-03T10:00:00"},
+        {"session_id": "s1", "tag": "Hip Dips", "timestamp": "2026-03-03T10:00:00"},
+        {"session_id": "s2", "tag": "Flat Glutes", "timestamp": "2026-03-04T10:00:00"},
+    ])
+    _write_csv(session_store.PLAN_LOG_CSV, ["session_id", "plan_text", "timestamp"], [
+        {"session_id": "s1", "plan_text": "## Plan\nwith, commas", "timestamp": "2026-03-03T11:00:00"},
+    ])
+
+
+def test_csv_logs_are_migrated_on_first_connection():
+    _legacy_logs()
+    assert len(get_session_tags("s1")) == 3 and len(get_session_tags("s2")) == 1
+    assert get_session_plans("s1")["plan_text"].tolist() == ["## Plan\nwith, commas"]
+    assert get_session_top_tags("s1") == ["Shelf Glutes", "Hip Dips"]  # rollups include migrated rows
+    assert get_connection().execute("SELECT 1 FROM meta WHERE name = 'csv_migrated'").fetchone()
+
+
+def test_migration_runs_once(monkeypatch):
+    _legacy_logs()
+    conn = get_connection()
+    migrate_from_csv(conn)
+    monkeypatch.setattr(session_store, "_local", threading.local())  # a second process opening the store
+    get_connection()
+    assert len(get_session_tags("s1")) == 3 and len(get_session_plans("s1")) == 1
+
+
+def test_store_without_legacy_logs_starts_empty():
+    assert get_session_tags("s1").empty
+    assert get_connection().execute("SELECT 1 FROM meta WHERE name = 'csv_migrated'").fetchone()
+
+
+# ───────────────────────────────────────────────
+# TAG ROLLUPS
+
+def _rollup_tables():
+    conn = get_connection()
+    return (sorted(conn.execute("SELECT * FROM tag_rollups")), sorted(conn.execute("SELECT * FROM cohort_tag_rollups")))
+
+
+def _log_tags():
+    append_tags([
+        ("s1", "Shelf Glutes", "2026-03-08T23:59:00"),  # Sunday: still the week of Monday 03-02
+        ("s1", "Shelf Glutes", "2026-03-09T00:01:00"),  # Monday: a new week
+        ("s1", "Hip Dips", "2026-03-09T08:00:00"),
+        ("s2", "Shelf Glutes", "2026-03-02T10:00:00"),
+        ("s2", "Flat Glutes", "not a timestamp"),
+    ])
+    record_image_tags([
+        ("s2", "s2/rear.jpg", ["Shelf Glutes", "Hip Dips"], "2026-03-10T09:00:00"),
+        ("s3", "s3/broken.jpg", [], "2026-03-10T09:00:00"),
+    ])
+
+
+def test_incremental_rollups_match_a_full_rebuild():
+    _log_tags()
+    incremental = _rollup_tables()
+    rebuild_tag_rollups()
+    assert _rollup_tables() == incremental
+
+
+def test_weeks_are_bucketed_by_monday():
+    _log_tags()
+    s1 = get_tag_timeline("s1", "week")
+    assert s1.values.tolist() == [["2026-03-02", "Shelf Glutes", 1], ["2026-03-09", "Hip Dips", 1],
+                                  ["2026-03-09", "Shelf Glutes", 1]]
+    assert get_tag_timeline("s1", "day")["bucket"].tolist() == ["2026-03-08", "2026-03-09", "2026-03-09"]
+
+
+def test_cohort_rollups_count_tags_and_clients():
+    _log_tags()
+    week = get_cohort_timeline("week")
+    shelf = week[week["tag"] == "Shelf Glutes"].set_index("bucket")
+    assert shelf.loc["2026-03-02", ["count", "sessions"]].tolist() == [2, 2]
+    assert shelf.loc["2026-03-09", ["count", "sessions"]].tolist() == [2, 2]
+    # Rows without a parseable timestamp only count towards the all-time totals
+    assert "Flat Glutes" not in set(week["tag"])
+    assert get_tag_totals("s2").values.tolist() == [["Shelf Glutes", 2], ["Flat Glutes", 1], ["Hip Dips", 1]]
@@ -0,0 +1,69 @@
+import builtins
+import importlib
+import json
+import sys
+
+import pytest
+
+from utils import startup_profiler as profiler
+
+
+@pytest.fixture
+def profiling(monkeypatch, tmp_path):
+    """Profiler enabled with fresh state; the real __import__ is put back even if a test fails."""
+    monkeypatch.setattr(builtins, "__import__", builtins.__import__)
+    monkeypatch.setattr(profiler, "ENABLED", True)
+    monkeypatch.setattr(profiler, "REPORT_PATH", str(tmp_path / "cache" / "profile.jsonl"))
+    monkeypatch.setattr(profiler, "_state", {"app": None, "started": None, "finished": False, "thread": None})
+    monkeypatch.setattr(profiler, "_stack", [])
+    monkeypatch.setattr(profiler, "_modules", {})
+    monkeypatch.setattr(profiler, "_top_level", [])
+    monkeypatch.syspath_prepend(str(tmp_path))
+    (tmp_path / "profiled_module.py").write_text("import json\nVALUE = 1\n")
+    yield tmp_path / "cache" / "profile.jsonl"
+    sys.modules.pop("profiled_module", None)
+
+
+def _reports(path):
+    return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+
+
+def test_finish_writes_one_report_and_restores_import(profiling):
+    original = builtins.__import__
+    profiler.start("apps/demo_app.py")
+    assert builtins.__import__ is profiler._timed_import
+    import profiled_module  # noqa: F401
+
+    report = profiler.finish()
+    assert builtins.__import__ is original
+    assert report["app"] == "demo_app.py" and report["modules_imported"] == 1
+    assert [m["module"] for m in report["slowest_modules"]] == ["profiled_module"]
+    assert profiler.finish() is None
+    assert _reports(profiling) == [report]
+
+
+def test_rerun_restarts_the_clock_without_reinstalling(profiling, monkeypatch):
+    clock = iter([10.0, 50.0, 50.5])
+    monkeypatch.setattr(profiler.time, "perf_counter", lambda: next(clock))
+    profiler.start("apps/demo_app.py")
+    profiler.start("apps/demo_app.py")
+    assert profiler.finish()["first_render_ms"] == 500.0
+
+
+def test_start_after_finish_is_a_no_op(profiling):
+    original = builtins.__import__
+    profiler.start("apps/demo_app.py")
+    profiler.finish()
+    profiler.start("apps/demo_app.py")
+    assert builtins.__import__ is original
+    assert profiler.finish() is None
+    assert len(_reports(profiling)) == 1
+
+
+def test_disabled_profiler_does_nothing(profiling, monkeypatch):
+    monkeypatch.setattr(profiler, "ENABLED", False)
+    original = builtins.__import__
+    profiler.start("apps/demo_app.py")
+    importlib.import_module("profiled_module")
+    assert builtins.__import__ is original
+    assert profiler.finish() is None and not profiling.exists()
@@ -0,0 +1,66 @@
+# tests/test_thumbnails.py
+
+import os
+
+import pytest
+from PIL import Image
+
+from utils import thumbnails
+from utils.thumbnails import THUMBNAIL_SIZE, get_thumbnail, get_thumbnail_path, pregenerate_thumbnails
+
+
+@pytest.fixture
+def photos(random_images, tmp_path):
+    paths = []
+    for i, image in enumerate(random_images[:2]):
+        paths.append(str(tmp_path / f"p{i}.jpg"))
+        image.save(paths[-1])
+    return paths
+
+
+def test_thumbnails_are_keyed_by_content_and_size(photos, tmp_path):
+    copy = tmp_path / "copy_of_p0.jpg"
+    copy.write_bytes(open(photos[0], "rb").read())
+
+    first = get_thumbnail_path(photos[0])
+    assert get_thumbnail_path(str(copy)) == first
+    assert get_thumbnail_path(photos[1]) != first
+    assert get_thumbnail_path(photos[0], (50, 70)) != first
+    assert get_thumbnail(photos[0]).size == THUMBNAIL_SIZE
+
+
+def test_cached_thumbnail_is_not_regenerated(photos, monkeypatch):
+    path = get_thumbnail_path(photos[0])
+    monkeypatch.setattr(thumbnails, "make_thumbnail", lambda *a: pytest.fail("decoded the image again"))
+    assert get_thumbnail_path(photos[0]) == path
+
+
+def test_edited_image_gets_a_new_thumbnail(photos, random_images):
+    before = get_thumbnail_path(photos[0])
+    random_images[1].save(photos[0])
+    os.utime(photos[0], ns=(1, 1))  # new mtime, so the per-process hash memo is bypassed
+    assert get_thumbnail_path(photos[0]) != before
+
+
+def test_interrupted_write_never_leaves_a_partial_thumbnail(photos, monkeypatch):
+    real_save = Image.Image.save
+
+    def crash_midway(self, fp, *args, **kwargs):
+        with open(fp, "wb") as f:
+            f.write(b"RIFF partial")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(Image.Image, "save", crash_midway)
+    with pytest.raises(OSError):
+        get_thumbnail_path(photos[0])
+    assert not os.path.exists(thumbnails._thumbnail_path(thumbnails._content_hash(photos[0]), THUMBNAIL_SIZE))
+
+    monkeypatch.setattr(Image.Image, "save", real_save)
+    with Image.open(get_thumbnail_path(photos[0])) as thumb:
+        assert thumb.format == "WEBP"
+
+
+def test_pregenerate_counts_only_readable_images(photos, tmp_path):
+    broken = tmp_path / "broken.jpg"
+    broken.write_bytes(b"nope")
+    assert pregenerate_thumbnails(photos + [str(broken), str(tmp_path / "missing.jpg")]) == 2
@@ -0,0 +1,62 @@
+# tests/test_validator_bot.py
+
+import os
+
+import pytest
+
+from assistants import validator_bot
+from utils.session_store import append_plan, append_tags
+
+COMPLETE = ["✅ Session is complete"]
+
+
+@pytest.fixture
+def sessions():
+    """s1: images, tags and log (no plan yet); s2: an empty folder."""
+    os.makedirs("uploads/s1")
+    os.makedirs("uploads/s2")
+    open("uploads/s1/front.jpg", "wb").close()
+    os.makedirs(validator_bot.LOGS_DIR)
+    open(os.path.join(validator_bot.LOGS_DIR, "s1_log.txt"), "w").close()
+    append_tags([("s1", "Shelf Glutes", "2026-03-02T10:00:00")])
+
+
+def _no_store_reads(monkeypatch):
+    def fail():
+        raise AssertionError("re-read the session store")
+
+    monkeypatch.setattr(validator_bot, "tagged_session_ids", fail)
+    monkeypatch.setattr(validator_bot, "planned_session_ids", fail)
+
+
+def test_unchanged_sessions_reuse_the_manifest(sessions, monkeypatch):
+    first = validator_bot.validate_all_sessions()
+    assert first["s1"] == ["⚠️ No plan generated or archived"]
+    assert "❌ Missing or invalid image folder" in first["s2"]
+
+    _no_store_reads(monkeypatch)
+    monkeypatch.setattr(validator_bot, "_has_images", lambda path: pytest.fail("re-listed an unchanged folder"))
+    assert validator_bot.validate_all_sessions() == first
+
+
+def test_store_write_invalidates_the_manifest(sessions):
+    validator_bot.validate_all_sessions()
+    append_plan("s1", "## Plan")
+    assert validator_bot.validate_all_sessions()["s1"] == COMPLETE
+
+
+def test_changed_folder_is_rescanned(sessions, monkeypatch):
+    validator_bot.validate_all_sessions()
+    open("uploads/s2/rear.png", "wb").close()
+    later = os.stat("uploads/s2").st_mtime + 5
+    os.utime("uploads/s2", (later, later))
+    assert "❌ Missing or invalid image folder" not in validator_bot.validate_all_sessions()["s2"]
+
+
+def test_full_run_ignores_the_manifest(sessions, monkeypatch):
+    validator_bot.validate_all_sessions()
+    calls = []
+    real = validator_bot.tagged_session_ids
+    monkeypatch.setattr(validator_bot, "tagged_session_ids", lambda: calls.append(1) or real())
+    validator_bot.validate_all_sessions(incremental=False)
+    assert calls == [1]
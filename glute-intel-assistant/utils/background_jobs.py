@@ -0,0 +1,255 @@
+# utils/background_jobs.py
+#
+# Persistent background jobs for long AI work (tagging, plan generation) so Streamlit
+# script runs only submit and poll instead of blocking for the whole run.
+# Importing this module (or a module with job functions) has no side effects: the jobs
+# database is opened on first use, and only apps call start_workers() to resume orphaned jobs.
+
+import hashlib
+import importlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+
+JOBS_DB_PATH = os.path.join("data", "jobs.sqlite")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# Job kind -> "module:function" running it as fn(report_progress, **params); imported on first use
+JOB_KINDS = {
+    "auto_chain": "assistants.assistant_chain_engine:auto_chain_job",
+    "profile_plans": "assistants.plan_generator:profile_plans_job",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    dedup_key TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    owner_pid INTEGER,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_dedup ON jobs (dedup_key, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);
+"""
+
+_handlers = {}
+_local = threading.local()
+_submit_lock = threading.Lock()
+_queue = queue.Queue()
+_workers = []
+_workers_lock = threading.Lock()
+_recovered = False  # orphans are claimed once per process
+
+
+@dataclass(frozen=True)
+class Job:
+    id: str
+    kind: str
+    status: str
+    progress: float
+    message: str
+    result: object
+    error: str
+    created_at: str
+    updated_at: str
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+
+def _now():
+    return datetime.utcnow().isoformat(timespec="seconds")
+
+
+def _conn(db_path: str = JOBS_DB_PATH) -> sqlite3.Connection:
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        connections[db_path] = conn
+    return conn
+
+
+def _row_to_job(row) -> Job:
+    job_id, kind, status, progress, message, result, error, created_at, updated_at = row
+    return Job(job_id, kind, status, progress, message, json.loads(result) if result else None,
+               error, created_at, updated_at)
+
+
+_JOB_COLUMNS = "id, kind, status, progress, message, result, error, created_at, updated_at"
+
+
+def dedup_key(kind: str, params: dict) -> str:
+    return hashlib.sha256(json.dumps([kind, params], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _worker_loop():
+    while True:
+        job_id, kind, params = _queue.get()
+        _run(job_id, kind, params)
+
+
+def _enqueue(job_id: str, kind: str, params: dict):
+    # Daemon threads: a CLI that happens to submit a job is never kept alive by the pool;
+    # anything left unfinished is picked up by the next start_workers()
+    with _workers_lock:
+        while len(_workers) < JOB_WORKERS:
+            worker = threading.Thread(target=_worker_loop, name=f"job-{len(_workers)}", daemon=True)
+            worker.start()
+            _workers.append(worker)
+    _queue.put((job_id, kind, params))
+
+
+def _handler(kind: str):
+    fn = _handlers.get(kind)
+    if fn is None:
+        if kind not in JOB_KINDS:
+            raise KeyError(f"Unknown job kind: {kind}")
+        module, name = JOB_KINDS[kind].split(":")
+        fn = _handlers[kind] = getattr(importlib.import_module(module), name)
+    return fn
+
+
+def _pid_alive(pid) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _update(job_id: str, **fields):
+    fields["updated_at"] = _now()
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    _conn().execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+def _run(job_id: str, kind: str, params: dict):
+    def report(progress: float, message: str = None):
+        _update(job_id, progress=max(0.0, min(1.0, float(progress))), message=message)
+
+    _update(job_id, status=RUNNING, owner_pid=os.getpid())
+    try:
+        result = _handler(kind)(report, **params)
+        _update(job_id, status=DONE, progress=1.0, result=json.dumps(result))
+    except Exception as e:
+        _update(job_id, status=FAILED, error=str(e))
+
+
+def register_job(kind: str, fn):
+    """Registers fn(report_progress, **params) -> JSON-serializable result as a job kind (in-process only)."""
+    _handlers[kind] = fn
+
+
+def _claim(conn, job_id: str, dead_pid) -> bool:
+    """Takes over a job whose owner died; only one process can win, since the UPDATE requires the old owner."""
+    cursor = conn.execute(
+        "UPDATE jobs SET owner_pid = ?, status = ?, progress = 0, message = ?, updated_at = ? "
+        "WHERE id = ? AND owner_pid IS ? AND status IN (?, ?)",
+        (os.getpid(), QUEUED, "Resumed after restart", _now(), job_id, dead_pid, QUEUED, RUNNING),
+    )
+    return cursor.rowcount == 1
+
+
+def start_workers() -> int:
+    """
+    Called once by each app process: re-queues jobs orphaned by a dead process (server restart)
+    and runs them here. Each orphan is claimed with a conditional UPDATE, so when several
+    processes start together exactly one of them resumes it. Returns the number claimed.
+    """
+    global _recovered
+    with _submit_lock:
+        if _recovered:
+            return 0
+        _recovered = True
+        conn = _conn()
+        candidates = [
+            (job_id, kind, json.loads(params), pid) for job_id, kind, params, pid in conn.execute(
+                "SELECT id, kind, params, owner_pid FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            )
+            if pid != os.getpid() and not _pid_alive(pid) and (kind in _handlers or kind in JOB_KINDS)
+        ]
+        claimed = 0
+        for job_id, kind, params, pid in candidates:
+            if _claim(conn, job_id, pid):
+                _enqueue(job_id, kind, params)
+                claimed += 1
+        return claimed
+
+
+def submit_job(kind: str, **params) -> str:
+    """
+    Queues a job and returns its id without waiting. An identical job (same kind and params)
+    that is still queued or running is reused instead of starting a duplicate; if its owner
+    process died, this process claims and runs it.
+    """
+    if kind not in _handlers and kind not in JOB_KINDS:
+        raise KeyError(f"Unknown job kind: {kind}")
+    key = dedup_key(kind, params)
+    with _submit_lock:
+        conn = _conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id, owner_pid FROM jobs WHERE dedup_key = ? AND status IN (?, ?) "
+                "ORDER BY created_at DESC LIMIT 1",
+                (key, QUEUED, RUNNING),
+            ).fetchone()
+            if row:
+                job_id, pid = row
+                orphaned = pid != os.getpid() and not _pid_alive(pid)
+                if orphaned and _claim(conn, job_id, pid):
+                    _enqueue(job_id, kind, params)
+                return job_id
+            job_id = uuid.uuid4().hex
+            now = _now()
+            conn.execute(
+                "INSERT INTO jobs (id, kind, dedup_key, params, status, owner_pid, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, key, json.dumps(params, default=str), QUEUED, os.getpid(), now, now),
+            )
+        _enqueue(job_id, kind, params)
+    return job_id
+
+
+def get_job(job_id: str) -> Job:
+    """Current status of a job (None if unknown). Cheap enough to poll from every rerun."""
+    row = _conn().execute(f"SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _row_to_job(row) if row else None
+
+
+def latest_job(kind: str, **params) -> Job:
+    """Most recent job with these exact params (any status), e.g. to show a result after navigating back."""
+    row = _conn().execute(
+        f"SELECT {_JOB_COLUMNS} FROM jobs WHERE dedup_key = ? ORDER BY created_at DESC, rowid DESC LIMIT 1",
+        (dedup_key(kind, params),),
+    ).fetchone()
+    return _row_to_job(row) if row else None
+
+
+def active_job_count() -> int:
+    return _conn().execute("SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchone()[0]
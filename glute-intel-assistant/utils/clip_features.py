@@ -0,0 +1,118 @@
+# utils/clip_features.py
+
+import os
+
+from PIL import Image
+import numpy as np
+
+from utils.model_registry import CLIP_MODEL_NAME, get_clip_processor
+from utils.embedding_cache import content_key, get_embedding_cache
+from utils.inference_backends import embedding_model_id, get_image_backend
+
+# Batch sizing: rough peak activation memory per 224x224 image in a ViT-B/32 forward
+PER_IMAGE_MB = 48
+MAX_BATCH_SIZE = 32
+MEMORY_BUDGET_FRACTION = 0.25
+
+
+def load_rgb(image_path_or_file) -> Image.Image:
+    """Decodes a path or file-like object (e.g. a Streamlit upload) into an RGB image."""
+    if hasattr(image_path_or_file, 'read'):
+        if hasattr(image_path_or_file, 'seek'):
+            image_path_or_file.seek(0)
+        return Image.open(image_path_or_file).convert("RGB")
+    return Image.open(str(image_path_or_file)).convert("RGB")
+
+
+def preprocess_images(images, model_name: str = CLIP_MODEL_NAME) -> np.ndarray:
+    """Resizes/normalizes decoded RGB images into an (n, 3, H, W) float32 pixel array."""
+    return get_clip_processor(model_name)(images=list(images), return_tensors="np")["pixel_values"]
+
+
+def embed_pixel_values(pixel_values, model_name: str = CLIP_MODEL_NAME, backend: str = None) -> np.ndarray:
+    """Runs the CLIP vision tower on preprocessed pixel values, on the given (default: selected) backend."""
+    return get_image_backend(model_name, backend).image_features(pixel_values)
+
+
+def embed_images(images, model_name: str = CLIP_MODEL_NAME, backend: str = None) -> np.ndarray:
+    """
+    Runs the CLIP vision tower on decoded RGB images.
+    Returns an (n_images, dim) float32 matrix of (unnormalized) image embeddings.
+    """
+    return embed_pixel_values(preprocess_images(images, model_name), model_name, backend)
+
+
+def _available_memory_mb() -> float:
+    """Free memory on the inference device in MB (None if it can't be determined)."""
+    import torch
+
+    if torch.cuda.is_available():
+        free_bytes, _ = torch.cuda.mem_get_info()
+        return free_bytes / (1024 * 1024)
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def auto_batch_size(max_batch_size: int = MAX_BATCH_SIZE) -> int:
+    """Picks a batch size that fits a fraction of currently available memory."""
+    available_mb = _available_memory_mb()
+    if available_mb is None:
+        return min(8, max_batch_size)
+    fit = int(available_mb * MEMORY_BUDGET_FRACTION // PER_IMAGE_MB)
+    return max(1, min(fit, max_batch_size))
+
+
+def embed_files(images_or_files, batch_size: int = None, model_name: str = CLIP_MODEL_NAME,
+                use_cache: bool = True, backend: str = None) -> list:
+    """
+    Decodes and embeds a list of paths / file objects in batches.
+    Images already in the embedding cache (same bytes, same model) skip decode and inference.
+    Only one batch of decoded images is held in memory at a time.
+    Returns one embedding per input, or None where the image could not be decoded or embedded.
+    """
+    items = list(images_or_files)
+    results = [None] * len(items)
+    cache_id = embedding_model_id(model_name, backend)  # includes the backend: int8/onnx vectors differ slightly
+    cache = get_embedding_cache(cache_id) if use_cache else None
+
+    pending = []  # (index, cache key) of images that still need a forward pass
+    for i, item in enumerate(items):
+        key = None
+        if cache is not None:
+            try:
+                key = content_key(item, cache_id)
+            except OSError:
+                continue
+            results[i] = cache.get(key)
+        if results[i] is None:
+            pending.append((i, key))
+
+    batch_size = batch_size or auto_batch_size()
+    for start in range(0, len(pending), batch_size):
+        decoded, images = [], []
+        for i, key in pending[start:start + batch_size]:
+            try:
+                images.append(load_rgb(items[i]))
+                decoded.append((i, key))
+            except Exception:
+                continue
+        if not images:
+            continue
+        try:
+            embeds = embed_images(images, model_name, backend)
+        except Exception:
+            continue
+        for (i, key), embed in zip(decoded, embeds):
+            results[i] = embed
+            if cache is not None:
+                cache.put(key, embed)
+    return results
@@ -1,12 +1,13 @@
 # utils/clip_tagger.py
 
-from PIL import Image
-from transformers import CLIPProcessor, CLIPModel
-import torch
+import logging
 
-# Load model + processor globally
-clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+import numpy as np
+
+from utils.inference_client import embed_images_shared
+from utils.label_embeddings import score_labels
+
+logger = logging.getLogger(__name__)
 
 # Glute shape categories (from prior system strategy)
 GLUTE_TAGS = [
@@ -17,26 +18,34 @@ GLUTE_TAGS = [
     "Balanced (Proportionate)", "Peach Shape", "Mini BBL Look", "Deep Hip Dips", "Smooth Silhouette"
 ]
 
-@torch.no_grad()
+def rank_tags(probs) -> list:
+    """Pairs GLUTE_TAGS with their probabilities, ranked by confidence."""
+    tag_conf = list(zip(GLUTE_TAGS, [float(p) for p in probs]))
+    return sorted(tag_conf, key=lambda x: x[1], reverse=True)
+
 def suggest_clip_tags(image_path_or_file, top_k: int = 5):
     """
     Suggests glute tag categories using CLIP similarity.
     Returns list of top_k predicted tags ranked by confidence.
     """
-    try:
-        if hasattr(image_path_or_file, 'read'):
-            image = Image.open(image_path_or_file).convert("RGB")
-        else:
-            image = Image.open(str(image_path_or_file)).convert("RGB")
-
-        inputs = clip_processor(text=GLUTE_TAGS, images=image, return_tensors="pt", padding=True)
-        outputs = clip_model(**inputs)
-        logits = outputs.logits_per_image.softmax(dim=1).squeeze().tolist()
-
-        tag_conf = list(zip(GLUTE_TAGS, logits))
-        ranked = sorted(tag_conf, key=lambda x: x[1], reverse=True)
-        return [tag for tag, prob in ranked[:top_k]]
-
-    except Exception as e:
-        return ["Unknown"]
+    # Same code path as the batched API, so single and batched results agree
+    return suggest_clip_tags_batch([image_path_or_file], top_k=top_k, batch_size=1)[0]
 
+def suggest_clip_tags_batch(images_or_files, top_k: int = 5, batch_size: int = None) -> list:
+    """
+    Batched suggest_clip_tags: runs CLIP over stacked batches sized to available memory.
+    Returns one tag list per input, in input order (["Unknown"] for unreadable images).
+    """
+    items = list(images_or_files)
+    results = [["Unknown"] for _ in items]
+    try:
+        embeds = embed_images_shared(items, batch_size=batch_size)
+        valid = [i for i, e in enumerate(embeds) if e is not None]
+        if valid:
+            probs = score_labels(np.stack([embeds[i] for i in valid]), GLUTE_TAGS)
+            for i, row in zip(valid, probs):
+                results[i] = [tag for tag, prob in rank_tags(row)[:top_k]]
+    except Exception:
+        # Same contract as before batching: a failed tagging pass degrades to "Unknown", never raises
+        logger.exception("CLIP tagging failed for a batch of %d images", len(items))
+    return results
@@ -0,0 +1,162 @@
+# utils/comparison_engine.py
+
+import datetime
+import os
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+from PIL import Image
+
+from utils.clip_tagger import GLUTE_TAGS
+from utils.embedding_cache import content_key
+from utils.inference_backends import embedding_model_id
+from utils.inference_client import embed_images_shared
+from utils.label_embeddings import score_labels
+from utils.model_registry import CLIP_MODEL_NAME
+
+MAX_CACHED_COMPARISONS = 64
+EXIF_IFD, EXIF_DATETIME_ORIGINAL, EXIF_DATETIME = 0x8769, 36867, 306
+
+# (content keys of the timepoints, model) -> Comparison, so Streamlit reruns don't rescore
+_comparisons = OrderedDict()
+_comparisons_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Comparison:
+    """
+    Full GLUTE_TAGS probability vectors for N timepoints of one client, plus their changes.
+    Rows for images that could not be decoded are NaN and flagged in `valid`; first→last
+    summaries (total_delta, drift, gains, losses) are anchored on the first and last valid timepoints.
+    """
+    labels: list
+    probs: np.ndarray                 # (n_timepoints, n_tags)
+    cosine_distance: np.ndarray       # (n_timepoints, n_timepoints) between CLIP embeddings
+    valid: np.ndarray                 # (n_timepoints,) bool
+    tags: list = field(default_factory=lambda: list(GLUTE_TAGS))
+
+    @property
+    def step_deltas(self) -> np.ndarray:
+        """(n_timepoints - 1, n_tags) probability change from each timepoint to the next."""
+        return np.diff(self.probs, axis=0)
+
+    @property
+    def anchors(self) -> tuple:
+        """(first, last) indices of valid timepoints, or None if fewer than two are valid."""
+        valid = np.flatnonzero(self.valid)
+        return (int(valid[0]), int(valid[-1])) if len(valid) >= 2 else None
+
+    @property
+    def total_delta(self) -> np.ndarray:
+        """(n_tags,) probability change from the first to the last valid timepoint (NaN without two)."""
+        if self.anchors is None:
+            return np.full(len(self.tags), np.nan, dtype=np.float32)
+        first, last = self.anchors
+        return self.probs[last] - self.probs[first]
+
+    @property
+    def drift(self) -> np.ndarray:
+        """(n_timepoints,) embedding cosine distance of each timepoint from the first valid one."""
+        valid = np.flatnonzero(self.valid)
+        if not len(valid):
+            return np.full(len(self.labels), np.nan, dtype=np.float32)
+        return self.cosine_distance[valid[0]]
+
+    def top_tags(self, timepoint: int = -1, top_k: int = 5) -> list:
+        order = np.argsort(-np.nan_to_num(self.probs[timepoint], nan=-1.0))[:top_k]
+        return [self.tags[i] for i in order]
+
+    def top_changes(self, top_k: int = 5, min_delta: float = 0.0) -> list:
+        """[(tag, delta)] with the largest absolute first→last change, largest first."""
+        delta = np.nan_to_num(self.total_delta)
+        order = np.argsort(-np.abs(delta))[:top_k]
+        return [(self.tags[i], float(delta[i])) for i in order if abs(delta[i]) > min_delta]
+
+    def gains(self, top_k: int = 5, min_delta: float = 0.01) -> list:
+        return [(tag, d) for tag, d in self.top_changes(len(self.tags), min_delta) if d > 0][:top_k]
+
+    def losses(self, top_k: int = 5, min_delta: float = 0.01) -> list:
+        return [(tag, d) for tag, d in self.top_changes(len(self.tags), min_delta) if d < 0][:top_k]
+
+
+# ───────────────────────────────────────────────
+# TIMEPOINT ORDER & LABELS
+
+def capture_date(file) -> datetime.date:
+    """Date the photo was taken according to its EXIF data, or None. Used as the default timepoint date."""
+    try:
+        with Image.open(file) as img:
+            exif = img.getexif()
+            value = exif.get_ifd(EXIF_IFD).get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+        return datetime.datetime.strptime(str(value).strip(), "%Y:%m:%d %H:%M:%S").date() if value else None
+    except (OSError, ValueError, SyntaxError):
+        return None
+    finally:
+        if hasattr(file, "seek"):
+            file.seek(0)
+
+
+def chronological_order(dates: list) -> list:
+    """Indices sorting timepoints by their date; images with the same date keep their given order."""
+    return sorted(range(len(dates)), key=lambda i: dates[i])
+
+
+def timepoint_labels(names: list, dates: list) -> list:
+    """
+    "<date> · <file stem>" per timepoint. Labels that would still be identical (same file name
+    uploaded twice for one date) get a " #k" suffix, so every timepoint keeps its own row and column.
+    """
+    labels = [f"{date.isoformat()} · {os.path.splitext(os.path.basename(name))[0]}" for name, date in zip(names, dates)]
+    totals, seen = Counter(labels), Counter()
+    unique = []
+    for label in labels:
+        seen[label] += 1
+        unique.append(f"{label} #{seen[label]}" if totals[label] > 1 else label)
+    return unique
+
+
+# ───────────────────────────────────────────────
+# COMPARISON
+
+def _cosine_distance(embeds: np.ndarray) -> np.ndarray:
+    unit = embeds / np.linalg.norm(embeds, axis=1, keepdims=True)
+    return 1.0 - unit @ unit.T
+
+
+def compare_timepoints(images_or_files, labels=None, batch_size: int = None,
+                       model_name: str = CLIP_MODEL_NAME) -> Comparison:
+    """
+    Compares N images of the same client, already in chronological order (see chronological_order).
+    Each image is embedded once (batched, via the persistent embedding cache), then all tag
+    probabilities, deltas and pairwise cosine distances are computed as matrix operations.
+    """
+    items = list(images_or_files)
+    labels = list(labels) if labels is not None else [f"T{i + 1}" for i in range(len(items))]
+    cache_id = embedding_model_id(model_name)
+    keys = tuple(content_key(item, cache_id) for item in items)
+
+    with _comparisons_lock:
+        cached = _comparisons.get((keys, cache_id))
+        if cached is not None:
+            _comparisons.move_to_end((keys, cache_id))
+            return Comparison(labels, cached.probs, cached.cosine_distance, cached.valid)
+
+    embeds = embed_images_shared(items, batch_size=batch_size, model_name=model_name)
+    valid = np.array([e is not None for e in embeds], dtype=bool)
+    dim = next((len(e) for e in embeds if e is not None), 1)
+    matrix = np.full((len(items), dim), np.nan, dtype=np.float32)
+    if valid.any():
+        matrix[valid] = np.stack([e for e in embeds if e is not None])
+
+    probs = np.full((len(items), len(GLUTE_TAGS)), np.nan, dtype=np.float32)
+    if valid.any():
+        probs[valid] = score_labels(matrix[valid], GLUTE_TAGS, model_name)
+    comparison = Comparison(labels, probs, _cosine_distance(matrix), valid)
+
+    with _comparisons_lock:
+        _comparisons[(keys, cache_id)] = comparison
+        while len(_comparisons) > MAX_CACHED_COMPARISONS:
+            _comparisons.popitem(last=False)
+    return comparison
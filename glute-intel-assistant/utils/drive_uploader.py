@@ -1,37 +1,182 @@
 # utils/drive_uploader.py
 
-from pydrive2.auth import GoogleAuth
-from pydrive2.drive import GoogleDrive
+import io
 import os
+import random
+import re
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+# Shared Drive client settings
+TOKEN_PATH = "token.json"
+TOKEN_REFRESH_MARGIN_SECONDS = 5 * 60
+TOKEN_CHECK_INTERVAL_SECONDS = 60
+
+# Upload pipeline settings
+UPLOAD_WORKERS = 4
+MAX_RETRIES = 4
+BACKOFF_BASE_SECONDS = 0.5
+RESUMABLE_THRESHOLD_BYTES = 5 * 1024 * 1024
+RESUMABLE_CHUNK_BYTES = 1024 * 1024  # must be a multiple of 256 KB
+TRANSIENT_HTTP_STATUSES = {408, 429, 500, 502, 503, 504}
+MISSING_FOLDER_REASONS = {"notFound", "invalidParent", "parentNotAFolder"}  # the cached folder id is bad
+
+# Folder-ID cache ("AI_Glute_Assistant/<session>/<subject>" -> Drive folder id)
+FOLDER_CACHE_PATH = os.path.join("data", "cache", "drive_folders.sqlite")
+FOLDER_CACHE_TTL_SECONDS = 24 * 60 * 60
+FOLDER_MIMETYPE = 'application/vnd.google-apps.folder'
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+@contextmanager
+def _file_lock(path):
+    """Exclusive lock on path + ".lock" across processes (no-op where fcntl is unavailable)."""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _save_credentials_atomic(gauth, token_path):
+    """Write to a temp file and rename, so readers never see a half-written token.json."""
+    tmp_path = f"{token_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    gauth.SaveCredentialsFile(tmp_path)
+    os.replace(tmp_path, token_path)
+
+
+def _expires_soon(gauth, margin_seconds=TOKEN_REFRESH_MARGIN_SECONDS) -> bool:
+    expiry = getattr(gauth.credentials, "token_expiry", None)  # naive UTC datetime
+    if expiry is None:
+        return gauth.access_token_expired
+    return expiry - datetime.utcnow() < timedelta(seconds=margin_seconds)
+
 
 # Setup once per session
-def authenticate_drive():
+def authenticate_drive(token_path=TOKEN_PATH):
+    from pydrive2.auth import GoogleAuth
+    from pydrive2.drive import GoogleDrive
+
     gauth = GoogleAuth()
 
     # Use local webserver for authentication
-    gauth.LoadCredentialsFile("token.json")
-    if gauth.credentials is None:
-        gauth.LocalWebserverAuth()
-    elif gauth.access_token_expired:
-        gauth.Refresh()
-    else:
-        gauth.Authorize()
-
-    gauth.SaveCredentialsFile("token.json")
+    with _file_lock(token_path):
+        gauth.LoadCredentialsFile(token_path)
+        if gauth.credentials is None:
+            gauth.LocalWebserverAuth()
+            _save_credentials_atomic(gauth, token_path)
+        elif _expires_soon(gauth):
+            gauth.Refresh()
+            _save_credentials_atomic(gauth, token_path)
+        else:
+            gauth.Authorize()
+
     return GoogleDrive(gauth)
 
+
+_drive = None
+_drive_lock = threading.Lock()    # guards _drive and the credential swap; never held across network calls
+_refresh_lock = threading.Lock()  # one token refresh at a time per process
+_refresher = None
+
+
+def _fresh_auth(gauth, token_path=TOKEN_PATH):
+    """
+    Returns a separate GoogleAuth holding a valid token: the one in token_path if another
+    process already refreshed it, else a refreshed copy of gauth's credentials. Does network
+    I/O but never touches the shared client.
+    """
+    from pydrive2.auth import GoogleAuth
+
+    with _file_lock(token_path):
+        fresh = GoogleAuth()
+        fresh.LoadCredentialsFile(token_path)
+        if fresh.credentials is not None and not _expires_soon(fresh):
+            return fresh
+        if fresh.credentials is None:
+            fresh.credentials = type(gauth.credentials).from_json(gauth.credentials.to_json())
+        fresh.Refresh()
+        _save_credentials_atomic(fresh, token_path)
+        return fresh
+
+
+def _refresh_if_needed(drive, token_path=TOKEN_PATH):
+    """Refreshes the shared client's token shortly before it expires."""
+    gauth = drive.auth
+    if not _expires_soon(gauth):
+        return
+    # If another thread is already refreshing, only wait for it once the token has actually expired
+    if not _refresh_lock.acquire(blocking=gauth.access_token_expired):
+        return
+    try:
+        if not _expires_soon(gauth):
+            return
+        fresh = _fresh_auth(gauth, token_path)
+        with _drive_lock:
+            # Update in place so HTTP objects already authorized with these credentials pick it up
+            gauth.credentials.access_token = fresh.credentials.access_token
+            gauth.credentials.token_expiry = fresh.credentials.token_expiry
+    finally:
+        _refresh_lock.release()
+
+
+def _refresh_loop():
+    while True:
+        time.sleep(TOKEN_CHECK_INTERVAL_SECONDS)
+        try:
+            drive = _drive
+            if drive is not None:
+                _refresh_if_needed(drive)
+        except Exception:
+            pass  # retried on the next tick / next get_drive()
+
+
+def get_drive():
+    """
+    Returns the process-wide GoogleDrive client, authenticating on first use only.
+    A background thread refreshes the token before it expires; worker threads should use
+    their own HTTP object (see PyDriveBackend) but can share this client.
+    """
+    global _drive, _refresher
+    with _drive_lock:
+        created = _drive is None
+        if created:
+            _drive = authenticate_drive()
+        drive = _drive
+        if _refresher is None:
+            _refresher = threading.Thread(target=_refresh_loop, name="drive-token-refresh", daemon=True)
+            _refresher.start()
+    if not created:
+        _refresh_if_needed(drive)  # outside _drive_lock: other callers never wait on the network
+    return drive
+
 def create_drive_folder_if_missing(drive, folder_name, parent_id=None):
     """Checks if folder exists, creates it if not. Returns folder ID."""
-    query = f"title='{folder_name}' and mimeType='application/vnd.google-apps.folder'"
+    escaped_name = folder_name.replace("\\", "\\\\").replace("'", "\\'")
+    query = f"title='{escaped_name}' and mimeType='{FOLDER_MIMETYPE}' and trashed=false"
     if parent_id:
         query += f" and '{parent_id}' in parents"
     file_list = drive.ListFile({'q': query}).GetList()
     if file_list:
         return file_list[0]['id']
-    
+
     folder_metadata = {
         'title': folder_name,
-        'mimeType': 'application/vnd.google-apps.folder'
+        'mimeType': FOLDER_MIMETYPE
     }
     if parent_id:
         folder_metadata['parents'] = [{"id": parent_id}]
@@ -39,13 +184,392 @@ def create_drive_folder_if_missing(drive, folder_name, parent_id=None):
     folder.Upload()
     return folder['id']
 
+# ───────────────────────────────────────────────
+# FOLDER-ID CACHE
+
+class FolderCache:
+    """Persistent path -> folder-id map shared by every app process (SQLite, WAL mode)."""
+
+    def __init__(self, path: str = FOLDER_CACHE_PATH, ttl_seconds: float = FOLDER_CACHE_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._thread_lock = threading.RLock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS folders (path TEXT PRIMARY KEY, folder_id TEXT, verified_at REAL)")
+
+    def get(self, path: str):
+        """Returns (folder_id, is_fresh), or (None, False) if the path isn't cached."""
+        with self._thread_lock:
+            row = self._db.execute("SELECT folder_id, verified_at FROM folders WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return None, False
+        return row[0], time.time() - row[1] < self.ttl_seconds
+
+    def put(self, path: str, folder_id: str):
+        with self._thread_lock:
+            self._db.execute("INSERT OR REPLACE INTO folders VALUES (?, ?, ?)", (path, folder_id, time.time()))
+
+    def invalidate(self, path: str):
+        """Drops path and everything below it."""
+        with self._thread_lock:
+            self._db.execute(
+                "DELETE FROM folders WHERE path = ? OR substr(path, 1, ?) = ?", (path, len(path) + 1, f"{path}/")
+            )
+
+    @contextmanager
+    def creation_lock(self):
+        """Serializes folder lookup+create across threads and processes to avoid duplicate folders."""
+        with self._thread_lock, _file_lock(self.path):
+            yield
+
+
+_folder_cache = None
+
+
+def get_folder_cache() -> FolderCache:
+    global _folder_cache
+    if _folder_cache is None:
+        _folder_cache = FolderCache()
+    return _folder_cache
+
+
+def _folder_is_live(drive, folder_id) -> bool:
+    """
+    True if folder_id still exists on Drive and isn't trashed. False only when Drive says the folder
+    is gone (404, trashed, not a folder); other errors (timeouts, 5xx) propagate.
+    """
+    try:
+        folder = drive.CreateFile({'id': folder_id})
+        folder.FetchMetadata(fields='id,labels,mimeType')
+    except Exception as e:
+        if _is_missing_folder(e):
+            return False
+        raise
+    return folder.get('mimeType') == FOLDER_MIMETYPE and not folder.get('labels', {}).get('trashed', False)
+
+
+def ensure_drive_path(drive, path: str, cache: FolderCache = None) -> str:
+    """
+    Returns the folder id for a slash-separated path (e.g. "AI_Glute_Assistant/<session>/<subject>"),
+    creating missing folders. Fresh cache entries need no Drive calls at all; entries past their
+    TTL are revalidated, and stale ids are dropped and re-resolved.
+    """
+    cache = cache or get_folder_cache()
+    parts = [p for p in path.strip("/").split("/") if p]
+
+    folder_id, fresh = cache.get("/".join(parts))
+    if folder_id and fresh:
+        return folder_id
+
+    parent_id = None
+    for depth in range(1, len(parts) + 1):
+        sub_path = "/".join(parts[:depth])
+        folder_id, fresh = cache.get(sub_path)
+        if folder_id and not fresh:
+            try:
+                live = _folder_is_live(drive, folder_id)
+            except Exception:
+                live = None  # couldn't check (timeout, 5xx): keep using the cached id, revalidate next time
+            if live:
+                cache.put(sub_path, folder_id)
+            elif live is False:
+                cache.invalidate(sub_path)
+                folder_id = None
+        if not folder_id:
+            with cache.creation_lock():
+                # Another process may have created it while we waited for the lock
+                folder_id, _ = cache.get(sub_path)
+                if not folder_id:
+                    folder_id = create_drive_folder_if_missing(drive, parts[depth - 1], parent_id=parent_id)
+                    cache.put(sub_path, folder_id)
+        parent_id = folder_id
+    return parent_id
+
+
+def invalidate_drive_path(path: str, cache: FolderCache = None):
+    """Forget a cached path (and its children), e.g. after an upload reports the folder is gone."""
+    (cache or get_folder_cache()).invalidate("/".join(p for p in path.strip("/").split("/") if p))
+
+
 def upload_image_to_drive(drive, file, filename, session_folder_id):
     """Uploads image file to Drive inside given session folder."""
-    upload = drive.CreateFile({
-        'title': filename,
-        'parents': [{'id': session_folder_id}]
-    })
-    file.seek(0)  # reset pointer
-    upload.SetContentFile(file.name)
-    upload.Upload()
-    return upload['alternateLink']
+    backend = PyDriveBackend(drive)
+    return _upload_with_retries(backend, UploadItem(file, filename, session_folder_id), raise_errors=True).link
+
+
+# ───────────────────────────────────────────────
+# UPLOAD PIPELINE
+
+@dataclass
+class UploadItem:
+    """One file to upload: an in-memory buffer / file object (or bytes), its Drive name and folder."""
+    file: object
+    filename: str
+    folder_id: str
+    mimetype: str = "image/jpeg"
+
+
+@dataclass
+class UploadResult:
+    filename: str
+    link: str = None
+    error: str = None
+    attempts: int = 0
+    folder_missing: bool = False  # target folder gone / invalid: its cached id should be dropped
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _as_stream(file):
+    """Returns a rewound, seekable stream over file without copying file objects."""
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        return io.BytesIO(file)
+    file.seek(0)
+    return file
+
+
+def _stream_size(stream) -> int:
+    stream.seek(0, io.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+
+class PyDriveBackend:
+    """
+    Uploads through a pydrive2 GoogleDrive client, streaming straight from the buffer.
+    Each worker thread gets its own authorized HTTP object (httplib2 isn't thread-safe);
+    large files use chunked, resumable uploads.
+    """
+
+    def __init__(self, drive):
+        self.drive = drive
+        self._local = threading.local()
+
+    def _http(self):
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._local.http = self.drive.auth.Get_Http_Object()
+        return http
+
+    def upload(self, item: UploadItem, progress=None) -> str:
+        stream = _as_stream(item.file)
+        size = _stream_size(stream)
+        metadata = {'title': item.filename, 'parents': [{'id': item.folder_id}], 'mimeType': item.mimetype}
+
+        if size < RESUMABLE_THRESHOLD_BYTES:
+            upload = self.drive.CreateFile(metadata)
+            upload.content = stream
+            upload.Upload(param={'http': self._http()})
+            if progress:
+                progress(size, size)
+            return upload['alternateLink']
+
+        from googleapiclient.http import MediaIoBaseUpload
+
+        media = MediaIoBaseUpload(stream, mimetype=item.mimetype, chunksize=RESUMABLE_CHUNK_BYTES, resumable=True)
+        request = self.drive.auth.service.files().insert(body=metadata, media_body=media)
+        response = None
+        while response is None:
+            status, response = request.next_chunk(http=self._http())
+            if status and progress:
+                progress(status.resumable_progress, size)
+        if progress:
+            progress(size, size)
+        return response['alternateLink']
+
+
+class LocalDriveBackend:
+    """
+    Fake Drive that writes into a local directory (root/<folder_id>/<filename>), for tests and
+    offline runs. Uploads follow PyDriveBackend: files of RESUMABLE_THRESHOLD_BYTES or more are
+    sent in RESUMABLE_CHUNK_BYTES chunks, and a retried upload resumes after the last stored chunk.
+    It also implements the part of the pydrive2 GoogleDrive API that folder handling uses
+    (ListFile / CreateFile / FetchMetadata), so ensure_drive_path works against it too.
+    fail_chunks: chunk numbers (counted across all uploads) that raise a ConnectionError once.
+    """
+
+    def __init__(self, root: str, fail_chunks=()):
+        self.root = root
+        self.fail_chunks = set(fail_chunks)
+        self.chunks_sent = 0
+        self.folders = {}  # folder_id -> {"title", "parent", "trashed"}
+        self._lock = threading.Lock()
+
+    def upload(self, item: UploadItem, progress=None) -> str:
+        stream = _as_stream(item.file)
+        size = _stream_size(stream)
+        folder = os.path.join(self.root, item.folder_id)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, item.filename)
+        if size < RESUMABLE_THRESHOLD_BYTES:
+            with open(path, "wb") as out:
+                shutil.copyfileobj(stream, out, RESUMABLE_CHUNK_BYTES)
+            if progress:
+                progress(size, size)
+            return f"file://{os.path.abspath(path)}"
+
+        partial = f"{path}.partial"
+        offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+        stream.seek(offset)
+        with open(partial, "ab") as out:
+            while offset < size:
+                with self._lock:
+                    self.chunks_sent += 1
+                    if self.chunks_sent in self.fail_chunks:
+                        self.fail_chunks.discard(self.chunks_sent)
+                        raise ConnectionError(f"simulated connection drop at chunk {self.chunks_sent}")
+                chunk = stream.read(RESUMABLE_CHUNK_BYTES)
+                out.write(chunk)
+                out.flush()
+                offset += len(chunk)
+                if progress:
+                    progress(offset, size)
+        os.replace(partial, path)
+        return f"file://{os.path.abspath(path)}"
+
+    # pydrive2-compatible folder API
+
+    def ListFile(self, params):
+        query = params.get("q", "")
+        title = re.search(r"title='((?:[^'\\]|\\.)*)'", query)
+        title = re.sub(r"\\(.)", r"\1", title.group(1)) if title else None
+        parent = re.search(r"'([^']*)' in parents", query)
+        parent = parent.group(1) if parent else None
+        with self._lock:
+            matches = [
+                {"id": folder_id, "title": meta["title"], "mimeType": FOLDER_MIMETYPE}
+                for folder_id, meta in self.folders.items()
+                if not meta["trashed"] and (title is None or meta["title"] == title)
+                and (parent is None or meta["parent"] == parent)
+            ]
+        return _LocalFileList(matches)
+
+    def CreateFile(self, metadata=None):
+        return _LocalDriveFile(self, metadata or {})
+
+    def trash(self, folder_id: str):
+        """Simulates a folder being deleted on Drive."""
+        with self._lock:
+            self.folders[folder_id]["trashed"] = True
+
+
+class _LocalFileList:
+    def __init__(self, items):
+        self.items = items
+
+    def GetList(self):
+        return list(self.items)
+
+
+class _LocalDriveFile(dict):
+    def __init__(self, backend, metadata):
+        super().__init__(metadata)
+        self.backend = backend
+
+    def Upload(self, param=None):
+        if self.get("mimeType") != FOLDER_MIMETYPE:
+            raise NotImplementedError("LocalDriveBackend creates folders here; upload files with upload()")
+        folder_id = uuid.uuid4().hex[:16]
+        parents = self.get("parents") or [{}]
+        with self.backend._lock:
+            self.backend.folders[folder_id] = {"title": self["title"], "parent": parents[0].get("id"), "trashed": False}
+        os.makedirs(os.path.join(self.backend.root, folder_id), exist_ok=True)
+        self["id"] = folder_id
+
+    def FetchMetadata(self, fields=None):
+        with self.backend._lock:
+            meta = self.backend.folders.get(self.get("id"))
+        if meta is None:
+            raise FileNotFoundError(f"File not found: {self.get('id')}")
+        self.update(mimeType=FOLDER_MIMETYPE, title=meta["title"], labels={"trashed": meta["trashed"]})
+
+
+def _http_status(exc):
+    status = getattr(getattr(exc, "resp", None), "status", None)  # googleapiclient HttpError
+    if status is None and isinstance(getattr(exc, "error", None), dict):
+        status = exc.error.get("code")  # pydrive2 ApiRequestError
+    try:
+        return int(status)
+    except (TypeError, ValueError):
+        return None
+
+
+def _error_reasons(exc) -> set:
+    details = getattr(exc, "error_details", None)  # googleapiclient HttpError
+    if not isinstance(details, list) and isinstance(getattr(exc, "error", None), dict):
+        details = exc.error.get("errors")  # pydrive2 ApiRequestError
+    return {d.get("reason") for d in details or [] if isinstance(d, dict)}
+
+
+def _is_transient(exc) -> bool:
+    """Rate limits, 5xx responses and connection problems are worth retrying."""
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+    return _http_status(exc) in TRANSIENT_HTTP_STATUSES
+
+
+def _is_missing_folder(exc) -> bool:
+    """404s and invalid-parent errors mean the target folder id is stale; anything else doesn't."""
+    if isinstance(exc, FileNotFoundError):
+        return True
+    return _http_status(exc) == 404 or bool(_error_reasons(exc) & MISSING_FOLDER_REASONS)
+
+
+def _upload_with_retries(backend, item, retries=MAX_RETRIES, progress=None, raise_errors=False) -> UploadResult:
+    """Uploads one item, retrying transient failures with exponential backoff + jitter."""
+    result = UploadResult(filename=item.filename)
+    for attempt in range(retries + 1):
+        result.attempts = attempt + 1
+        try:
+            result.link = backend.upload(item, progress=progress)
+            result.error = None
+            return result
+        except Exception as e:
+            result.error = str(e)
+            result.folder_missing = _is_missing_folder(e)
+            if attempt == retries or not _is_transient(e):
+                if raise_errors:
+                    raise
+                return result
+            time.sleep(BACKOFF_BASE_SECONDS * (2 ** attempt) * (0.5 + random.random()))
+    return result
+
+
+def upload_many(backend, items, max_workers=UPLOAD_WORKERS, retries=MAX_RETRIES, on_progress=None) -> list:
+    """
+    Uploads items concurrently on a bounded worker pool.
+    on_progress(completed, total, bytes_sent, bytes_total) is called from the calling thread
+    (safe for Streamlit widgets) whenever a file finishes.
+    Returns one UploadResult per item, in input order.
+    """
+    items = list(items)
+    if not items:
+        return []
+    sent = [0] * len(items)
+    sizes = [0] * len(items)
+    lock = threading.Lock()
+
+    def _track(i):
+        def progress(done_bytes, total_bytes):
+            with lock:
+                sent[i], sizes[i] = done_bytes, total_bytes
+        return progress
+
+    results = [None] * len(items)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(_upload_with_retries, backend, item, retries, _track(i)): i
+            for i, item in enumerate(items)
+        }
+        for completed, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if on_progress:
+                with lock:
+                    bytes_sent, bytes_total = sum(sent), sum(sizes)
+                on_progress(completed, len(items), bytes_sent, bytes_total)
+    return results
@@ -0,0 +1,219 @@
+# utils/embedding_cache.py
+
+import atexit
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+# Persistent CLIP image embedding cache (float32 memmap + SQLite index, one store per model)
+EMBEDDING_CACHE_DIR = os.path.join("data", "cache", "embeddings")
+MAX_CACHE_MB = 256
+STORE_FORMAT = 2           # 1 = float16 vectors (hits differed slightly from freshly computed embeddings)
+TOUCH_BATCH_SIZE = 256     # LRU timestamps of hits are written in batches of this many...
+TOUCH_FLUSH_SECONDS = 5    # ...or at least this often
+
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _hash_stream(digest, f):
+    for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+
+
+def content_key(image_path_or_file, model_id: str) -> str:
+    """
+    Cache key: SHA-256 over the model identifier and the image bytes.
+    Accepts raw bytes, a path, or a file-like object (read in chunks and left rewound).
+    """
+    digest = hashlib.sha256(model_id.encode("utf-8"))
+    digest.update(b"\0")
+    if isinstance(image_path_or_file, (bytes, bytearray, memoryview)):
+        digest.update(image_path_or_file)
+    elif hasattr(image_path_or_file, 'read'):
+        if hasattr(image_path_or_file, 'seek'):
+            image_path_or_file.seek(0)
+        _hash_stream(digest, image_path_or_file)
+        if hasattr(image_path_or_file, 'seek'):
+            image_path_or_file.seek(0)
+    else:
+        with open(str(image_path_or_file), "rb") as f:
+            _hash_stream(digest, f)
+    return digest.hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed store of image embeddings with LRU eviction.
+    Vectors live in a fixed-capacity float32 memmap (a hit returns exactly what was computed);
+    an SQLite index maps keys to slots and tracks last access, so several app processes can
+    share one cache directory. Last-access updates from hits are buffered and written in batches.
+    """
+
+    def __init__(self, model_id: str, cache_dir: str = EMBEDDING_CACHE_DIR, max_mb: float = MAX_CACHE_MB):
+        self.model_id = model_id
+        self.cache_dir = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_id))
+        self.max_mb = max_mb
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._dim = None
+        self._capacity = None
+        self._touched = {}  # key -> last access not yet written to the index
+        self._last_flush = time.monotonic()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._db = sqlite3.connect(
+            os.path.join(self.cache_dir, "index.sqlite"), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER UNIQUE, last_used REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries (last_used)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        self._db.commit()
+
+        meta = dict(self._db.execute("SELECT name, value FROM meta").fetchall())
+        if "dim" in meta and meta.get("format") != STORE_FORMAT:
+            self._reset_store()
+            meta = {}
+        if "dim" in meta:
+            self._open_vectors(meta["dim"], meta["capacity"])
+        atexit.register(self.flush)
+
+    def _reset_store(self):
+        """Drops a store written in an older format; its entries are recomputed on demand."""
+        self._db.execute("BEGIN IMMEDIATE")
+        self._db.execute("DELETE FROM entries")
+        self._db.execute("DELETE FROM meta")
+        self._db.commit()
+        for name in ("vectors.f16", "vectors.f32"):
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
+
+    def _open_vectors(self, dim: int, capacity: int):
+        path = os.path.join(self.cache_dir, "vectors.f32")
+        mode = "r+" if os.path.exists(path) else "w+"
+        self._vectors = np.memmap(path, dtype=np.float32, mode=mode, shape=(capacity, dim))
+        self._dim, self._capacity = dim, capacity
+
+    def _ensure_vectors(self, dim: int):
+        if self._vectors is not None:
+            return
+        capacity = max(1, int(self.max_mb * 1024 * 1024 // (dim * 4)))
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('dim', ?)", (dim,))
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('capacity', ?)", (capacity,))
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('format', ?)", (STORE_FORMAT,))
+        self._db.commit()
+        meta = dict(self._db.execute("SELECT name, value FROM meta").fetchall())
+        self._open_vectors(meta["dim"], meta["capacity"])
+
+    def _flush_touches(self):
+        if self._touched:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "UPDATE entries SET last_used = MAX(last_used, ?) WHERE key = ?",
+                    [(t, key) for key, t in self._touched.items()],
+                )
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+            self._touched.clear()
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        """Writes buffered last-access times to the index."""
+        with self._lock:
+            try:
+                self._flush_touches()
+            except sqlite3.Error:
+                pass  # only LRU ordering is affected
+
+    def get(self, key: str):
+        """Returns the cached float32 embedding for key, or None on a miss."""
+        with self._lock:
+            row = self._db.execute("SELECT slot FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or self._vectors is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            vector = np.array(self._vectors[row[0]], dtype=np.float32)
+            self._touched[key] = time.time()
+            if len(self._touched) >= TOUCH_BATCH_SIZE or time.monotonic() - self._last_flush >= TOUCH_FLUSH_SECONDS:
+                try:
+                    self._flush_touches()
+                except sqlite3.Error:
+                    pass
+            return vector
+
+    def put(self, key: str, embedding):
+        """Stores an embedding, evicting the least recently used entry when the cache is full."""
+        embedding = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._ensure_vectors(embedding.shape[-1])
+            if embedding.shape[-1] != self._dim:
+                return
+            self._flush_touches()  # eviction below must see current access times
+            now = time.time()
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT slot FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    slot = row[0]
+                    self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+                else:
+                    count = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+                    if count < self._capacity:
+                        slot = count
+                    else:
+                        slot = self._db.execute(
+                            "SELECT slot FROM entries ORDER BY last_used ASC LIMIT 1"
+                        ).fetchone()[0]
+                        self._db.execute("DELETE FROM entries WHERE slot = ?", (slot,))
+                        self.evictions += 1
+                    self._db.execute("INSERT INTO entries VALUES (?, ?, ?)", (key, slot, now))
+                self._vectors[slot] = embedding
+                self._vectors.flush()
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process plus current store size."""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "capacity": self._capacity,
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model_id: str) -> EmbeddingCache:
+    """Returns the process-wide cache for model_id (None if the cache directory is unusable)."""
+    with _caches_lock:
+        if model_id not in _caches:
+            try:
+                _caches[model_id] = EmbeddingCache(model_id)
+            except (OSError, sqlite3.Error):
+                _caches[model_id] = None
+        return _caches[model_id]
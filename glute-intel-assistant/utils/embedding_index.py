@@ -0,0 +1,248 @@
+# utils/embedding_index.py
+
+import json
+import os
+import threading
+
+import numpy as np
+
+UPLOADS_DIR = "uploads"
+INDEX_DIR = os.path.join("data", "cache", "embedding_index")
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Approximate (IVF) search settings
+APPROX_MIN_SIZE = 20000   # below this, "auto" mode stays exact
+KMEANS_ITERATIONS = 10
+DEFAULT_NPROBE = 8
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx])]
+
+
+class EmbeddingIndex:
+    """
+    Cosine-similarity index over session image embeddings, keyed by (session_id, filename).
+    Exact search is a single matrix-vector product; approximate search uses an inverted file
+    (k-means coarse quantizer) and only scores the nprobe closest clusters.
+    """
+
+    def __init__(self, index_dir: str = INDEX_DIR):
+        self.index_dir = index_dir
+        self.ids = []
+        self._id_set = set()
+        self._session_rows = {}
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._size = 0
+        self._centroids = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._trained_size = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, item_id):
+        return tuple(item_id) in self._id_set
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:self._size]
+
+    # ── building ──────────────────────────────────
+
+    def add(self, ids, vectors):
+        """Appends normalized vectors for new ids; ids already indexed are skipped."""
+        vectors = _normalize(vectors)
+        with self._lock:
+            keep = [i for i, item_id in enumerate(ids) if tuple(item_id) not in self._id_set]
+            if not keep:
+                return 0
+            vectors = vectors[keep]
+            needed = self._size + len(keep)
+            if self._vectors.shape[0] < needed or self._vectors.shape[1] != vectors.shape[1]:
+                capacity = max(needed, 2 * self._vectors.shape[0], 1024)
+                grown = np.zeros((capacity, vectors.shape[1]), dtype=np.float32)
+                if self._size:
+                    grown[:self._size] = self._vectors[:self._size]
+                self._vectors = grown
+            self._vectors[self._size:needed] = vectors
+            for row, i in enumerate(keep, start=self._size):
+                item_id = tuple(ids[i])
+                self.ids.append(item_id)
+                self._id_set.add(item_id)
+                self._session_rows.setdefault(item_id[0], []).append(row)
+            self._size = needed
+
+            if self._centroids is not None:
+                if self._size >= 2 * self._trained_size:
+                    self.train()
+                else:
+                    new_assign = np.argmax(vectors @ self._centroids.T, axis=1).astype(np.int32)
+                    self._assignments = np.concatenate([self._assignments, new_assign])
+            return len(keep)
+
+    def train(self, nlist: int = None, seed: int = 0):
+        """Fits the IVF coarse quantizer (spherical k-means) over the current vectors."""
+        with self._lock:
+            data = self.vectors
+            if len(data) == 0:
+                return
+            nlist = nlist or max(1, int(np.sqrt(len(data))))
+            rng = np.random.default_rng(seed)
+            sample = data[rng.choice(len(data), size=min(len(data), nlist * 64), replace=False)]
+            centroids = sample[rng.choice(len(sample), size=min(nlist, len(sample)), replace=False)].copy()
+            for _ in range(KMEANS_ITERATIONS):
+                assign = np.argmax(sample @ centroids.T, axis=1)
+                for c in range(len(centroids)):
+                    members = sample[assign == c]
+                    if len(members):
+                        centroids[c] = members.mean(axis=0)
+                centroids = _normalize(centroids)
+            self._centroids = centroids
+            self._assignments = np.argmax(data @ centroids.T, axis=1).astype(np.int32)
+            self._trained_size = len(data)
+
+    # ── querying ──────────────────────────────────
+
+    def search(self, query, k: int = 10, mode: str = "auto", nprobe: int = DEFAULT_NPROBE) -> list:
+        """
+        Returns [(session_id, filename, cosine_similarity)] for the k nearest images.
+        mode: "exact" (brute force), "approx" (IVF), or "auto" (approx once the index is large).
+        """
+        query = _normalize(query)[0]
+        with self._lock:
+            if self._size == 0:
+                return []
+            if mode == "auto":
+                mode = "approx" if self._size >= APPROX_MIN_SIZE else "exact"
+            if mode == "approx":
+                if self._centroids is None:
+                    self.train()
+                probe = _top_k(self._centroids @ query, nprobe)
+                candidates = np.flatnonzero(np.isin(self._assignments, probe))
+                scores = self.vectors[candidates] @ query
+                best = candidates[_top_k(scores, k)]
+                best_scores = self.vectors[best] @ query
+            else:
+                scores = self.vectors @ query
+                best = _top_k(scores, k)
+                best_scores = scores[best]
+            return [(*self.ids[i], float(s)) for i, s in zip(best, best_scores)]
+
+    def session_vector(self, session_id: str):
+        """Mean normalized embedding of a session's images (None if it has none indexed)."""
+        with self._lock:
+            rows = self._session_rows.get(session_id)
+            if not rows:
+                return None
+            return _normalize(self.vectors[rows].mean(axis=0))[0]
+
+    def similar_sessions(self, session_id: str, k: int = 5, mode: str = "auto") -> list:
+        """Returns [(other_session_id, best_image_similarity)] ranked by similarity."""
+        query = self.session_vector(session_id)
+        if query is None:
+            return []
+        best = {}
+        for sid, _, score in self.search(query, k=k * 20, mode=mode):
+            if sid != session_id and score > best.get(sid, -1.0):
+                best[sid] = score
+        return sorted(best.items(), key=lambda x: x[1], reverse=True)[:k]
+
+    # ── persistence ───────────────────────────────
+
+    def save(self):
+        """
+        Writes vectors, ids and the IVF quantizer (centroids + assignments). Large indexes are
+        trained here, so a loaded index never runs k-means on its first approximate query.
+        """
+        with self._lock:
+            if self._centroids is None and self._size >= APPROX_MIN_SIZE:
+                self.train()
+            os.makedirs(self.index_dir, exist_ok=True)
+            vectors_path = os.path.join(self.index_dir, "vectors.npy")
+            ids_path = os.path.join(self.index_dir, "ids.json")
+            ivf_path = os.path.join(self.index_dir, "ivf.npz")
+            np.save(f"{vectors_path}.tmp.npy", self.vectors)
+            with open(f"{ids_path}.tmp", "w") as f:
+                json.dump(self.ids, f)
+            if self._centroids is not None:
+                with open(f"{ivf_path}.tmp", "wb") as f:
+                    np.savez(f, centroids=self._centroids, assignments=self._assignments,
+                             trained_size=np.int64(self._trained_size))
+            os.replace(f"{vectors_path}.tmp.npy", vectors_path)
+            os.replace(f"{ids_path}.tmp", ids_path)
+            if self._centroids is not None:
+                os.replace(f"{ivf_path}.tmp", ivf_path)
+            elif os.path.exists(ivf_path):
+                os.remove(ivf_path)
+
+    @classmethod
+    def load(cls, index_dir: str = INDEX_DIR) -> "EmbeddingIndex":
+        index = cls(index_dir)
+        vectors_path = os.path.join(index_dir, "vectors.npy")
+        ids_path = os.path.join(index_dir, "ids.json")
+        if os.path.exists(vectors_path) and os.path.exists(ids_path):
+            with open(ids_path) as f:
+                ids = [tuple(item_id) for item_id in json.load(f)]
+            vectors = np.load(vectors_path)
+            if len(ids) == len(vectors):
+                index.add(ids, vectors)
+                index._load_ivf(os.path.join(index_dir, "ivf.npz"))
+        return index
+
+    def _load_ivf(self, path: str):
+        """Restores a saved quantizer if it matches the loaded vectors (else it is retrained on demand)."""
+        try:
+            with np.load(path) as data:
+                centroids, assignments = data["centroids"], data["assignments"]
+                trained_size = int(data["trained_size"])
+        except (OSError, KeyError, ValueError):
+            return
+        if len(assignments) == self._size and centroids.shape[1:] == self._vectors.shape[1:]:
+            self._centroids = centroids.astype(np.float32)
+            self._assignments = assignments.astype(np.int32)
+            self._trained_size = trained_size
+
+
+def list_session_images(uploads_dir: str = UPLOADS_DIR):
+    """Yields (session_id, filename, path) for every image under uploads/<session_id>/."""
+    if not os.path.exists(uploads_dir):
+        return
+    for session in os.scandir(uploads_dir):
+        if not session.is_dir():
+            continue
+        for entry in os.scandir(session.path):
+            if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                yield session.name, entry.name, entry.path
+
+
+def update_index_from_uploads(index: EmbeddingIndex, uploads_dir: str = UPLOADS_DIR, batch_size: int = None) -> int:
+    """
+    Embeds images under uploads/ that the index hasn't seen yet, via the shared inference server
+    when it's running. Returns the number added.
+    """
+    from utils.inference_client import embed_images_shared
+
+    new = [(sid, name, path) for sid, name, path in list_session_images(uploads_dir) if (sid, name) not in index]
+    if not new:
+        return 0
+    embeds = embed_images_shared([path for _, _, path in new], batch_size=batch_size)
+    ids = [(sid, name) for (sid, name, _), e in zip(new, embeds) if e is not None]
+    vectors = [e for e in embeds if e is not None]
+    if not ids:
+        return 0
+    added = index.add(ids, np.stack(vectors))
+    index.save()
+    return added
@@ -0,0 +1,82 @@
+# utils/image_analysis.py
+
+import logging
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from utils.inference_client import embed_images_shared
+from utils.label_embeddings import score_labels
+from utils.clip_tagger import GLUTE_TAGS, rank_tags
+from utils.pose_classifier import POSE_CLASSES, pick_pose
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ImageAnalysis:
+    """Pose prediction, ranked shape tags and raw CLIP embedding for one image."""
+    pose: str
+    pose_confidence: float
+    pose_probs: dict
+    tag_probs: list  # [(tag, probability)] ranked by probability
+    embedding: np.ndarray = field(repr=False, default=None)
+    error: str = None
+
+    def top_tags(self, top_k: int = 5) -> list:
+        return [tag for tag, prob in self.tag_probs[:top_k]]
+
+
+def analysis_from_embedding(embedding) -> ImageAnalysis:
+    """Scores pose and shape tags from an already computed CLIP image embedding."""
+    embedding = np.asarray(embedding, dtype=np.float32)
+    pose_probs = score_labels(embedding, POSE_CLASSES)[0]
+    tag_probs = score_labels(embedding, GLUTE_TAGS)[0]
+    pose, confidence = pick_pose(pose_probs)
+    return ImageAnalysis(
+        pose=pose,
+        pose_confidence=confidence,
+        pose_probs=dict(zip(POSE_CLASSES, pose_probs.tolist())),
+        tag_probs=rank_tags(tag_probs),
+        embedding=embedding,
+    )
+
+
+def _failed_analysis(error: str) -> ImageAnalysis:
+    return ImageAnalysis(
+        pose="Front",
+        pose_confidence=33.3,
+        pose_probs={pose: 1 / len(POSE_CLASSES) for pose in POSE_CLASSES},
+        tag_probs=[("Unknown", 0.0)],
+        error=error,
+    )
+
+
+def analyze_image(image_path_or_file) -> ImageAnalysis:
+    """
+    Decodes and embeds an image once (or not at all if its embedding is cached),
+    then scores both POSE_CLASSES and GLUTE_TAGS from the same vision forward pass.
+    """
+    return analyze_images([image_path_or_file], batch_size=1)[0]
+
+
+def analyze_images(images_or_files, batch_size: int = None) -> list:
+    """Batched analyze_image; returns one ImageAnalysis per input, in input order."""
+    items = list(images_or_files)
+    try:
+        embeds = embed_images_shared(items, batch_size=batch_size)
+    except Exception as e:
+        logger.exception("CLIP embedding failed for a batch of %d images", len(items))
+        return [_failed_analysis(f"Could not embed image: {e}") for _ in items]
+
+    results = []
+    for embedding in embeds:
+        if embedding is None:
+            results.append(_failed_analysis("Could not decode or embed image"))
+            continue
+        try:
+            results.append(analysis_from_embedding(embedding))
+        except Exception as e:
+            logger.exception("Scoring pose and tags failed")
+            results.append(_failed_analysis(f"Could not score image: {e}"))
+    return results
@@ -1,6 +1,10 @@
 # utils/image_validator.py
 
+import hashlib
 import io
+import struct
+from dataclasses import dataclass
+
 from PIL import Image
 
 # Supported formats and size limit (8MB)
@@ -9,40 +13,163 @@ MAX_SIZE_MB = 8
 MIN_WIDTH = 256
 MIN_HEIGHT = 256
 
-def is_valid_image(file):
-    """Checks format, file size, and resolution."""
-    file_size_mb = len(file.getbuffer()) / (1024 * 1024)
-    file_type = file.type.split('/')[-1].lower()
-    
-    if file_type not in SUPPORTED_FORMATS:
-        return False, f"Unsupported format: {file_type}"
-    if file_size_mb > MAX_SIZE_MB:
-        return False, f"File too large: {file_size_mb:.2f}MB"
-    
+PROBE_CHUNK_SIZE = 64 * 1024
+MAX_HEADER_BYTES = 512 * 1024  # JPEG EXIF/ICC segments can push SOF this far in
+
+# JPEG start-of-frame markers carrying the image dimensions
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+@dataclass(frozen=True)
+class ImageProbe:
+    """Result of a single streaming pass over an image: format, dimensions, size, hash, validity."""
+    format: str
+    width: int
+    height: int
+    size_bytes: int
+    sha256: str
+    is_valid: bool
+    message: str
+
+    @property
+    def size_MB(self) -> float:
+        return round(self.size_bytes / (1024 * 1024), 2)
+
+    @property
+    def dimensions(self) -> tuple:
+        return (self.width, self.height)
+
+    def as_metadata(self) -> dict:
+        """Same shape as get_image_metadata()."""
+        return {
+            "width": self.width,
+            "height": self.height,
+            "format": self.format.upper() if self.format else None,
+            "size_MB": self.size_MB,
+        }
+
+
+def _parse_png(head):
+    if len(head) < 24 or head[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", head[16:24])
+
+
+def _parse_webp(head):
+    if len(head) < 30:
+        return None
+    chunk = head[12:16]
+    if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+        w, h = struct.unpack("<HH", head[26:30])
+        return w & 0x3FFF, h & 0x3FFF
+    if chunk == b"VP8L" and head[20] == 0x2F:
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    return None
+
+
+def _parse_jpeg(head):
+    pos = 2
+    while pos + 4 <= len(head):
+        if head[pos] != 0xFF:
+            return None  # not at a marker: corrupt stream
+        marker = head[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # markers without a length field
+            pos += 2
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            if pos + 9 > len(head):
+                return None
+            h, w = struct.unpack(">HH", head[pos + 5:pos + 9])
+            return w, h
+        pos += 2 + struct.unpack(">H", head[pos + 2:pos + 4])[0]
+    return None
+
+
+def _sniff(head):
+    """Returns (format, (width, height) or None) from the container header."""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png", _parse_png(head)
+    if head.startswith(b"\xff\xd8"):
+        return "jpeg", _parse_jpeg(head)
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp", _parse_webp(head)
+    return None, None
+
+
+def probe_image(file) -> ImageProbe:
+    """
+    Reads an upload (file-like object or path) once, in chunks: the container header gives
+    format and dimensions, the byte count gives the size, and the same pass computes a SHA-256.
+    No full decode and no buffer copy; file objects are left rewound.
+    """
+    own_file = not hasattr(file, 'read')
+    f = open(str(file), "rb") if own_file else file
     try:
-        img = Image.open(file)
-        width, height = img.size
-        if width < MIN_WIDTH or height < MIN_HEIGHT:
-            return False, f"Image resolution too low: {width}x{height}"
-    except Exception as e:
-        return False, f"Corrupted image or cannot open: {e}"
+        if hasattr(f, 'seek'):
+            f.seek(0)
+        digest = hashlib.sha256()
+        head = b""
+        size_bytes = 0
+        fmt, dims = None, None
+        for chunk in iter(lambda: f.read(PROBE_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size_bytes += len(chunk)
+            if dims is None and len(head) < MAX_HEADER_BYTES:
+                head += chunk
+                fmt, dims = _sniff(head)
+        if dims is None and head:
+            # Unusual layout: let PIL parse the header (Image.open doesn't decode pixel data)
+            try:
+                with Image.open(io.BytesIO(head)) as img:
+                    fmt, dims = (img.format or "").lower() or fmt, img.size
+            except Exception:
+                pass
+    finally:
+        if own_file:
+            f.close()
+        elif hasattr(f, 'seek'):
+            f.seek(0)
 
-    return True, "Image is valid"
+    width, height = dims if dims else (0, 0)
+    size_mb = size_bytes / (1024 * 1024)
+    file_type = fmt or getattr(file, 'type', '').split('/')[-1].lower() or "unknown"
+
+    if file_type not in SUPPORTED_FORMATS:
+        is_valid, message = False, f"Unsupported format: {file_type}"
+    elif size_mb > MAX_SIZE_MB:
+        is_valid, message = False, f"File too large: {size_mb:.2f}MB"
+    elif dims is None:
+        is_valid, message = False, "Corrupted image or cannot open: unreadable header"
+    elif width < MIN_WIDTH or height < MIN_HEIGHT:
+        is_valid, message = False, f"Image resolution too low: {width}x{height}"
+    else:
+        is_valid, message = True, "Image is valid"
+
+    return ImageProbe(
+        format=fmt,
+        width=width,
+        height=height,
+        size_bytes=size_bytes,
+        sha256=digest.hexdigest(),
+        is_valid=is_valid,
+        message=message,
+    )
+
+def is_valid_image(file):
+    """Checks format, file size, and resolution."""
+    probe = probe_image(file)
+    return probe.is_valid, probe.message
 
 def get_image_metadata(file):
     """Returns dictionary of image metadata."""
-    img = Image.open(file)
-    width, height = img.size
-    file.seek(0, io.SEEK_END)
-    size_mb = file.tell() / (1024 * 1024)
-    return {
-        "width": width,
-        "height": height,
-        "format": img.format,
-        "size_MB": round(size_mb, 2)
-    }
+    return probe_image(file).as_metadata()
 
 def get_image_dimensions(file):
     """Returns (width, height) tuple."""
-    img = Image.open(file)
-    return img.size
+    return probe_image(file).dimensions
@@ -0,0 +1,278 @@
+# utils/inference_backends.py
+#
+# CPU inference backends for the CLIP vision tower used by the tagger and pose classifier:
+#   torch  - fp32 PyTorch (reference)
+#   int8   - PyTorch with dynamic int8 quantization of every Linear layer
+#   onnx   - exported ONNX graph run by onnxruntime (optional dependency)
+# Select with CLIP_BACKEND=torch|int8|onnx and size the intra-op thread pool with CLIP_NUM_THREADS.
+
+import copy
+import inspect
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from utils.model_registry import CLIP_MODEL_NAME, get_clip
+
+BACKENDS = ("torch", "int8", "onnx")
+DEFAULT_BACKEND = os.getenv("CLIP_BACKEND", "torch")
+NUM_THREADS = int(os.getenv("CLIP_NUM_THREADS", 0)) or None  # None = library default
+ONNX_DIR = os.path.join("data", "cache", "onnx")
+ONNX_OPSET = 14
+
+_backends = {}
+_lock = threading.Lock()
+_active = {"backend": DEFAULT_BACKEND}
+
+
+def set_backend(backend: str):
+    """Switches the process-wide default backend (e.g. from a CLI flag)."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown CLIP backend: {backend} (expected one of {', '.join(BACKENDS)})")
+    _active["backend"] = backend
+
+
+def active_backend() -> str:
+    return _active["backend"]
+
+
+def embedding_model_id(model_name: str = CLIP_MODEL_NAME, backend: str = None) -> str:
+    """
+    Identifier used to key cached embeddings. fp32 keeps the bare model name (so existing caches
+    stay valid); other backends produce slightly different vectors and get their own namespace.
+    """
+    backend = backend or active_backend()
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
+
+
+def _vision_tower(model):
+    """nn.Module computing exactly CLIPModel.get_image_features, for quantization and export."""
+    import torch
+
+    class VisionTower(torch.nn.Module):
+        def __init__(self, clip_model):
+            super().__init__()
+            self.vision_model = clip_model.vision_model
+            self.visual_projection = clip_model.visual_projection
+
+        def forward(self, pixel_values):
+            pooled = self.vision_model(pixel_values=pixel_values)[1]
+            return self.visual_projection(pooled)
+
+    return VisionTower(model).eval()
+
+
+class TorchBackend:
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        import torch
+
+        if NUM_THREADS:
+            torch.set_num_threads(NUM_THREADS)
+        self.module = self._build(get_clip(model_name)[0])
+
+    def _build(self, model):
+        return _vision_tower(model)
+
+    def image_features(self, pixel_values) -> np.ndarray:
+        import torch
+
+        with torch.inference_mode():
+            pixel_values = torch.as_tensor(np.asarray(pixel_values, dtype=np.float32))
+            return self.module(pixel_values).cpu().numpy().astype(np.float32)
+
+
+class Int8Backend(TorchBackend):
+    name = "int8"
+
+    def _build(self, model):
+        import torch
+
+        # Quantize a copy so the shared fp32 model (text tower, parity checks) is untouched
+        return torch.ao.quantization.quantize_dynamic(
+            copy.deepcopy(_vision_tower(model)), {torch.nn.Linear}, dtype=torch.qint8
+        )
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, model_name: str):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The onnx backend needs onnxruntime (pip install onnxruntime onnx)") from e
+
+        path = export_onnx(model_name)
+        options = ort.SessionOptions()
+        if NUM_THREADS:
+            options.intra_op_num_threads = NUM_THREADS
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def image_features(self, pixel_values) -> np.ndarray:
+        pixel_values = np.ascontiguousarray(pixel_values, dtype=np.float32)
+        return self.session.run(["image_embeds"], {"pixel_values": pixel_values})[0].astype(np.float32)
+
+
+def export_onnx(model_name: str = CLIP_MODEL_NAME, force: bool = False) -> str:
+    """Exports the vision tower to ONNX_DIR once (dynamic batch axis). Returns the .onnx path."""
+    import torch
+
+    path = os.path.join(ONNX_DIR, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name) + ".onnx")
+    if os.path.exists(path) and not force:
+        return path
+    model, processor = get_clip(model_name)
+    size = processor.image_processor.crop_size
+    # int on old processors; a dict, or a SizeDict on transformers 5, otherwise
+    height, width = (size, size) if isinstance(size, int) else (size["height"], size["width"])
+    os.makedirs(ONNX_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    torch.onnx.export(
+        _vision_tower(model),
+        (torch.zeros(1, 3, height, width),),
+        tmp_path,
+        input_names=["pixel_values"],
+        output_names=["image_embeds"],
+        dynamic_axes={"pixel_values": {0: "batch"}, "image_embeds": {0: "batch"}},
+        opset_version=ONNX_OPSET,
+        # Newer torch defaults to the dynamo exporter, which needs onnxscript; the TorchScript one doesn't
+        **({"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}),
+    )
+    os.replace(tmp_path, path)
+    return path
+
+
+_BACKEND_CLASSES = {"torch": TorchBackend, "int8": Int8Backend, "onnx": OnnxBackend}
+
+
+def get_image_backend(model_name: str = CLIP_MODEL_NAME, backend: str = None):
+    """Returns the shared backend instance for (model_name, backend), building it on first use."""
+    backend = backend or active_backend()
+    key = (model_name, backend)
+    instance = _backends.get(key)
+    if instance is None:
+        with _lock:
+            instance = _backends.get(key)
+            if instance is None:
+                instance = _backends[key] = _BACKEND_CLASSES[backend](model_name)
+    return instance
+
+
+# ───────────────────────────────────────────────
+# OFFLINE TEST MODEL
+
+def register_random_clip(model_name: str = None, seed: int = 0, image_size: int = 32) -> str:
+    """
+    Registers a tiny randomly initialized CLIP (plus a minimal tokenizer/processor) under
+    model_name (default "test/random-clip-<seed>"), so backends and parity checks can run
+    without downloading weights. Returns the registered name.
+    """
+    import json
+    import tempfile
+
+    import torch
+    from transformers import CLIPConfig, CLIPImageProcessor, CLIPModel, CLIPProcessor, CLIPTokenizer
+
+    from utils.model_registry import register_clip
+
+    model_name = model_name or f"test/random-clip-{seed}"
+
+    torch.manual_seed(seed)
+    config = CLIPConfig(
+        text_config={"vocab_size": 64, "hidden_size": 32, "intermediate_size": 64, "num_hidden_layers": 2,
+                     "num_attention_heads": 4, "max_position_embeddings": 77,
+                     "bos_token_id": 0, "eos_token_id": 1, "pad_token_id": 1},
+        vision_config={"image_size": image_size, "patch_size": 8, "hidden_size": 32, "intermediate_size": 64,
+                       "num_hidden_layers": 2, "num_attention_heads": 4},
+        projection_dim=16,
+    )
+    model = CLIPModel(config).eval()
+
+    # Character-level vocabulary with no merges: enough to tokenize label prompts deterministically
+    vocab_dir = tempfile.mkdtemp(prefix="random_clip_")
+    chars = [chr(c) for c in range(ord("a"), ord("z") + 1)]
+    vocab = {"<|startoftext|>": 0, "<|endoftext|>": 1}
+    vocab.update({c: i + 2 for i, c in enumerate(chars)})
+    vocab.update({f"{c}</w>": i + 2 + len(chars) for i, c in enumerate(chars)})
+    with open(os.path.join(vocab_dir, "vocab.json"), "w") as f:
+        json.dump(vocab, f)
+    with open(os.path.join(vocab_dir, "merges.txt"), "w") as f:
+        f.write("#version: 0.2\n")
+    tokenizer = CLIPTokenizer(os.path.join(vocab_dir, "vocab.json"), os.path.join(vocab_dir, "merges.txt"))
+    image_processor = CLIPImageProcessor(
+        size={"shortest_edge": image_size}, crop_size={"height": image_size, "width": image_size}
+    )
+    register_clip(model_name, model, CLIPProcessor(image_processor=image_processor, tokenizer=tokenizer))
+    return model_name
+
+
+# ───────────────────────────────────────────────
+# PARITY CHECK
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def parity_check(image_paths, backends=("int8", "onnx"), top_k: int = 5, model_name: str = CLIP_MODEL_NAME,
+                 batch_size: int = 8) -> dict:
+    """
+    Compares each backend's GLUTE_TAGS / POSE_CLASSES predictions with fp32 on a local image set
+    (paths, file objects or already decoded PIL images).
+    Reports top-1 and top-k tag agreement, pose agreement, max cosine error and ms per image.
+    Embedding caches are bypassed so every backend really runs.
+    """
+    from PIL import Image
+
+    from utils.clip_features import load_rgb, preprocess_images
+    from utils.clip_tagger import GLUTE_TAGS
+    from utils.label_embeddings import score_labels
+    from utils.pose_classifier import POSE_CLASSES
+
+    images = []
+    for path in image_paths:
+        try:
+            images.append(path.convert("RGB") if isinstance(path, Image.Image) else load_rgb(path))
+        except Exception:
+            continue
+    if not images:
+        raise ValueError("No readable images for the parity check")
+    pixels = preprocess_images(images, model_name)
+
+    def run(backend_name):
+        backend = get_image_backend(model_name, backend_name)
+        backend.image_features(pixels[:1])  # warm-up (graph init, allocator)
+        start = time.perf_counter()
+        feats = np.concatenate([
+            backend.image_features(pixels[i:i + batch_size]) for i in range(0, len(pixels), batch_size)
+        ])
+        return feats, (time.perf_counter() - start) * 1000 / len(pixels)
+
+    ref, ref_ms = run("torch")
+    ref_tags = score_labels(ref, GLUTE_TAGS, model_name)
+    ref_pose = score_labels(ref, POSE_CLASSES, model_name).argmax(axis=1)
+    ref_topk = np.argsort(-ref_tags, axis=1)[:, :top_k]
+
+    report = {"images": len(images), "top_k": top_k, "torch": {"ms_per_image": round(ref_ms, 2)}}
+    for name in backends:
+        try:
+            feats, ms = run(name)
+        except ImportError as e:
+            report[name] = {"error": str(e)}
+            continue
+        tags = score_labels(feats, GLUTE_TAGS, model_name)
+        topk = np.argsort(-tags, axis=1)[:, :top_k]
+        overlap = [len(set(a) & set(b)) / top_k for a, b in zip(ref_topk, topk)]
+        report[name] = {
+            "ms_per_image": round(ms, 2),
+            "speedup": round(ref_ms / ms, 2) if ms else None,
+            "top1_agreement": float(np.mean(ref_topk[:, 0] == topk[:, 0])),
+            "topk_overlap": float(np.mean(overlap)),
+            "pose_agreement": float(np.mean(ref_pose == score_labels(feats, POSE_CLASSES, model_name).argmax(axis=1))),
+            "max_cosine_error": float(np.max(1 - np.sum(_unit(ref) * _unit(feats), axis=1))),
+        }
+    return report
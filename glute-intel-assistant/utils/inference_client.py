@@ -0,0 +1,214 @@
+# utils/inference_client.py
+#
+# Thin client for the shared CLIP inference server (assistants/inference_server.py).
+# Apps send image references (content hash + path) / label sets over a Unix socket (or localhost
+# TCP) as JSON lines and get embeddings / label features back, so model weights live in one process
+# only. Image bytes are sent only for uploads the server can neither find in the shared embedding
+# cache nor read from disk. Calls fall back to in-process inference only when the server isn't
+# running; a busy server is waited for.
+
+import base64
+import json
+import os
+import random
+import socket
+import threading
+import time
+
+import numpy as np
+
+from utils.embedding_cache import content_key
+from utils.inference_backends import active_backend, embedding_model_id
+from utils.model_registry import CLIP_MODEL_NAME
+
+# "unix:<path>", "tcp:<host>:<port>" or "off"
+DEFAULT_SOCKET_PATH = os.path.join("data", "inference.sock")
+INFERENCE_SERVER = os.getenv("INFERENCE_SERVER", f"unix:{DEFAULT_SOCKET_PATH}")
+CONNECT_TIMEOUT_SECONDS = 0.5
+REQUEST_TIMEOUT_SECONDS = 60
+RETRY_AFTER_SECONDS = 5      # after a failed connect, don't retry the server for this long
+BUSY_TIMEOUT_SECONDS = 120   # backpressure: how long to keep retrying "busy" replies before giving up
+BUSY_BACKOFF_SECONDS = 0.02
+BUSY_MAX_BACKOFF_SECONDS = 1.0
+
+_local = threading.local()
+_state = {"enabled": True, "down_until": 0.0}
+
+
+class InferenceServerBusy(TimeoutError):
+    """The server stayed saturated for BUSY_TIMEOUT_SECONDS."""
+
+
+def disable():
+    """Turns the client off for this process (used by the server itself to avoid calling itself)."""
+    _state["enabled"] = False
+
+
+def parse_address(address: str = INFERENCE_SERVER):
+    """Returns (family, address) for socket.socket / connect, or None if the server is disabled."""
+    if not address or address == "off":
+        return None
+    if address.startswith("tcp:"):
+        host, port = address[len("tcp:"):].rsplit(":", 1)
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address[len("unix:"):] if address.startswith("unix:") else address
+
+
+def _connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        family, address = parse_address(INFERENCE_SERVER)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(CONNECT_TIMEOUT_SECONDS)
+        try:
+            sock.connect(address)
+        except OSError:
+            sock.close()
+            raise
+        sock.settimeout(REQUEST_TIMEOUT_SECONDS)
+        conn = _local.conn = (sock, sock.makefile("rb"))
+    return conn
+
+
+def _close():
+    conn = getattr(_local, "conn", None)
+    _local.conn = None
+    if conn is not None:
+        try:
+            conn[1].close()
+            conn[0].close()
+        except OSError:
+            pass
+
+
+def _available() -> bool:
+    return _state["enabled"] and parse_address(INFERENCE_SERVER) is not None and time.monotonic() >= _state["down_until"]
+
+
+def request(payload: dict) -> dict:
+    """
+    Sends one request and waits for its reply. Returns None if the server is unreachable
+    (callers then run in-process). While the server reports it is busy the request is retried
+    with capped, jittered exponential backoff, since loading a second model copy here would only
+    add to the load; InferenceServerBusy is raised if it stays busy for BUSY_TIMEOUT_SECONDS.
+    """
+    if not _available():
+        return None
+    line = (json.dumps(payload) + "\n").encode("utf-8")
+    deadline = time.monotonic() + BUSY_TIMEOUT_SECONDS
+    attempt = 0
+    while True:
+        try:
+            sock, reader = _connection()
+            sock.sendall(line)
+            reply = reader.readline()
+            if not reply:
+                raise ConnectionError("inference server closed the connection")
+            reply = json.loads(reply)
+        except (OSError, ValueError):
+            _close()
+            _state["down_until"] = time.monotonic() + RETRY_AFTER_SECONDS
+            return None
+        if reply.get("error") == "busy":
+            delay = min(BUSY_MAX_BACKOFF_SECONDS, BUSY_BACKOFF_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.0)
+            if time.monotonic() + delay > deadline:
+                raise InferenceServerBusy(f"inference server still busy after {BUSY_TIMEOUT_SECONDS}s "
+                                          f"(queue depth {reply.get('queue_depth')})")
+            time.sleep(delay)
+            attempt += 1
+            continue
+        if "error" in reply:
+            return None
+        return reply
+
+
+def _read_bytes(item) -> bytes:
+    if isinstance(item, (bytes, bytearray, memoryview)):
+        return bytes(item)
+    if hasattr(item, 'read'):
+        if hasattr(item, 'seek'):
+            item.seek(0)
+        data = item.read()
+        if hasattr(item, 'seek'):
+            item.seek(0)
+        return data
+    with open(str(item), "rb") as f:
+        return f.read()
+
+
+def _image_ref(item, cache_id: str) -> dict:
+    """What the server needs to find an image: its embedding-cache key, plus the path for files on disk."""
+    ref = {"key": content_key(item, cache_id)}
+    if isinstance(item, (str, os.PathLike)):
+        ref["path"] = os.path.abspath(item)
+    return ref
+
+
+def remote_embed(images_or_files, model_name: str = None, backend: str = None) -> list:
+    """
+    Embeddings from the server (None entries for undecodable images), or None if unavailable.
+    The first request carries only cache keys and paths, computed with this process's backend
+    (CLIP_BACKEND), which is forwarded so the server embeds and caches with the same one.
+    Bytes follow in a second request only for the images the server reported missing.
+    """
+    if not _available():
+        return None
+    items = list(images_or_files)
+    model_name = model_name or CLIP_MODEL_NAME
+    backend = backend or active_backend()
+    cache_id = embedding_model_id(model_name, backend)
+    refs = []
+    for item in items:
+        try:
+            refs.append(_image_ref(item, cache_id))
+        except OSError:
+            refs.append(None)  # unreadable here: embedded as None, like embed_files does
+    payload = {"op": "embed", "items": refs, "model": model_name, "backend": backend}
+    reply = request(payload)
+    if reply is None:
+        return None
+    embeds = reply["embeddings"]
+
+    missing = reply.get("missing") or []
+    if missing:
+        try:
+            payload["items"] = [dict(refs[i], data=base64.b64encode(_read_bytes(items[i])).decode("ascii"))
+                                for i in missing]
+        except OSError:
+            return None
+        reply = request(payload)
+        if reply is None:
+            return None
+        for i, embed in zip(missing, reply["embeddings"]):
+            embeds[i] = embed
+    return [np.asarray(e, dtype=np.float32) if e is not None else None for e in embeds]
+
+
+def remote_label_features(labels, model_name: str):
+    """(features, logit_scale) computed by the server, or None if unavailable."""
+    reply = request({"op": "label_features", "labels": list(labels), "model": model_name})
+    if reply is None:
+        return None
+    return np.asarray(reply["features"], dtype=np.float32), float(reply["logit_scale"])
+
+
+def server_stats() -> dict:
+    """Queue depth and batching stats of the running server, or None if it isn't reachable."""
+    return request({"op": "stats"})
+
+
+def embed_images_shared(images_or_files, batch_size: int = None, model_name: str = None,
+                        use_cache: bool = True) -> list:
+    """
+    Embeds images via the shared inference server when it's running, else in-process
+    (same result shape as clip_features.embed_files).
+    """
+    items = list(images_or_files)
+    embeds = remote_embed(items, model_name)
+    if embeds is not None:
+        return embeds
+    from utils.clip_features import embed_files
+
+    if model_name:
+        return embed_files(items, batch_size=batch_size, model_name=model_name, use_cache=use_cache)
+    return embed_files(items, batch_size=batch_size, use_cache=use_cache)
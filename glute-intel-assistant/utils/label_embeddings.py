@@ -0,0 +1,102 @@
+# utils/label_embeddings.py
+
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from utils.model_registry import CLIP_MODEL_NAME, get_clip
+
+# On-disk copies of label text features, keyed by model name + label list
+LABEL_CACHE_DIR = os.path.join("data", "cache", "label_embeddings")
+
+# In-memory cache: (model_name, labels) -> (normalized features, logit scale)
+_features = {}
+_lock = threading.Lock()
+
+
+def _cache_path(model_name: str, labels: tuple) -> str:
+    key = hashlib.sha256(json.dumps([model_name, list(labels)]).encode("utf-8")).hexdigest()[:24]
+    return os.path.join(LABEL_CACHE_DIR, f"{key}.npz")
+
+
+def _load_from_disk(path: str, labels: tuple):
+    try:
+        with np.load(path) as data:
+            if tuple(data["labels"].tolist()) != labels:
+                return None
+            return data["features"].astype(np.float32), float(data["logit_scale"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _save_to_disk(path: str, labels: tuple, features: np.ndarray, logit_scale: float):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, labels=np.array(labels), features=features, logit_scale=np.float32(logit_scale))
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # the in-memory copy is enough to serve requests
+
+
+def _encode_labels(labels: tuple, model_name: str):
+    import torch
+
+    model, processor = get_clip(model_name)
+    inputs = processor(text=list(labels), return_tensors="pt", padding=True)
+    with torch.no_grad():
+        # Project the text tower explicitly: get_text_features returns a model output, not a
+        # tensor, on newer transformers releases
+        pooled = model.text_model(**inputs).pooler_output
+        features = model.text_projection(pooled)
+    features = features / features.norm(dim=-1, keepdim=True)
+    return features.cpu().numpy().astype(np.float32), float(model.logit_scale.exp().item())
+
+
+def get_label_features(labels, model_name: str = CLIP_MODEL_NAME, persist: bool = True):
+    """
+    Returns (features, logit_scale) for a label set.
+    features is an L2-normalized (len(labels), dim) float32 matrix, computed once per process
+    and optionally persisted to LABEL_CACHE_DIR so later processes skip the text encoder.
+    """
+    labels = tuple(labels)
+    key = (model_name, labels)
+    cached = _features.get(key)
+    if cached is not None:
+        return cached
+
+    with _lock:
+        cached = _features.get(key)
+        if cached is not None:
+            return cached
+
+        path = _cache_path(model_name, labels)
+        cached = _load_from_disk(path, labels) if persist else None
+        if cached is None:
+            from utils.inference_client import remote_label_features
+
+            # Prefer the shared inference server (text tower already loaded there)
+            cached = remote_label_features(labels, model_name) or _encode_labels(labels, model_name)
+            if persist:
+                _save_to_disk(path, labels, *cached)
+        _features[key] = cached
+        return cached
+
+
+def score_labels(image_embeds, labels, model_name: str = CLIP_MODEL_NAME) -> np.ndarray:
+    """
+    Scores image embeddings against a label set.
+    Returns an (n_images, len(labels)) matrix of softmax probabilities, same as CLIP's logits_per_image.
+    """
+    features, logit_scale = get_label_features(labels, model_name)
+    image_embeds = np.atleast_2d(np.asarray(image_embeds, dtype=np.float32))
+    image_embeds = image_embeds / np.linalg.norm(image_embeds, axis=1, keepdims=True)
+
+    logits = logit_scale * image_embeds @ features.T
+    logits -= logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
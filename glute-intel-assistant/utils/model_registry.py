@@ -0,0 +1,96 @@
+# utils/model_registry.py
+
+import os
+import threading
+import time
+
+# Default CLIP checkpoint shared by the tagger and pose classifier
+CLIP_MODEL_NAME = "openai/clip-vit-base-patch32"
+
+# Loaded (model, processor) pairs and their load stats, keyed by model name
+_models = {}
+_processors = {}
+_stats = {}
+_lock = threading.Lock()
+
+
+def _rss_mb():
+    """Returns the resident memory of this process in MB (0.0 if unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+def get_clip_processor(model_name: str = CLIP_MODEL_NAME):
+    """
+    Returns the shared CLIPProcessor for model_name without loading model weights.
+    Used by preprocessing workers that never run the model themselves.
+    """
+    processor = _processors.get(model_name)
+    if processor is None:
+        from transformers import CLIPProcessor
+
+        processor = _processors.setdefault(model_name, CLIPProcessor.from_pretrained(model_name))
+    return processor
+
+
+def get_clip(model_name: str = CLIP_MODEL_NAME):
+    """
+    Returns the shared (model, processor) pair for model_name.
+    Weights are loaded on first use only, then reused for the rest of the process.
+    """
+    entry = _models.get(model_name)
+    if entry is not None:
+        return entry
+
+    with _lock:
+        entry = _models.get(model_name)
+        if entry is not None:
+            return entry
+
+        from transformers import CLIPModel
+
+        rss_before = _rss_mb()
+        start = time.perf_counter()
+        model = CLIPModel.from_pretrained(model_name)
+        model.eval()
+        processor = get_clip_processor(model_name)
+        load_seconds = time.perf_counter() - start
+
+        param_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+        _stats[model_name] = {
+            "load_seconds": round(load_seconds, 3),
+            "param_MB": round(param_bytes / (1024 * 1024), 1),
+            "rss_delta_MB": round(_rss_mb() - rss_before, 1),
+            "loaded_at": time.time(),
+        }
+        entry = (model, processor)
+        _models[model_name] = entry
+        return entry
+
+
+def register_clip(model_name: str, model, processor):
+    """Registers an already constructed (model, processor) under model_name, e.g. a small offline test model."""
+    with _lock:
+        model.eval()
+        _processors[model_name] = processor
+        _models[model_name] = (model, processor)
+        _stats[model_name] = {"load_seconds": 0.0, "param_MB": round(
+            sum(p.numel() * p.element_size() for p in model.parameters()) / (1024 * 1024), 1
+        ), "rss_delta_MB": 0.0, "loaded_at": time.time()}
+
+
+def is_loaded(model_name: str = CLIP_MODEL_NAME) -> bool:
+    """True if model_name has already been loaded in this process."""
+    return model_name in _models
+
+
+def registry_stats() -> dict:
+    """Returns load time and memory use for every loaded model, plus current process RSS."""
+    return {
+        "models": {name: dict(stats) for name, stats in _stats.items()},
+        "process_rss_MB": round(_rss_mb(), 1),
+    }
@@ -1,36 +1,45 @@
 # utils/pose_classifier.py
 
-from PIL import Image
-from transformers import CLIPProcessor, CLIPModel
-import torch
+import logging
 
-# Load CLIP model once globally
-clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
-clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+import numpy as np
+
+from utils.inference_client import embed_images_shared
+from utils.label_embeddings import score_labels
+
+logger = logging.getLogger(__name__)
 
 # Pose classes to classify
 POSE_CLASSES = ["Front", "Side", "Rear"]
 
-@torch.no_grad()
+def pick_pose(probs) -> tuple:
+    """Returns (predicted_pose, confidence_percent) for a POSE_CLASSES probability vector."""
+    probs = [float(p) for p in probs]
+    max_idx = max(range(len(probs)), key=probs.__getitem__)
+    return POSE_CLASSES[max_idx], probs[max_idx] * 100
+
 def classify_pose(image_file) -> tuple:
     """
     Classifies an image as one of Front, Side, Rear using CLIP.
     Returns (predicted_pose, confidence_percent)
     """
-    try:
-        if hasattr(image_file, 'read'):  # Handle Streamlit files
-            image = Image.open(image_file).convert("RGB")
-        else:
-            image = Image.open(image_file).convert("RGB")
-
-        inputs = clip_processor(text=POSE_CLASSES, images=image, return_tensors="pt", padding=True)
-        outputs = clip_model(**inputs)
-        logits_per_image = outputs.logits_per_image
-        probs = logits_per_image.softmax(dim=1).squeeze().tolist()
-
-        max_idx = int(torch.argmax(logits_per_image))
-        return POSE_CLASSES[max_idx], probs[max_idx] * 100
-
-    except Exception as e:
-        return "Front", 33.3  # fallback prediction
+    # Same code path as the batched API, so single and batched results agree
+    return classify_pose_batch([image_file], batch_size=1)[0]
 
+def classify_pose_batch(images_or_files, batch_size: int = None) -> list:
+    """
+    Batched classify_pose: runs CLIP over stacked batches sized to available memory.
+    Returns one (predicted_pose, confidence_percent) tuple per input, in input order.
+    """
+    items = list(images_or_files)
+    results = [("Front", 33.3) for _ in items]  # fallback prediction
+    try:
+        embeds = embed_images_shared(items, batch_size=batch_size)
+        valid = [i for i, e in enumerate(embeds) if e is not None]
+        if valid:
+            probs = score_labels(np.stack([embeds[i] for i in valid]), POSE_CLASSES)
+            for i, row in zip(valid, probs):
+                results[i] = pick_pose(row)
+    except Exception:
+        logger.exception("Pose classification failed for a batch of %d images", len(items))
+    return results
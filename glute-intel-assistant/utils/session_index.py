@@ -0,0 +1,170 @@
+# utils/session_index.py
+#
+# Persistent index of sessions (log files + upload folders) in the session store, refreshed
+# incrementally from directory mtimes so the dashboard never lists or sorts every session per render.
+
+import os
+import time
+
+import pandas as pd
+
+from utils.session_store import DB_PATH, get_connection
+
+LOGS_DIR = os.path.join("data", "logs")
+UPLOADS_DIR = "uploads"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+LOG_SUFFIX = "_log.txt"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS session_index (
+    session_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    last_activity REAL NOT NULL,
+    image_count INTEGER NOT NULL DEFAULT 0,
+    has_log INTEGER NOT NULL DEFAULT 0,
+    uploads_mtime REAL,
+    log_mtime REAL
+);
+CREATE INDEX IF NOT EXISTS idx_session_index_activity ON session_index (last_activity);
+
+CREATE TABLE IF NOT EXISTS session_images (
+    session_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    PRIMARY KEY (session_id, name)
+);
+"""
+
+_initialized = set()
+
+
+def _conn(db_path: str = DB_PATH):
+    conn = get_connection(db_path)
+    if db_path not in _initialized:
+        conn.executescript(SCHEMA)
+        _initialized.add(db_path)
+    return conn
+
+
+def _scan_dir(path: str, keep) -> dict:
+    """name -> stat for entries of path accepted by keep(entry); one scandir, no per-entry listdir."""
+    if not os.path.isdir(path):
+        return {}
+    with os.scandir(path) as entries:
+        return {e.name: e.stat() for e in entries if keep(e)}
+
+
+def refresh_session_index(logs_dir: str = LOGS_DIR, uploads_dir: str = UPLOADS_DIR, db_path: str = DB_PATH) -> int:
+    """
+    Brings the index up to date. Only session folders whose mtime changed are re-listed
+    (adding or removing a photo bumps the folder mtime). Returns the number of sessions updated.
+    """
+    logs = {
+        name[:-len(LOG_SUFFIX)]: st
+        for name, st in _scan_dir(logs_dir, lambda e: e.name.endswith(LOG_SUFFIX) and e.is_file()).items()
+    }
+    folders = _scan_dir(uploads_dir, lambda e: e.is_dir())
+
+    conn = _conn(db_path)
+    known = {
+        sid: (created, uploads_mtime, log_mtime)
+        for sid, created, uploads_mtime, log_mtime in conn.execute(
+            "SELECT session_id, created_at, uploads_mtime, log_mtime FROM session_index"
+        )
+    }
+
+    updated = 0
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        for sid in known.keys() - logs.keys() - folders.keys():
+            conn.execute("DELETE FROM session_index WHERE session_id = ?", (sid,))
+            conn.execute("DELETE FROM session_images WHERE session_id = ?", (sid,))
+            updated += 1
+
+        for sid in logs.keys() | folders.keys():
+            log_st, folder_st = logs.get(sid), folders.get(sid)
+            log_mtime = log_st.st_mtime if log_st else None
+            uploads_mtime = folder_st.st_mtime if folder_st else None
+            created, prev_uploads_mtime, prev_log_mtime = known.get(sid, (None, None, None))
+            if sid in known and prev_uploads_mtime == uploads_mtime and prev_log_mtime == log_mtime:
+                continue
+
+            if prev_uploads_mtime != uploads_mtime or sid not in known:
+                images = _scan_dir(
+                    os.path.join(uploads_dir, sid),
+                    lambda e: e.name.lower().endswith(IMAGE_EXTENSIONS) and e.is_file(),
+                ) if folder_st else {}
+                conn.execute("DELETE FROM session_images WHERE session_id = ?", (sid,))
+                conn.executemany(
+                    "INSERT INTO session_images VALUES (?, ?, ?)",
+                    [(sid, name, st.st_mtime) for name, st in images.items()],
+                )
+                newest_image = max((st.st_mtime for st in images.values()), default=None)
+            else:
+                newest_image = conn.execute(
+                    "SELECT MAX(mtime) FROM session_images WHERE session_id = ?", (sid,)
+                ).fetchone()[0]
+            image_count = conn.execute(
+                "SELECT COUNT(*) FROM session_images WHERE session_id = ?", (sid,)
+            ).fetchone()[0]
+
+            stamps = [t for t in (log_mtime, uploads_mtime, newest_image) if t is not None]
+            births = [st.st_ctime for st in (log_st, folder_st) if st is not None]
+            created = min([created] + births) if created is not None else min(births)
+            conn.execute(
+                "INSERT OR REPLACE INTO session_index VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (sid, created, max(stamps), image_count, int(log_st is not None), uploads_mtime, log_mtime),
+            )
+            updated += 1
+    return updated
+
+
+def _filters(query, min_images, active_since, has_log):
+    clauses, params = [], []
+    if query:
+        clauses.append("instr(lower(session_id), lower(?)) > 0")
+        params.append(query)
+    if min_images:
+        clauses.append("image_count >= ?")
+        params.append(min_images)
+    if active_since is not None:
+        clauses.append("last_activity >= ?")
+        params.append(active_since)
+    if has_log is not None:
+        clauses.append("has_log = ?")
+        params.append(int(has_log))
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def search_sessions(query: str = "", min_images: int = 0, active_within_days: float = None, has_log: bool = None,
+                    limit: int = 50, offset: int = 0, db_path: str = DB_PATH):
+    """
+    One page of sessions matching the filters, most recently active first.
+    Returns (DataFrame[session_id, created_at, last_activity, image_count, has_log], total_matches).
+    """
+    active_since = time.time() - active_within_days * 86400 if active_within_days else None
+    where, params = _filters(query, min_images, active_since, has_log)
+    conn = _conn(db_path)
+    total = conn.execute(f"SELECT COUNT(*) FROM session_index{where}", params).fetchone()[0]
+    page = pd.read_sql_query(
+        f"SELECT session_id, created_at, last_activity, image_count, has_log FROM session_index{where} "
+        "ORDER BY last_activity DESC, session_id LIMIT ? OFFSET ?",
+        conn, params=(*params, limit, offset),
+    )
+    return page, total
+
+
+def get_session_image_page(session_id: str, limit: int = 12, offset: int = 0, db_path: str = DB_PATH) -> list:
+    """Image filenames for one gallery page of a session, in name order."""
+    cursor = _conn(db_path).execute(
+        "SELECT name FROM session_images WHERE session_id = ? ORDER BY name LIMIT ? OFFSET ?",
+        (session_id, limit, offset),
+    )
+    return [r[0] for r in cursor]
+
+
+def get_session_image_count(session_id: str, db_path: str = DB_PATH) -> int:
+    row = _conn(db_path).execute(
+        "SELECT image_count FROM session_index WHERE session_id = ?", (session_id,)
+    ).fetchone()
+    return row[0] if row else 0
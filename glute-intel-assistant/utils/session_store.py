@@ -0,0 +1,349 @@
+# utils/session_store.py
+
+import csv
+import os
+import sqlite3
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+DATA_DIR = "data"
+DB_PATH = os.path.join(DATA_DIR, "glute_intel.sqlite")
+TAG_LOG_CSV = os.path.join(DATA_DIR, "tag_logs.csv")
+PLAN_LOG_CSV = os.path.join(DATA_DIR, "plan_logs.csv")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tags (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    image TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tags_session ON tags (session_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_tags_timestamp ON tags (timestamp);
+
+CREATE TABLE IF NOT EXISTS plans (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    plan_text TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_plans_session ON plans (session_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_plans_timestamp ON plans (timestamp);
+
+-- Images already processed by the bulk tagger (also serves as its resume checkpoint)
+CREATE TABLE IF NOT EXISTS tagged_images (
+    image TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    tagged_at TEXT NOT NULL
+);
+
+-- Plans produced by the batch plan runner, keyed by the inputs they were generated from (resume checkpoint)
+CREATE TABLE IF NOT EXISTS plan_jobs (
+    session_id TEXT NOT NULL,
+    job_key TEXT NOT NULL,
+    completed_at TEXT NOT NULL,
+    PRIMARY KEY (session_id, job_key)
+);
+
+-- Tag counts per session per period bucket ('day' = date, 'week' = Monday's date, 'all' = ''),
+-- maintained alongside every tag insert so timelines never scan the raw tag log
+CREATE TABLE IF NOT EXISTS tag_rollups (
+    session_id TEXT NOT NULL,
+    period TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (session_id, period, bucket, tag)
+);
+
+-- Same rollups across all clients; sessions = number of clients with the tag in that bucket
+CREATE TABLE IF NOT EXISTS cohort_tag_rollups (
+    period TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    sessions INTEGER NOT NULL,
+    PRIMARY KEY (period, bucket, tag)
+);
+
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+"""
+
+_local = threading.local()
+
+
+def _now():
+    return datetime.utcnow().isoformat(timespec="seconds")
+
+
+def get_connection(db_path: str = DB_PATH) -> sqlite3.Connection:
+    """
+    Returns this thread's connection to the store, creating the schema and
+    migrating the legacy CSV logs on first use.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        migrate_from_csv(conn)
+        _ensure_tag_rollups(conn)
+        connections[db_path] = conn
+    return conn
+
+
+def migrate_from_csv(conn: sqlite3.Connection, tag_csv: str = TAG_LOG_CSV, plan_csv: str = PLAN_LOG_CSV):
+    """One-time import of tag_logs.csv and plan_logs.csv; safe to call from several processes."""
+    if conn.execute("SELECT 1 FROM meta WHERE name = 'csv_migrated'").fetchone():
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if not conn.execute("SELECT 1 FROM meta WHERE name = 'csv_migrated'").fetchone():
+            if os.path.exists(tag_csv):
+                with open(tag_csv, newline="") as f:
+                    conn.executemany(
+                        "INSERT INTO tags (session_id, tag, timestamp) VALUES (?, ?, ?)",
+                        ((r["session_id"], r["tag"], r["timestamp"]) for r in csv.DictReader(f)),
+                    )
+            if os.path.exists(plan_csv):
+                with open(plan_csv, newline="") as f:
+                    conn.executemany(
+                        "INSERT INTO plans (session_id, plan_text, timestamp) VALUES (?, ?, ?)",
+                        ((r["session_id"], r["plan_text"], r["timestamp"]) for r in csv.DictReader(f)),
+                    )
+            conn.execute("INSERT INTO meta VALUES ('csv_migrated', ?)", (_now(),))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+# ───────────────────────────────────────────────
+# TAG ROLLUPS
+
+ROLLUP_PERIODS = ("day", "week", "all")
+
+
+def _rollup_buckets(timestamp: str):
+    """(period, bucket) pairs a tag row counts towards; rows with unparseable timestamps only count in 'all'."""
+    try:
+        day = date.fromisoformat(str(timestamp)[:10])
+    except ValueError:
+        return [("all", "")]
+    return [("day", day.isoformat()), ("week", (day - timedelta(days=day.weekday())).isoformat()), ("all", "")]
+
+
+def _bump_tag_rollups(conn: sqlite3.Connection, rows):
+    """Adds (session_id, tag, timestamp) rows to the rollups. Call inside the transaction inserting them."""
+    increments = Counter()
+    for session_id, tag, timestamp in rows:
+        for period, bucket in _rollup_buckets(timestamp):
+            increments[(session_id, period, bucket, tag)] += 1
+    for (session_id, period, bucket, tag), n in increments.items():
+        updated = conn.execute(
+            "UPDATE tag_rollups SET count = count + ? WHERE session_id = ? AND period = ? AND bucket = ? AND tag = ?",
+            (n, session_id, period, bucket, tag),
+        ).rowcount
+        if not updated:
+            conn.execute("INSERT INTO tag_rollups VALUES (?, ?, ?, ?, ?)", (session_id, period, bucket, tag, n))
+        new_session = 0 if updated else 1
+        if not conn.execute(
+            "UPDATE cohort_tag_rollups SET count = count + ?, sessions = sessions + ? "
+            "WHERE period = ? AND bucket = ? AND tag = ?",
+            (n, new_session, period, bucket, tag),
+        ).rowcount:
+            conn.execute("INSERT INTO cohort_tag_rollups VALUES (?, ?, ?, ?, ?)", (period, bucket, tag, n, new_session))
+
+
+def rebuild_tag_rollups(db_path: str = DB_PATH):
+    """Recomputes all rollups from the raw tag log (backfill / repair)."""
+    conn = get_connection(db_path)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _rebuild_tag_rollups(conn)
+
+
+def _rebuild_tag_rollups(conn: sqlite3.Connection):
+    conn.execute("DELETE FROM tag_rollups")
+    conn.execute("DELETE FROM cohort_tag_rollups")
+    # Same buckets as _rollup_buckets: date(..., 'weekday 0', '-6 days') is the Monday of that week
+    conn.execute("""
+        INSERT INTO tag_rollups
+        SELECT session_id, 'day', date(substr(timestamp, 1, 10)) AS bucket, tag, COUNT(*) FROM tags
+        WHERE bucket IS NOT NULL GROUP BY session_id, bucket, tag
+        UNION ALL
+        SELECT session_id, 'week', date(substr(timestamp, 1, 10), 'weekday 0', '-6 days') AS bucket, tag, COUNT(*)
+        FROM tags WHERE bucket IS NOT NULL GROUP BY session_id, bucket, tag
+        UNION ALL
+        SELECT session_id, 'all', '', tag, COUNT(*) FROM tags GROUP BY session_id, tag
+    """)
+    conn.execute("""
+        INSERT INTO cohort_tag_rollups
+        SELECT period, bucket, tag, SUM(count), COUNT(*) FROM tag_rollups GROUP BY period, bucket, tag
+    """)
+    conn.execute("INSERT OR REPLACE INTO meta VALUES ('tag_rollups_built', ?)", (_now(),))
+
+
+def _ensure_tag_rollups(conn: sqlite3.Connection):
+    """One-time backfill of the rollups for stores created before they existed."""
+    if conn.execute("SELECT 1 FROM meta WHERE name = 'tag_rollups_built'").fetchone():
+        return
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if not conn.execute("SELECT 1 FROM meta WHERE name = 'tag_rollups_built'").fetchone():
+            _rebuild_tag_rollups(conn)
+
+
+# ───────────────────────────────────────────────
+# WRITES
+
+def append_tags(rows, db_path: str = DB_PATH):
+    """Appends (session_id, tag, timestamp) rows to the tag log."""
+    conn = get_connection(db_path)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        rows = list(rows)
+        conn.executemany("INSERT INTO tags (session_id, tag, timestamp) VALUES (?, ?, ?)", rows)
+        _bump_tag_rollups(conn, rows)
+
+
+def record_image_tags(entries, db_path: str = DB_PATH):
+    """
+    Atomically logs tags for a batch of images and marks the images as tagged.
+    entries: [(session_id, image_ref, tags, timestamp)]; tags may be empty for unreadable images.
+    """
+    conn = get_connection(db_path)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        for session_id, image_ref, tags, timestamp in entries:
+            conn.executemany(
+                "INSERT INTO tags (session_id, tag, timestamp, image) VALUES (?, ?, ?, ?)",
+                [(session_id, tag, timestamp, image_ref) for tag in tags],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO tagged_images VALUES (?, ?, ?)", (image_ref, session_id, timestamp)
+            )
+            _bump_tag_rollups(conn, [(session_id, tag, timestamp) for tag in tags])
+
+
+def append_plan(session_id: str, plan_text: str, timestamp: str = None, db_path: str = DB_PATH):
+    """Archives a generated plan for a session."""
+    conn = get_connection(db_path)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT INTO plans (session_id, plan_text, timestamp) VALUES (?, ?, ?)",
+            (session_id, plan_text, timestamp or _now()),
+        )
+
+
+def record_plan(session_id: str, plan_text: str, job_key: str, timestamp: str = None, db_path: str = DB_PATH):
+    """Atomically archives a batch-generated plan and marks its (session, job_key) as done."""
+    timestamp = timestamp or _now()
+    conn = get_connection(db_path)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT INTO plans (session_id, plan_text, timestamp) VALUES (?, ?, ?)",
+            (session_id, plan_text, timestamp),
+        )
+        conn.execute("INSERT OR REPLACE INTO plan_jobs VALUES (?, ?, ?)", (session_id, job_key, timestamp))
+
+
+# ───────────────────────────────────────────────
+# POINT LOOKUPS
+
+def get_session_tags(session_id: str, db_path: str = DB_PATH) -> pd.DataFrame:
+    """Tag rows for one session, oldest first."""
+    return pd.read_sql_query(
+        "SELECT session_id, tag, timestamp FROM tags WHERE session_id = ? ORDER BY timestamp",
+        get_connection(db_path), params=(session_id,),
+    )
+
+
+def get_session_plans(session_id: str, db_path: str = DB_PATH) -> pd.DataFrame:
+    """Archived plans for one session, oldest first."""
+    return pd.read_sql_query(
+        "SELECT session_id, plan_text, timestamp FROM plans WHERE session_id = ? ORDER BY timestamp",
+        get_connection(db_path), params=(session_id,),
+    )
+
+
+def session_has_tags(session_id: str, db_path: str = DB_PATH) -> bool:
+    cursor = get_connection(db_path).execute("SELECT 1 FROM tags WHERE session_id = ? LIMIT 1", (session_id,))
+    return cursor.fetchone() is not None
+
+
+def session_has_plans(session_id: str, db_path: str = DB_PATH) -> bool:
+    cursor = get_connection(db_path).execute("SELECT 1 FROM plans WHERE session_id = ? LIMIT 1", (session_id,))
+    return cursor.fetchone() is not None
+
+
+def tagged_session_ids(db_path: str = DB_PATH) -> set:
+    """Every session with at least one tag (read off the session index, not the full table)."""
+    return {r[0] for r in get_connection(db_path).execute("SELECT DISTINCT session_id FROM tags")}
+
+
+def planned_session_ids(db_path: str = DB_PATH) -> set:
+    """Every session with at least one archived plan."""
+    return {r[0] for r in get_connection(db_path).execute("SELECT DISTINCT session_id FROM plans")}
+
+
+def tagged_images(db_path: str = DB_PATH) -> set:
+    """Image refs ("session_id/filename") already processed by the bulk tagger."""
+    return {r[0] for r in get_connection(db_path).execute("SELECT image FROM tagged_images")}
+
+
+def get_session_top_tags(session_id: str, limit: int = 5, db_path: str = DB_PATH) -> list:
+    """The session's most frequently logged tags, most frequent first."""
+    cursor = get_connection(db_path).execute(
+        "SELECT tag FROM tag_rollups WHERE session_id = ? AND period = 'all' ORDER BY count DESC, tag LIMIT ?",
+        (session_id, limit),
+    )
+    return [r[0] for r in cursor]
+
+
+def completed_plan_jobs(db_path: str = DB_PATH) -> set:
+    """(session_id, job_key) pairs already completed by the batch plan runner."""
+    return {tuple(r) for r in get_connection(db_path).execute("SELECT session_id, job_key FROM plan_jobs")}
+
+
+def get_tag_totals(session_id: str, db_path: str = DB_PATH) -> pd.DataFrame:
+    """All-time count per tag for one session, most frequent first (read from the rollups)."""
+    return pd.read_sql_query(
+        "SELECT tag, count FROM tag_rollups WHERE session_id = ? AND period = 'all' ORDER BY count DESC, tag",
+        get_connection(db_path), params=(session_id,),
+    )
+
+
+def get_tag_timeline(session_id: str, period: str = "week", db_path: str = DB_PATH) -> pd.DataFrame:
+    """Tag counts per day/week bucket for one session: columns bucket, tag, count."""
+    return pd.read_sql_query(
+        "SELECT bucket, tag, count FROM tag_rollups WHERE session_id = ? AND period = ? ORDER BY bucket, tag",
+        get_connection(db_path), params=(session_id, period),
+    )
+
+
+def get_cohort_timeline(period: str = "week", db_path: str = DB_PATH) -> pd.DataFrame:
+    """Tag counts per bucket across all clients: columns bucket, tag, count, sessions."""
+    return pd.read_sql_query(
+        "SELECT bucket, tag, count, sessions FROM cohort_tag_rollups WHERE period = ? ORDER BY bucket, tag",
+        get_connection(db_path), params=(period,),
+    )
+
+
+def get_cohort_totals(db_path: str = DB_PATH) -> pd.DataFrame:
+    """All-time tag counts across all clients and how many clients carry each tag."""
+    return pd.read_sql_query(
+        "SELECT tag, count, sessions FROM cohort_tag_rollups WHERE period = 'all' ORDER BY count DESC, tag",
+        get_connection(db_path),
+    )
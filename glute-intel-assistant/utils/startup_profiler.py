@@ -0,0 +1,165 @@
+# utils/startup_profiler.py
+#
+# Startup profiling for the Streamlit apps. With STARTUP_PROFILE=1 an app records the time spent in
+# every module it imports and the time its first run takes until the page is fully rendered:
+#   STARTUP_PROFILE=1 streamlit run apps/streamlit_progress_dashboard.py
+#   python utils/startup_profiler.py                        # cold-start every app (bare mode), print a table
+#   python utils/startup_profiler.py --budget-ms 1500       # exit 1 if any app renders slower than this
+# Reports are appended as JSON lines to data/cache/startup_profile.jsonl.
+
+import argparse
+import builtins
+import glob
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ENABLED = os.getenv("STARTUP_PROFILE", "") not in ("", "0")
+REPORT_PATH = os.getenv("STARTUP_PROFILE_OUTPUT", os.path.join("data", "cache", "startup_profile.jsonl"))
+MAX_REPORTED_MODULES = 25
+
+_state = {"app": None, "started": None, "finished": False, "thread": None}
+_stack = []      # [module, start, child_seconds] for imports in progress
+_modules = {}    # module -> [self_seconds, cumulative_seconds]
+_top_level = []  # cumulative seconds of imports made directly by the app
+_original_import = builtins.__import__
+
+
+def _resolve(name, globals, level):
+    if not level:
+        return name
+    try:
+        return importlib.util.resolve_name("." * level + name, (globals or {}).get("__package__"))
+    except (ImportError, ValueError):
+        return name
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    module = _resolve(name, globals, level)
+    if module in sys.modules or threading.get_ident() != _state["thread"]:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    entry = [module, time.perf_counter(), 0.0]
+    _stack.append(entry)
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _stack.pop()
+        elapsed = time.perf_counter() - entry[1]
+        record = _modules.setdefault(module, [0.0, 0.0])
+        record[0] += elapsed - entry[2]
+        record[1] += elapsed
+        if _stack:
+            _stack[-1][2] += elapsed
+        else:
+            _top_level.append(elapsed)
+
+
+def start(app_file: str):
+    """
+    Call as start(__file__) at the top of an app, before its heavy imports. No-op unless STARTUP_PROFILE is set.
+    Streamlit reruns call this again; until finish() has run it restarts the render clock.
+    """
+    if not ENABLED or _state["finished"]:
+        return
+    if _state["started"] is None:
+        _state.update(app=os.path.basename(app_file), thread=threading.get_ident())
+        builtins.__import__ = _timed_import
+    _state["started"] = time.perf_counter()
+
+
+def finish() -> dict:
+    """Call at the end of an app's script: stops import timing and writes the report (once per process)."""
+    if _state["started"] is None or _state["finished"]:
+        return None
+    first_render = time.perf_counter() - _state["started"]
+    builtins.__import__ = _original_import
+    _state["finished"] = True
+
+    slowest = sorted(_modules.items(), key=lambda item: -item[1][0])[:MAX_REPORTED_MODULES]
+    report = {
+        "app": _state["app"],
+        "timestamp": time.time(),
+        "imports_ms": round(sum(_top_level) * 1000, 1),
+        "first_render_ms": round(first_render * 1000, 1),
+        "modules_imported": len(_modules),
+        "slowest_modules": [
+            {"module": name, "self_ms": round(own * 1000, 1), "cumulative_ms": round(total * 1000, 1)}
+            for name, (own, total) in slowest
+        ],
+    }
+    try:
+        os.makedirs(os.path.dirname(REPORT_PATH) or ".", exist_ok=True)
+        with open(REPORT_PATH, "a") as f:
+            f.write(json.dumps(report) + "\n")
+    except OSError:
+        pass
+    print(f"⏱️ {report['app']}: imports {report['imports_ms']}ms, first render {report['first_render_ms']}ms",
+          file=sys.stderr)
+    return report
+
+
+# ───────────────────────────────────────────────
+# COLD-START RUNNER
+
+APPS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "apps")
+
+
+def profile_app(script: str, timeout: float = 300) -> dict:
+    """
+    Runs one app script in a fresh interpreter (Streamlit bare mode) with profiling on.
+    Returns its report plus process_ms, the wall time from interpreter launch to exit.
+    """
+    root = os.path.abspath(os.path.join(APPS_DIR, ".."))
+    fd, output = tempfile.mkstemp(suffix=".jsonl", prefix="startup_profile_")
+    os.close(fd)
+    env = dict(os.environ, STARTUP_PROFILE="1", STARTUP_PROFILE_OUTPUT=output,
+               PYTHONPATH=os.pathsep.join(filter(None, [root, os.getenv("PYTHONPATH")])))
+    code = "import runpy, sys; sys.argv = [sys.argv[1]]; runpy.run_path(sys.argv[0], run_name='__main__')"
+    try:
+        started = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", code, os.path.abspath(script)], cwd=root, env=env,
+                                capture_output=True, text=True, timeout=timeout)
+        process_ms = round((time.perf_counter() - started) * 1000, 1)
+        with open(output) as f:
+            lines = f.read().splitlines()
+    finally:
+        os.unlink(output)
+    if not lines:
+        error = (result.stderr.strip().splitlines() or ["no report written"])[-1]
+        return {"app": os.path.basename(script), "error": error, "process_ms": process_ms}
+    return dict(json.loads(lines[-1]), process_ms=process_ms)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure import and first-render time of the Streamlit apps.")
+    parser.add_argument("apps", nargs="*", help="App scripts (default: every apps/*.py)")
+    parser.add_argument("--top", type=int, default=5, help="Slowest modules to list per app")
+    parser.add_argument("--budget-ms", type=float, help="Fail if any app's first render takes longer")
+    args = parser.parse_args(argv)
+
+    scripts = args.apps or sorted(glob.glob(os.path.join(APPS_DIR, "*.py")))
+    over_budget = False
+    for script in scripts:
+        report = profile_app(script)
+        if "error" in report:
+            print(f"❌ {report['app']}: {report['error']}")
+            over_budget = True
+            continue
+        slow = args.budget_ms is not None and report["first_render_ms"] > args.budget_ms
+        over_budget |= slow
+        print(f"{'⚠️' if slow else '✅'} {report['app']}: imports {report['imports_ms']}ms, "
+              f"first render {report['first_render_ms']}ms, process {report['process_ms']}ms "
+              f"({report['modules_imported']} modules)")
+        for module in report["slowest_modules"][:args.top]:
+            print(f"    {module['self_ms']:>8.1f}ms self  {module['cumulative_ms']:>8.1f}ms total  {module['module']}")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+# utils/thumbnails.py
+
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+THUMBNAIL_DIR = os.path.join("data", "cache", "thumbnails")
+THUMBNAIL_SIZE = (200, 280)
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_QUALITY = 80
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# (path, mtime_ns, size) -> content hash, so unchanged files are hashed once per process
+_hash_memo = {}
+_hash_lock = threading.Lock()
+
+
+def _content_hash(path: str) -> str:
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    digest = _hash_memo.get(memo_key)
+    if digest is None:
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with _hash_lock:
+            _hash_memo[memo_key] = digest
+    return digest
+
+
+def _thumbnail_path(digest: str, size) -> str:
+    return os.path.join(THUMBNAIL_DIR, digest[:2], f"{digest}_{size[0]}x{size[1]}.webp")
+
+
+def make_thumbnail(path: str, size=THUMBNAIL_SIZE) -> Image.Image:
+    """
+    Decodes an image at reduced scale and resizes it to size.
+    For JPEGs, draft() lets the decoder skip straight to a 1/2, 1/4 or 1/8 scale DCT decode.
+    """
+    img = Image.open(path)
+    img.draft("RGB", size)
+    return img.convert("RGB").resize(size)
+
+
+def get_thumbnail_path(path: str, size=THUMBNAIL_SIZE) -> str:
+    """Returns the cached thumbnail file for an image, generating it first if needed."""
+    thumb_path = _thumbnail_path(_content_hash(path), size)
+    if not os.path.exists(thumb_path):
+        os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+        tmp_path = f"{thumb_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        make_thumbnail(path, size).save(tmp_path, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY)
+        os.replace(tmp_path, thumb_path)
+    return thumb_path
+
+
+def get_thumbnail(path: str, size=THUMBNAIL_SIZE) -> Image.Image:
+    """Returns the thumbnail as a PIL image, served from the on-disk cache."""
+    return Image.open(get_thumbnail_path(path, size))
+
+
+def pregenerate_thumbnails(paths, size=THUMBNAIL_SIZE, workers: int = 4) -> int:
+    """Generates missing thumbnails ahead of time (e.g. at ingest). Returns how many are available."""
+    def _safe(path):
+        try:
+            get_thumbnail_path(path, size)
+            return True
+        except Exception:
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(_safe, list(paths)))